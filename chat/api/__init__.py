@@ -1,8 +1,10 @@
 from fastapi import APIRouter
-from api import chat, message, user_in_chat
+from api import chat, emotion, message, upload, user_in_chat
 
 api_router = APIRouter()
 
 api_router.include_router(chat.router, prefix="/chats", tags=["chats"])
 api_router.include_router(message.router, prefix="/messages", tags=["messages"])
-api_router.include_router(user_in_chat.router, prefix="/user-in-chat", tags=["user-in-chat"])
\ No newline at end of file
+api_router.include_router(user_in_chat.router, prefix="/user-in-chat", tags=["user-in-chat"])
+api_router.include_router(emotion.router, prefix="/emotions", tags=["emotions"])
+api_router.include_router(upload.router, prefix="/uploads", tags=["uploads"])
\ No newline at end of file
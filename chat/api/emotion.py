@@ -0,0 +1,28 @@
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_db
+from schemas.emotion import EmotionTrends
+from services.emotion_rollup_service import EmotionRollupService
+
+router = APIRouter()
+
+@router.get("/users/{user_id}/trends", response_model=EmotionTrends)
+async def read_emotion_trends(
+    user_id: int,
+    start: Optional[date] = Query(None, description="First day, inclusive (default: 30 days before end)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today, UTC)"),
+    granularity: Literal["day", "week"] = Query("day"),
+    chat_id: Optional[int] = Query(None, description="Limit to one chat"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Daily or weekly emotional trend of a user's messages, served from the rollup table
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return await EmotionRollupService.get_trends(db, user_id, start, end, granularity, chat_id)
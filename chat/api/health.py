@@ -0,0 +1,64 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from core.process_memory import current_worker, read_process_memory
+from services.emotion_risk_service import emotion_risk_detector
+from services.inference import inference
+from services.minio_service import minio_service
+
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    """
+    The process is up and serving requests
+    """
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness():
+    """
+    Report load state and load time of every inference model;
+    responds 503 until all of them are ready
+    """
+    status = await inference.status()
+    ready = status["ready"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "loading",
+            "models": status["models"]
+        }
+    )
+
+
+@router.get("/inference")
+async def inference_stats():
+    """
+    Inference model state together with cache and queue counters
+    """
+    return await inference.status()
+
+
+@router.get("/memory")
+async def memory():
+    """
+    Resident memory of the worker serving this request, in kB
+    """
+    return {**current_worker(), "memory": read_process_memory()}
+
+
+@router.get("/risk")
+async def risk_stats():
+    """
+    Emotional-risk detector counters of the worker serving this request
+    """
+    return emotion_risk_detector.stats()
+
+
+@router.get("/storage")
+async def storage_stats():
+    """
+    Presigned URL cache counters of the worker serving this request
+    """
+    return minio_service.urls.stats()
@@ -1,15 +1,17 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
-import json
 import logging
 import os
 
 from core.database import get_db
-from schemas.message import Message, MessageCreate, MessageUpdate
+from schemas.message import Message, MessageCreate, MessageUpdate, VoiceEmotionTimeline
+from services.attachment_service import AttachmentService
 from services.message_service import MessageService
 from services.minio_service import minio_service
-from services.emotion_service import emotion_service
+from services.multipart_upload import ObjectTooLargeError
+from services.inference import inference
+from services.inference_priority import Priority
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -28,67 +30,12 @@ async def read_chat_messages(
     Retrieve all messages for a specific chat with pagination
     """
     messages = await MessageService.get_chat_messages(db, chat_id, skip=skip, limit=limit)
-    
-    # Replace file paths with presigned URLs in the media field
-    for message in messages:
-        if message.media:
-            file_paths = message.media.split(",")
-            presigned_urls = []
-            files_data = []
-            
-            for file_path in file_paths:
-                if file_path.strip():
-                    try:
-                        file_url = minio_service.get_file_url(file_path)
-                        file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                        
-                        # Add presigned URL to the list
-                        presigned_urls.append(file_url)
-                        
-                        # Try to determine content type
-                        content_type = "application/octet-stream"
-                        if "." in file_name:
-                            ext = file_name.split(".")[-1].lower()
-                            if ext in ["mp3", "wav", "ogg", "m4a"]:
-                                content_type = f"audio/{ext}"
-                            elif ext in ["pdf"]:
-                                content_type = "application/pdf"
-                            elif ext in ["doc", "docx"]:
-                                content_type = "application/msword"
-                            elif ext in ["txt"]:
-                                content_type = "text/plain"
-                        
-                        files_data.append({
-                            "file_path": file_path,
-                            "file_url": file_url,
-                            "file_name": file_name,
-                            "content_type": content_type
-                        })
-                    except Exception as e:
-                        logger.error(f"Error processing file {file_path}: {str(e)}")
-                        # Skip files that can't be processed
-                        continue
-            
-            # Replace media with comma-separated presigned URLs
-            message.media = ",".join(presigned_urls)
-            # Keep files data for backward compatibility
-            message.files = files_data
-    
-    return messages
-
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy.ext.asyncio import AsyncSession
-import io
-import logging
 
-from core.database import get_db
-from schemas.message import Message, MessageCreate, MessageUpdate
-from services.message_service import MessageService
-from services.minio_service import minio_service
+    # One query for the files of the whole page; media gets the presigned URLs
+    attachments = await AttachmentService.get_for_messages(db, [message.id for message in messages])
+    await AttachmentService.attach_files(messages, attachments)
 
-router = APIRouter()
-logger = logging.getLogger(__name__)
+    return messages
 
 @router.post("/", response_model=Message)
 async def create_message(
@@ -103,20 +50,20 @@ async def create_message(
     Create a new message with optional parameters:
     - For text messages: provide text and optionally files
     - For voice messages: provide audio file with no text
-    
+
     Both types will have emotion analysis if from a patient.
     """
     # Validate message_type
     if message_type not in ["text", "voice"]:
         raise HTTPException(status_code=400, detail="Message type must be either 'text' or 'voice'")
-    
+
     # Validate input based on message type
     if message_type == "text" and not text:
         raise HTTPException(status_code=400, detail="Text messages require text content")
-    
+
     if message_type == "voice" and (not files or not any(file.filename for file in files)):
         raise HTTPException(status_code=400, detail="Voice messages require an audio file")
-    
+
     # Create the message first
     message_create = MessageCreate(
         from_user_id=from_user_id,
@@ -124,106 +71,47 @@ async def create_message(
         text=text if text else "",  # Empty string for voice messages
         status=False
     )
-    
-    # First upload any files if present
-    file_paths = []
-    presigned_urls = []
-    files_data = []
-    
-    if files and any(file.filename for file in files):
-        for file in files:
-            if file.filename:
-                try:
-                    logger.info(f"Uploading file {file.filename}")
-                    # Upload file to MinIO
-                    object_name = await minio_service.upload_file(
-                        file, 
-                        chat_id, 
-                        0  # Temporary message_id, will be updated after message creation
-                    )
-                    file_paths.append(object_name)
-                    
-                    # Get file URL for response
-                    file_url = minio_service.get_file_url(object_name)
-                    presigned_urls.append(file_url)
-                    
-                    files_data.append({
-                        "file_path": object_name,
-                        "file_url": file_url,
-                        "file_name": file.filename,
-                        "content_type": file.content_type
-                    })
-                    logger.info(f"File uploaded successfully: {object_name}")
-                except Exception as e:
-                    logger.error(f"Error uploading file {file.filename}: {str(e)}")
-                    # Continue with other files if one fails
-                    continue
-    
-    # Create the message with emotion analysis
-    message = await MessageService.create_message(
-        db=db, 
-        message_create=message_create,
-        message_type=message_type,
-        file_paths=file_paths
-    )
-    
-    # Update file paths with correct message ID if files were uploaded
-    if file_paths:
-        updated_file_paths = []
-        updated_presigned_urls = []
-        updated_files_data = []
-        
-        for i, file_path in enumerate(file_paths):
-            try:
-                # Replace temporary message_id with actual message_id in path
-                new_path = file_path.replace(f"{chat_id}/0/", f"{chat_id}/{message.id}/")
-                
-                # Rename the object in MinIO
-                minio_service.client.copy_object(
-                    bucket_name=minio_service.client.bucket_name,
-                    object_name=new_path,
-                    source_object=file_path,
-                    source_bucket=minio_service.client.bucket_name
-                )
-                
-                # Delete the old object
-                minio_service.delete_file(file_path)
-                
-                updated_file_paths.append(new_path)
-                
-                # Get updated URL
-                file_url = minio_service.get_file_url(new_path)
-                updated_presigned_urls.append(file_url)
-                
-                # Update file data
-                files_data[i]["file_path"] = new_path
-                files_data[i]["file_url"] = file_url
-                updated_files_data.append(files_data[i])
-                
-            except Exception as e:
-                logger.error(f"Error updating file path: {str(e)}")
-                # Keep the original path if update fails
-                updated_file_paths.append(file_path)
-                updated_presigned_urls.append(presigned_urls[i])
-                updated_files_data.append(files_data[i])
-        
-        # Update message with corrected file paths
-        message_update = MessageUpdate(media=",".join(updated_file_paths))
-        message = await MessageService.update_message(
-            db=db, 
-            message_id=message.id, 
-            message_update=message_update,
-            message_type=message_type,
-            file_paths=updated_file_paths
+
+    # Reserve the message id so every file is written once, straight to its final key
+    message_id = await MessageService.reserve_message_id(db)
+    stored_files = []
+
+    try:
+        if files and any(file.filename for file in files):
+            for file in files:
+                if file.filename:
+                    try:
+                        logger.info(f"Uploading file {file.filename}")
+                        # Upload file to MinIO
+                        stored = await minio_service.upload_file(file, chat_id, message_id)
+                        stored_files.append(stored)
+                        logger.info(f"File uploaded successfully: {stored.object_name}")
+                    except ObjectTooLargeError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Error uploading file {file.filename}: {str(e)}")
+                        # Continue with other files if one fails
+                        continue
+
+        # Create the message with emotion analysis, together with its attachment rows
+        message = await MessageService.create_message(
+            db=db,
+            message_create=message_create,
+            message_id=message_id,
+            files=stored_files
         )
-        
-        # Update response fields
-        message.media = ",".join(updated_presigned_urls)
-        message.files = updated_files_data
-    
+    except Exception:
+        # Nothing references the uploaded objects unless the message was saved
+        await db.rollback()
+        if await MessageService.get_message(db, message_id) is None:
+            for stored in stored_files:
+                await minio_service.delete_file(stored.object_name)
+        raise
+
+    await AttachmentService.attach_files([message], await AttachmentService.get_for_messages(db, [message.id]))
+
     return message
 
-# Rest of the routes remain unchanged
 @router.get("/{message_id}", response_model=Message)
 async def read_message(
     message_id: int,
@@ -235,53 +123,33 @@ async def read_message(
     message = await MessageService.get_message(db, message_id)
     if message is None:
         raise HTTPException(status_code=404, detail="Message not found")
-    
-    # Replace file paths with presigned URLs in the media field
-    if message.media:
-        file_paths = message.media.split(",")
-        presigned_urls = []
-        files_data = []
-        
-        for file_path in file_paths:
-            if file_path.strip():
-                try:
-                    file_url = minio_service.get_file_url(file_path)
-                    file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                    
-                    # Add presigned URL to the list
-                    presigned_urls.append(file_url)
-                    
-                    # Try to determine content type
-                    content_type = "application/octet-stream"
-                    if "." in file_name:
-                        ext = file_name.split(".")[-1].lower()
-                        if ext in ["mp3", "wav", "ogg", "m4a"]:
-                            content_type = f"audio/{ext}"
-                        elif ext in ["pdf"]:
-                            content_type = "application/pdf"
-                        elif ext in ["doc", "docx"]:
-                            content_type = "application/msword"
-                        elif ext in ["txt"]:
-                            content_type = "text/plain"
-                    
-                    files_data.append({
-                        "file_path": file_path,
-                        "file_url": file_url,
-                        "file_name": file_name,
-                        "content_type": content_type
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {str(e)}")
-                    # Skip files that can't be processed
-                    continue
-        
-        # Replace media with comma-separated presigned URLs
-        message.media = ",".join(presigned_urls)
-        # Keep files data for backward compatibility
-        message.files = files_data
-    
+
+    await AttachmentService.attach_files([message], await AttachmentService.get_for_messages(db, [message_id]))
+
     return message
 
+@router.get("/{message_id}/emotion-timeline", response_model=List[VoiceEmotionTimeline])
+async def read_message_emotion_timeline(
+    message_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the emotion timeline over the course of each voice file in a message
+    """
+    message = await MessageService.get_message(db, message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    timelines = []
+    for attachment in await AttachmentService.get_for_message(db, message_id):
+        if os.path.splitext(attachment.object_key)[1].lower() not in ALLOWED_AUDIO_EXTENSIONS:
+            continue
+        audio_data = await minio_service.get_file_content(attachment.object_key)
+        timeline = await inference.analyze_voice_timeline(audio_data, attachment.object_key)
+        timelines.append(VoiceEmotionTimeline(file_path=attachment.object_key, **timeline))
+
+    return timelines
+
 @router.put("/{message_id}", response_model=Message)
 async def update_message(
     message_id: int,
@@ -297,52 +165,18 @@ async def update_message(
     message = await MessageService.get_message(db, message_id)
     if message is None:
         raise HTTPException(status_code=404, detail="Message not found")
-    
+
     # Prepare update data
     update_data = {}
     if text is not None:
         update_data["text"] = text
     if status is not None:
         update_data["status"] = status
-    
+
     # Handle new file uploads if any
-    existing_file_paths = message.media.split(",") if message.media else []
-    new_file_paths = []
-    files_data = []
-    presigned_urls = []
+    new_files = []
     voice_file_path = None
-    
-    # Process existing files
-    for file_path in existing_file_paths:
-        if file_path.strip():
-            try:
-                file_url = minio_service.get_file_url(file_path)
-                presigned_urls.append(file_url)
-                
-                file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                content_type = "application/octet-stream"
-                if "." in file_name:
-                    ext = file_name.split(".")[-1].lower()
-                    if ext in ["mp3", "wav", "ogg", "m4a"]:
-                        content_type = f"audio/{ext}"
-                    elif ext in ["pdf"]:
-                        content_type = "application/pdf"
-                    elif ext in ["doc", "docx"]:
-                        content_type = "application/msword"
-                    elif ext in ["txt"]:
-                        content_type = "text/plain"
-                
-                files_data.append({
-                    "file_path": file_path,
-                    "file_url": file_url,
-                    "file_name": file_name,
-                    "content_type": content_type
-                })
-            except Exception as e:
-                logger.error(f"Error processing existing file {file_path}: {str(e)}")
-                # Skip files that can't be processed
-                continue
-    
+
     # Process new files
     if files and any(file.filename for file in files):
         for file in files:
@@ -352,58 +186,47 @@ async def update_message(
                 if file_ext not in ALLOWED_AUDIO_EXTENSIONS:
                     logger.warning(f"Rejected non-audio file upload: {file.filename}")
                     continue
-                
+
                 try:
                     # Upload file to MinIO
-                    object_name = await minio_service.upload_file(
-                        file, 
-                        message.chat_id, 
+                    stored = await minio_service.upload_file(
+                        file,
+                        message.chat_id,
                         message_id
                     )
-                    new_file_paths.append(object_name)
-                    voice_file_path = object_name
-                    
-                    # Get file URL and prepare file info
-                    file_url = minio_service.get_file_url(object_name)
-                    presigned_urls.append(file_url)
-                    
-                    files_data.append({
-                        "file_path": object_name,
-                        "file_url": file_url,
-                        "file_name": file.filename,
-                        "content_type": file.content_type
-                    })
+                    new_files.append(stored)
+                    voice_file_path = stored.object_name
+                except ObjectTooLargeError:
+                    raise
                 except Exception as e:
                     logger.error(f"Error uploading new voice file {file.filename}: {str(e)}")
                     # Continue with other files if one fails
                     continue
-    
-    # Combine existing and new file paths
-    all_file_paths = existing_file_paths + new_file_paths
-    if all_file_paths:
-        update_data["media"] = ",".join([p for p in all_file_paths if p.strip()])
-    
+
+    # Record new files next to the existing ones
+    await AttachmentService.add_attachments(db, message_id, new_files)
+
     # Process new voice message through emotion service if available
     if voice_file_path:
         try:
-            # Get voice file URL
-            voice_url = minio_service.get_file_url(voice_file_path)
-            
-            # Analyze emotions from voice file
-            update_data["emotional_state"] = emotion_service.analyze_voice_sentiment(voice_url)
-            update_data["emotion"] = emotion_service.classify_voice_emotion(voice_url)
-            
+            # Read the stored voice file once and get both scores from a single inference
+            audio_data = await minio_service.get_file_content(voice_file_path)
+            (
+                update_data["emotional_state"],
+                update_data["emotion"],
+                update_data["emotion_model_version"]
+            ) = await inference.analyze_voice(audio_data, voice_file_path, Priority.EDIT)
+
             logger.info(f"Voice emotion analysis: state={update_data['emotional_state']}, emotion={update_data['emotion']}")
         except Exception as e:
             logger.error(f"Error analyzing voice emotions: {str(e)}")
-    
+
     # Update the message
     message = await MessageService.update_message(db, message_id, MessageUpdate(**update_data))
-    
+
     # Set presigned URLs in the response
-    message.media = ",".join(presigned_urls)
-    message.files = files_data
-    
+    await AttachmentService.attach_files([message], await AttachmentService.get_for_messages(db, [message_id]))
+
     return message
 
 @router.delete("/{message_id}", response_model=bool)
@@ -418,24 +241,21 @@ async def delete_message(
     message = await MessageService.get_message(db, message_id)
     if message is None:
         raise HTTPException(status_code=404, detail="Message not found")
-    
-    # Delete associated files from MinIO
-    if message.media:
-        file_paths = message.media.split(",")
-        for file_path in file_paths:
-            if file_path.strip():
-                try:
-                    minio_service.delete_file(file_path)
-                except Exception as e:
-                    logger.error(f"Error deleting file {file_path}: {str(e)}")
-                    # Continue even if file deletion fails
-                    pass
-    
+
+    # Delete associated files from MinIO; their rows go with the message
+    for attachment in await AttachmentService.get_for_message(db, message_id):
+        try:
+            await minio_service.delete_file(attachment.object_key)
+        except Exception as e:
+            logger.error(f"Error deleting file {attachment.object_key}: {str(e)}")
+            # Continue even if file deletion fails
+            pass
+
     # Delete the message
     success = await MessageService.delete_message(db, message_id)
     if not success:
         raise HTTPException(status_code=404, detail="Message not found")
-    
+
     return True
 
 @router.delete("/{message_id}/files/{file_name}", response_model=Message)
@@ -451,77 +271,26 @@ async def delete_message_file(
     message = await MessageService.get_message(db, message_id)
     if message is None:
         raise HTTPException(status_code=404, detail="Message not found")
-    
-    # Find and delete the file
-    if message.media:
-        file_paths = message.media.split(",")
-        updated_paths = []
-        target_file_path = None
-        
-        # Find the file that matches the filename
-        for file_path in file_paths:
-            if file_path.strip():
-                if file_path.endswith(f"/{file_name}") or file_path == file_name:
-                    target_file_path = file_path
-                else:
-                    updated_paths.append(file_path)
-        
-        if target_file_path:
-            # Delete the file from MinIO
-            try:
-                minio_service.delete_file(target_file_path)
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
-            
-            # Update the message's media field
-            message_update = MessageUpdate(media=",".join(updated_paths) if updated_paths else None)
-            message = await MessageService.update_message(db, message_id, message_update)
-            
-            # Add presigned URLs for remaining files
-            presigned_urls = []
-            files_data = []
-            
-            if message.media:
-                remaining_file_paths = message.media.split(",")
-                
-                for file_path in remaining_file_paths:
-                    if file_path.strip():
-                        try:
-                            file_url = minio_service.get_file_url(file_path)
-                            presigned_urls.append(file_url)
-                            
-                            remaining_file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                            
-                            # Try to determine content type
-                            content_type = "application/octet-stream"
-                            if "." in remaining_file_name:
-                                ext = remaining_file_name.split(".")[-1].lower()
-                                if ext in ["mp3", "wav", "ogg", "m4a"]:
-                                    content_type = f"audio/{ext}"
-                                elif ext in ["pdf"]:
-                                    content_type = "application/pdf"
-                                elif ext in ["doc", "docx"]:
-                                    content_type = "application/msword"
-                                elif ext in ["txt"]:
-                                    content_type = "text/plain"
-                            
-                            files_data.append({
-                                "file_path": file_path,
-                                "file_url": file_url,
-                                "file_name": remaining_file_name,
-                                "content_type": content_type
-                            })
-                        except Exception as e:
-                            logger.error(f"Error processing remaining file {file_path}: {str(e)}")
-                            # Skip files that can't be processed
-                            continue
-            
-            # Set presigned URLs in the response
-            message.media = ",".join(presigned_urls)
-            message.files = files_data
-        else:
-            raise HTTPException(status_code=404, detail="File not found in message")
-    else:
+
+    attachments = await AttachmentService.get_for_message(db, message_id)
+    if not attachments:
         raise HTTPException(status_code=404, detail="Message has no files")
-    
-    return message
\ No newline at end of file
+
+    # Find the file that matches the filename
+    target = AttachmentService.find(attachments, file_name)
+    if target is None:
+        raise HTTPException(status_code=404, detail="File not found in message")
+
+    # Delete the file from MinIO
+    try:
+        await minio_service.delete_file(target.object_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
+
+    await AttachmentService.remove_attachment(db, target)
+
+    # Add presigned URLs for remaining files
+    remaining = [attachment for attachment in attachments if attachment.id != target.id]
+    await AttachmentService.attach_files([message], {message_id: remaining})
+
+    return message
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from core.database import get_db
+from schemas.message import Message
+from schemas.upload import UploadCompletion, UploadSessionBatch, UploadSessionCreate
+from services.attachment_service import AttachmentService
+from services.upload_session_service import UploadSessionService
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/", response_model=UploadSessionBatch)
+async def create_upload_sessions(
+    request: UploadSessionCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reserve a message and get presigned URLs to upload its files straight to storage.
+
+    A file up to `part_size` gets one `url` for a single PUT; a larger one gets
+    `part_urls`, one PUT per part. Finish with POST /uploads/{message_id}/complete
+    before `expires_at`, otherwise the uploaded data is removed.
+    """
+    return await UploadSessionService.create_sessions(db, request)
+
+@router.post("/{message_id}/complete", response_model=Message)
+async def complete_upload(
+    message_id: int,
+    completion: UploadCompletion,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Verify the uploaded files and create the message with them attached
+    """
+    message = await UploadSessionService.complete(db, message_id, completion)
+    logger.info(f"Upload of message {message_id} completed")
+
+    await AttachmentService.attach_files([message], await AttachmentService.get_for_messages(db, [message_id]))
+
+    return message
@@ -19,6 +19,98 @@ class Settings(BaseSettings):
     MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "False").lower() == "true"
     MINIO_BUCKET_NAME: str = os.getenv("MINIO_BUCKET_NAME", "chat-bucket")
     MINIO_PROXY_URL: str = os.getenv("MINIO_PROXY", "http://minio:9000")
+    MINIO_POOL_SIZE: int = int(os.getenv("MINIO_POOL_SIZE", "16"))  # storage threads and HTTP connections
+    MINIO_CONNECT_TIMEOUT: float = float(os.getenv("MINIO_CONNECT_TIMEOUT", "10"))  # seconds
+    MINIO_READ_TIMEOUT: float = float(os.getenv("MINIO_READ_TIMEOUT", "30"))  # seconds
+    MINIO_RETRIES: int = int(os.getenv("MINIO_RETRIES", "3"))
+    MINIO_PART_SIZE: int = int(os.getenv("MINIO_PART_SIZE", str(8 * 1024 * 1024)))  # multipart part, at least 5 MiB
+    MINIO_MAX_OBJECT_SIZE: int = int(os.getenv("MINIO_MAX_OBJECT_SIZE", str(100 * 1024 * 1024)))  # bytes, 0 for no limit
+    MINIO_URL_EXPIRY: int = int(os.getenv("MINIO_URL_EXPIRY", "3600"))  # seconds presigned URLs stay valid
+    MINIO_URL_REFRESH_MARGIN: int = int(os.getenv("MINIO_URL_REFRESH_MARGIN", "300"))  # re-sign this long before expiry
+    MINIO_URL_CACHE_SIZE: int = int(os.getenv("MINIO_URL_CACHE_SIZE", "50000"))  # 0 disables the cache
+
+    # Direct-to-storage uploads: clients PUT to presigned URLs, pending sessions expire after the TTL
+    UPLOAD_SESSION_TTL: int = int(os.getenv("UPLOAD_SESSION_TTL", "3600"))  # seconds
+    UPLOAD_SESSION_SWEEP_INTERVAL: int = int(os.getenv("UPLOAD_SESSION_SWEEP_INTERVAL", "300"))  # seconds, 0 sweeps once
+
+    # "local" runs the models in this process, "remote" talks to the inference worker
+    INFERENCE_MODE: str = os.getenv("INFERENCE_MODE", "local")
+    INFERENCE_SOCKET_PATH: str = os.getenv("INFERENCE_SOCKET_PATH", "/tmp/emotion-inference.sock")  # Empty to use TCP
+    INFERENCE_HOST: str = os.getenv("INFERENCE_HOST", "127.0.0.1")
+    INFERENCE_PORT: int = int(os.getenv("INFERENCE_PORT", "8765"))
+    INFERENCE_TIMEOUT: float = float(os.getenv("INFERENCE_TIMEOUT", "10"))  # seconds
+    # Room for any voice file the API accepts, plus the file name and header of a voice request
+    INFERENCE_MAX_FRAME_SIZE: int = int(os.getenv(
+        "INFERENCE_MAX_FRAME_SIZE", str((MINIO_MAX_OBJECT_SIZE or 64 * 1024 * 1024) + 128 * 1024)
+    ))
+
+    # "torch" runs eager fp32 models, "onnxruntime" the int8 exports from scripts.export_onnx
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+    ONNX_INTRA_OP_THREADS: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 uses the lane thread budget
+
+    # CPU partitioning between text and voice inference lanes
+    TEXT_LANE_THREADS: int = int(os.getenv("TEXT_LANE_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+    TEXT_LANE_CONCURRENCY: int = int(os.getenv("TEXT_LANE_CONCURRENCY", "1"))
+    VOICE_LANE_THREADS: int = int(os.getenv("VOICE_LANE_THREADS", str(max(1, (os.cpu_count() or 2) - (os.cpu_count() or 2) // 2))))
+    VOICE_LANE_CONCURRENCY: int = int(os.getenv("VOICE_LANE_CONCURRENCY", "1"))
+
+    # Speech emotion model used for voice messages
+    VOICE_EMOTION_MODEL: str = os.getenv("VOICE_EMOTION_MODEL", "xbgoose/hubert-speech-emotion-recognition-russian")
+    VOICE_WINDOW_SECONDS: float = float(os.getenv("VOICE_WINDOW_SECONDS", "8"))
+    VOICE_WINDOW_OVERLAP_SECONDS: float = float(os.getenv("VOICE_WINDOW_OVERLAP_SECONDS", "2"))
+    VOICE_WINDOW_BATCH_SIZE: int = int(os.getenv("VOICE_WINDOW_BATCH_SIZE", "4"))
+
+    # Energy VAD that drops silence before the speech model
+    VOICE_VAD_ENABLED: bool = os.getenv("VOICE_VAD_ENABLED", "True").lower() == "true"
+    VOICE_VAD_THRESHOLD_DB: float = float(os.getenv("VOICE_VAD_THRESHOLD_DB", "-40"))  # dBFS frame level
+    VOICE_VAD_PADDING_MS: int = int(os.getenv("VOICE_VAD_PADDING_MS", "200"))  # kept around each speech frame
+
+    # serve.py: models load once in the master, HTTP/WS workers are forked from it
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "2"))
+    SERVER_MEMORY_REPORT_INTERVAL: int = int(os.getenv("SERVER_MEMORY_REPORT_INTERVAL", "60"))  # seconds, 0 disables
+
+    # Load inference models in the background right after startup
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "True").lower() == "true"
+
+    # Emotion inference batching
+    EMOTION_BATCH_SIZE: int = int(os.getenv("EMOTION_BATCH_SIZE", "16"))
+    EMOTION_BATCH_MAX_WAIT_MS: int = int(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "20"))
+    EMOTION_QUEUE_MAX_SIZE: int = int(os.getenv("EMOTION_QUEUE_MAX_SIZE", "1000"))
+
+    # Text emotion result cache; set a Redis URL to share results between workers
+    EMOTION_CACHE_SIZE: int = int(os.getenv("EMOTION_CACHE_SIZE", "10000"))  # 0 disables the cache
+    EMOTION_CACHE_TTL: int = int(os.getenv("EMOTION_CACHE_TTL", "86400"))  # seconds
+    EMOTION_CACHE_REDIS_URL: str = os.getenv("EMOTION_CACHE_REDIS_URL", "")
+
+    # Persist messages first and score them in the background
+    EMOTION_ENRICH_ASYNC: bool = os.getenv("EMOTION_ENRICH_ASYNC", "False").lower() == "true"
+    EMOTION_ENRICH_CONCURRENCY: int = int(os.getenv("EMOTION_ENRICH_CONCURRENCY", "16"))
+    EMOTION_ENRICH_SWEEP_INTERVAL: int = int(os.getenv("EMOTION_ENRICH_SWEEP_INTERVAL", "300"))  # seconds
+
+    # Lexicon tier in front of the text models; a threshold above 1 sends every text to the models
+    EMOTION_LEXICON_THRESHOLD: float = float(os.getenv("EMOTION_LEXICON_THRESHOLD", "0.75"))
+    EMOTION_LEXICON_AUDIT_RATE: float = float(os.getenv("EMOTION_LEXICON_AUDIT_RATE", "0.02"))  # share also scored by the models
+
+    # Per-priority inference deadlines; requests that cannot make them get heuristic scores
+    INFERENCE_DEADLINE_LIVE_MS: int = int(os.getenv("INFERENCE_DEADLINE_LIVE_MS", "1500"))
+    INFERENCE_DEADLINE_EDIT_MS: int = int(os.getenv("INFERENCE_DEADLINE_EDIT_MS", "5000"))
+    INFERENCE_DEADLINE_BACKFILL_MS: int = int(os.getenv("INFERENCE_DEADLINE_BACKFILL_MS", "60000"))
+    VOICE_INFERENCE_DEADLINE_MS: int = int(os.getenv("VOICE_INFERENCE_DEADLINE_MS", "30000"))
+
+    # Emotional-risk detector: EWMA of emotional_state (-1..1) per patient, alerts go to the psychologist
+    RISK_DETECTOR_ENABLED: bool = os.getenv("RISK_DETECTOR_ENABLED", "True").lower() == "true"
+    RISK_EWMA_ALPHA: float = float(os.getenv("RISK_EWMA_ALPHA", "0.2"))  # weight of the newest message
+    RISK_MEAN_THRESHOLD: float = float(os.getenv("RISK_MEAN_THRESHOLD", "-0.4"))  # alert when the mean falls below
+    RISK_NEGATIVE_LEVEL: float = float(os.getenv("RISK_NEGATIVE_LEVEL", "-0.3"))  # a message below counts as negative
+    RISK_NEGATIVE_STREAK: int = int(os.getenv("RISK_NEGATIVE_STREAK", "5"))  # consecutive negative messages
+    RISK_DROP_SIGMAS: float = float(os.getenv("RISK_DROP_SIGMAS", "2.5"))  # alert on a message this far below the mean
+    RISK_MIN_MESSAGES: int = int(os.getenv("RISK_MIN_MESSAGES", "5"))  # before mean and drop alerts
+    RISK_ALERT_COOLDOWN: int = int(os.getenv("RISK_ALERT_COOLDOWN", "3600"))  # seconds between alerts per patient
+    RISK_REBUILD_HOURS: int = int(os.getenv("RISK_REBUILD_HOURS", "72"))  # history replayed on startup
+    RISK_PATIENT_CACHE_TTL: int = int(os.getenv("RISK_PATIENT_CACHE_TTL", "300"))  # seconds
     
     # Security
     # SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
@@ -0,0 +1,38 @@
+import os
+from typing import Dict, Union
+
+# Fields of /proc/<pid>/smaps_rollup reported per process, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+def read_process_memory(pid: Union[int, str] = "self") -> Dict[str, int]:
+    """
+    Resident memory of a process in kB
+
+    PSS splits pages shared between forked workers evenly among them, so the
+    sum of PSS over all workers is their real footprint while RSS counts the
+    shared model weights once per worker. Falls back to VmRSS where
+    smaps_rollup is unavailable.
+
+    Returns:
+        Dict[str, int]: rss, pss, shared and private sizes (lower-case keys)
+    """
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    memory[name.lower()] = int(value.split()[0])
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        memory["rss"] = int(line.split()[1])
+        except OSError:
+            pass
+    return memory
+
+def current_worker() -> Dict[str, Union[int, str]]:
+    """Identity of this process within the serve.py worker pool"""
+    return {"pid": os.getpid(), "worker": os.getenv("SERVER_WORKER_ID", "")}
@@ -0,0 +1,90 @@
+"""
+Binary framing used between the chat API and the inference worker.
+
+Every frame is a fixed header followed by the payload:
+
+    uint32 payload length | uint8 opcode | uint32 request id | payload
+
+Payloads per opcode:
+
+    TEXT    uint8 priority | uint32 deadline ms | utf-8 text
+    VOICE   uint16 file name length | utf-8 file name | raw audio bytes
+    RESULT  float32 valence | uint8 label length | utf-8 emotion label |
+            utf-8 model version (empty for heuristic fallback scores)
+    STATUS  empty in requests, utf-8 JSON in responses
+    TIMELINE  same as VOICE in requests, utf-8 JSON in responses
+    ERROR   utf-8 error message
+"""
+import asyncio
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+HEADER = struct.Struct("!IBI")
+TEXT_PREFIX = struct.Struct("!BI")
+RESULT_PREFIX = struct.Struct("!fB")
+NAME_LENGTH = struct.Struct("!H")
+
+OP_TEXT = 1
+OP_VOICE = 2
+OP_RESULT = 3
+OP_STATUS = 4
+OP_ERROR = 5
+OP_TIMELINE = 6
+
+class ProtocolError(Exception):
+    """Malformed or oversized frame"""
+
+def encode_frame(opcode: int, request_id: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(len(payload), opcode, request_id) + payload
+
+async def read_frame(reader: asyncio.StreamReader, max_size: int) -> Tuple[int, int, bytes]:
+    """
+    Read one frame from the stream
+
+    Returns:
+        Tuple[int, int, bytes]: Opcode, request id and payload
+    """
+    length, opcode, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > max_size:
+        raise ProtocolError(f"Frame of {length} bytes exceeds limit of {max_size}")
+    payload = await reader.readexactly(length) if length else b""
+    return opcode, request_id, payload
+
+def encode_text(text: str, priority: int, deadline_ms: int) -> bytes:
+    return TEXT_PREFIX.pack(priority, deadline_ms) + text.encode("utf-8")
+
+def decode_text(payload: bytes) -> Tuple[int, int, str]:
+    """
+    Returns:
+        Tuple[int, int, str]: Priority, deadline in milliseconds and text
+    """
+    priority, deadline_ms = TEXT_PREFIX.unpack_from(payload)
+    return priority, deadline_ms, payload[TEXT_PREFIX.size:].decode("utf-8")
+
+def encode_voice(file_name: str, audio: bytes) -> bytes:
+    name = file_name.encode("utf-8")[:0xFFFF]
+    return NAME_LENGTH.pack(len(name)) + name + audio
+
+def decode_voice(payload: bytes) -> Tuple[str, bytes]:
+    (name_length,) = NAME_LENGTH.unpack_from(payload)
+    start = NAME_LENGTH.size
+    name = payload[start:start + name_length].decode("utf-8", errors="replace")
+    return name, payload[start + name_length:]
+
+def encode_result(valence: float, emotion: str, model_version: Optional[str]) -> bytes:
+    label = emotion.encode("utf-8")[:0xFF]
+    return RESULT_PREFIX.pack(valence, len(label)) + label + (model_version or "").encode("utf-8")
+
+def decode_result(payload: bytes) -> Tuple[float, str, Optional[str]]:
+    valence, label_length = RESULT_PREFIX.unpack_from(payload)
+    start = RESULT_PREFIX.size
+    emotion = payload[start:start + label_length].decode("utf-8")
+    model_version = payload[start + label_length:].decode("utf-8")
+    return valence, emotion, model_version or None
+
+def encode_status(status: Dict[str, Any]) -> bytes:
+    return json.dumps(status, separators=(",", ":")).encode("utf-8")
+
+def decode_status(payload: bytes) -> Dict[str, Any]:
+    return json.loads(payload.decode("utf-8"))
@@ -0,0 +1,104 @@
+"""
+Standalone inference worker holding the emotion models.
+
+Run with `python -m inference.server`; the chat API connects to it when
+INFERENCE_MODE is "remote", so only this process imports torch.
+"""
+import asyncio
+import logging
+import os
+from typing import Set
+
+from core.config import settings
+from inference import protocol
+from services.inference import LocalInference
+from services.inference_priority import Priority
+
+logger = logging.getLogger(__name__)
+
+local_inference = LocalInference()
+
+async def handle_request(
+    opcode: int,
+    request_id: int,
+    payload: bytes,
+    writer: asyncio.StreamWriter,
+    write_lock: asyncio.Lock
+):
+    try:
+        if opcode == protocol.OP_TEXT:
+            priority, deadline_ms, text = protocol.decode_text(payload)
+            result = await local_inference.analyze_text(text, Priority(priority), deadline_ms / 1000)
+            reply = protocol.encode_frame(
+                protocol.OP_RESULT, request_id, protocol.encode_result(*result)
+            )
+        elif opcode == protocol.OP_VOICE:
+            file_name, audio_data = protocol.decode_voice(payload)
+            result = await local_inference.analyze_voice(audio_data, file_name)
+            reply = protocol.encode_frame(
+                protocol.OP_RESULT, request_id, protocol.encode_result(*result)
+            )
+        elif opcode == protocol.OP_TIMELINE:
+            file_name, audio_data = protocol.decode_voice(payload)
+            timeline = await local_inference.analyze_voice_timeline(audio_data, file_name)
+            reply = protocol.encode_frame(protocol.OP_TIMELINE, request_id, protocol.encode_status(timeline))
+        elif opcode == protocol.OP_STATUS:
+            status = await local_inference.status()
+            reply = protocol.encode_frame(protocol.OP_STATUS, request_id, protocol.encode_status(status))
+        else:
+            raise protocol.ProtocolError(f"Unknown opcode {opcode}")
+    except Exception as e:
+        logger.error(f"Error handling inference request {request_id}: {str(e)}")
+        reply = protocol.encode_frame(protocol.OP_ERROR, request_id, str(e).encode("utf-8"))
+
+    async with write_lock:
+        writer.write(reply)
+        await writer.drain()
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    write_lock = asyncio.Lock()
+    tasks: Set[asyncio.Task] = set()
+    try:
+        while True:
+            opcode, request_id, payload = await protocol.read_frame(
+                reader, settings.INFERENCE_MAX_FRAME_SIZE
+            )
+            # Requests on one connection are served concurrently so the batcher can group them
+            task = asyncio.create_task(handle_request(opcode, request_id, payload, writer, write_lock))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except asyncio.IncompleteReadError:
+        pass
+    except Exception as e:
+        logger.error(f"Inference connection error: {str(e)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.close()
+
+async def serve():
+    if settings.INFERENCE_SOCKET_PATH:
+        if os.path.exists(settings.INFERENCE_SOCKET_PATH):
+            os.unlink(settings.INFERENCE_SOCKET_PATH)
+        server = await asyncio.start_unix_server(handle_connection, path=settings.INFERENCE_SOCKET_PATH)
+        logger.info(f"Inference worker listening on {settings.INFERENCE_SOCKET_PATH}")
+    else:
+        server = await asyncio.start_server(handle_connection, settings.INFERENCE_HOST, settings.INFERENCE_PORT)
+        logger.info(f"Inference worker listening on {settings.INFERENCE_HOST}:{settings.INFERENCE_PORT}")
+
+    # Accept connections right away; status requests report warm-up progress
+    warm_up = asyncio.create_task(local_inference.warm_up())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        warm_up.cancel()
+        await local_inference.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    asyncio.run(serve())
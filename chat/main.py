@@ -1,12 +1,19 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import logging
 
-from api import api_router
+from api import api_router, health
 from core.config import settings
 from ws.chat_ws import chat_endpoint
+from ws.connection_manager import connection_manager
 from core.database import Base, async_engine
+from services.emotion_enrichment_service import emotion_enrichment_worker
+from services.emotion_risk_service import emotion_risk_detector
+from services.inference import inference
+from services.minio_service import minio_service
+from services.upload_session_service import upload_session_sweeper
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +35,7 @@ app.add_middleware(
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(health.router, prefix="/health", tags=["health"])
 
 # WebSocket endpoints
 @app.websocket("/ws/chat/{chat_id}/{user_id}")
@@ -45,7 +53,33 @@ async def startup():
         # Uncomment to create tables on startup
         # await conn.run_sync(Base.metadata.create_all)
         pass
+    await minio_service.initialize()
+    if connection_manager.relay is not None:
+        # Forked by serve.py: share broadcasts with the sibling workers
+        await connection_manager.relay.start(connection_manager)
+    if settings.MODEL_WARMUP:
+        # Models load in the background; routes without inference are served right away
+        asyncio.create_task(inference.warm_up())
+    if settings.RISK_DETECTOR_ENABLED:
+        # Before the enrichment worker starts feeding it, so no score is counted twice
+        try:
+            replayed = await emotion_risk_detector.rebuild()
+            logging.info(f"Emotional risk state rebuilt from {replayed} messages")
+        except Exception as e:
+            logging.error(f"Error rebuilding emotional risk state: {str(e)}")
+    if settings.EMOTION_ENRICH_ASYNC:
+        await emotion_enrichment_worker.start()
+    await upload_session_sweeper.start()
     logging.info("Application startup complete")
 
+@app.on_event("shutdown")
+async def shutdown():
+    await emotion_enrichment_worker.stop()
+    await upload_session_sweeper.stop()
+    await inference.close()
+    minio_service.close()
+    if connection_manager.relay is not None:
+        await connection_manager.relay.stop()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
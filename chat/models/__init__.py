@@ -1,4 +1,8 @@
 from models.user import User, UserType
 from models.chat import Chat
 from models.message import Message
-from models.user_in_chat import UserInChat
\ No newline at end of file
+from models.user_in_chat import UserInChat
+from models.emotion_rollup import EmotionRollup
+from models.patient import Patient, PatientGroup
+from models.message_attachment import MessageAttachment
+from models.upload_session import UploadSession
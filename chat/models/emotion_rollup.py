@@ -0,0 +1,19 @@
+from sqlalchemy import Column, BigInteger, Integer, Date, DateTime, Float, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from core.database import Base
+
+class EmotionRollup(Base):
+    __tablename__ = "emotion_rollup_table"
+    
+    user_id = Column(BigInteger, ForeignKey("user_table.id"), primary_key=True)
+    chat_id = Column(BigInteger, ForeignKey("chat_table.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # День по UTC, как и message_table.date
+    message_count = Column(Integer, nullable=False, default=0)
+    state_sum = Column(Float, nullable=False, default=0.0)
+    state_sum_squares = Column(Float, nullable=False, default=0.0)
+    state_min = Column(Float, nullable=True)
+    state_max = Column(Float, nullable=True)
+    emotion_counts = Column(JSONB, nullable=False, default=dict)  # {"calm": 3, "sadness": 1}
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -16,6 +16,7 @@ class Message(Base):
     text = Column(String, nullable=False)
     emotional_state = Column(Float, nullable=True)  # От -1 (очень плохое эмоциональное состояние) до 1 (очень хорошее)
     emotion = Column(String, nullable=True)  # Например: happiness, sadness, calm, anger и т.д.
+    emotion_model_version = Column(String, nullable=True)  # Модели, которыми посчитана оценка
     
     from_user = relationship("User", back_populates="messages")
     chat = relationship("Chat", back_populates="messages")
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, BigInteger, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+
+from core.database import Base
+
+class MessageAttachment(Base):
+    __tablename__ = "message_attachment_table"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    message_id = Column(BigInteger, ForeignKey("message_table.id", ondelete="CASCADE"), nullable=False, index=True)
+    object_key = Column(String, nullable=False, unique=True)  # Ключ объекта в MinIO
+    original_name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=True)  # NULL для файлов, перенесённых из message_table.media
+    content_type = Column(String, nullable=False)
+    checksum = Column(String, nullable=True)  # SHA-256 содержимого, hex
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, ForeignKey
+from sqlalchemy.orm import relationship
+
+from core.database import Base
+
+class PatientGroup(Base):
+    __tablename__ = "patient_group_table"
+    
+    id = Column(BigInteger, primary_key=True)
+    group_type_id = Column(BigInteger, nullable=False)
+    psychologist_id = Column(BigInteger, ForeignKey("user_table.id"), nullable=False)
+    
+    patients = relationship("Patient", back_populates="patient_group")
+
+class Patient(Base):
+    __tablename__ = "patient_table"
+    
+    id = Column(BigInteger, primary_key=True)
+    group_id = Column(BigInteger, ForeignKey("patient_group_table.id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("user_table.id"), nullable=False)
+    
+    patient_group = relationship("PatientGroup", back_populates="patients")
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from core.database import Base
+
+class UploadSession(Base):
+    __tablename__ = "upload_session_table"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex, выдаётся клиенту
+    message_id = Column(BigInteger, nullable=False, index=True)  # Зарезервированный id, сообщения ещё нет
+    chat_id = Column(BigInteger, ForeignKey("chat_table.id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("user_table.id"), nullable=False)
+    object_key = Column(String, nullable=False, unique=True)
+    original_name = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)  # Заявленный размер
+    multipart_upload_id = Column(String, nullable=True)  # NULL для загрузки одним PUT
+    part_count = Column(Integer, nullable=True)
+    part_size = Column(BigInteger, nullable=True)  # Размер части, кроме последней
+    uploaded_parts = Column(JSONB, nullable=False, default=dict)  # {"1": "etag"}, части принятые через WebSocket
+    status = Column(String, nullable=False, default="pending")  # pending, completed, expired
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
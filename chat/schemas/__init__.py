@@ -1,3 +1,5 @@
 from schemas.chat import Chat, ChatCreate, ChatUpdate
 from schemas.message import Message, MessageCreate, MessageUpdate, WebSocketMessage
-from schemas.user_in_chat import UserInChat, UserInChatCreate, UserInChatUpdate
\ No newline at end of file
+from schemas.user_in_chat import UserInChat, UserInChatCreate, UserInChatUpdate
+from schemas.emotion import EmotionTrendPeriod, EmotionTrendPoint, EmotionTrends
+from schemas.upload import UploadCompletion, UploadSessionBatch, UploadSessionCreate
@@ -0,0 +1,23 @@
+from datetime import date
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+class EmotionTrendPoint(BaseModel):
+    message_count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    emotions: Dict[str, int]
+
+class EmotionTrendPeriod(EmotionTrendPoint):
+    period_start: date
+
+class EmotionTrends(BaseModel):
+    user_id: int
+    chat_id: Optional[int] = None
+    granularity: str
+    start: date
+    end: date
+    points: List[EmotionTrendPeriod]
+    total: EmotionTrendPoint
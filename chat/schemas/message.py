@@ -17,12 +17,14 @@ class MessageUpdate(BaseModel):
     status: Optional[bool] = None
     emotional_state: Optional[float] = None
     emotion: Optional[str] = None
+    emotion_model_version: Optional[str] = None
 
 class FileInfo(BaseModel):
     file_path: str
     file_url: str
     file_name: str
     content_type: str
+    size: Optional[int] = None  # Unknown for files recorded before attachments were tracked
 
 class MessageInDB(MessageBase):
     id: int
@@ -37,6 +39,20 @@ class MessageInDB(MessageBase):
 class Message(MessageInDB):
     files: Optional[List[FileInfo]] = None
 
+class EmotionSegment(BaseModel):
+    start: float
+    end: float
+    emotional_state: float
+    emotion: str
+
+class VoiceEmotionTimeline(BaseModel):
+    file_path: str
+    duration: float
+    speech_duration: float
+    emotional_state: float
+    emotion: str
+    segments: List[EmotionSegment]
+
 class WebSocketMessage(BaseModel):
     type: str  # 'message', 'join', 'leave', etc.
     data: dict
\ No newline at end of file
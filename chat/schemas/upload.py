@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class UploadFileRequest(BaseModel):
+    name: str
+    size: int = Field(..., ge=0, description="Exact size in bytes; checked when the upload completes")
+    content_type: Optional[str] = None
+
+class UploadSessionCreate(BaseModel):
+    chat_id: int
+    from_user_id: int
+    files: List[UploadFileRequest] = Field(..., min_items=1)
+
+class UploadTarget(BaseModel):
+    session_id: str
+    object_key: str
+    file_name: str
+    # One PUT of the whole file to `url`, or part i (from 1) of `part_size` bytes to part_urls[i - 1]
+    url: Optional[str] = None
+    part_urls: Optional[List[str]] = None
+    part_size: Optional[int] = None
+
+class UploadSessionBatch(BaseModel):
+    message_id: int
+    expires_at: datetime
+    uploads: List[UploadTarget]
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class UploadedFile(BaseModel):
+    session_id: str
+    etag: Optional[str] = Field(None, description="ETag returned by the single PUT, verified if given")
+    parts: Optional[List[UploadedPart]] = Field(None, description="ETag of every part of a multipart upload")
+
+class UploadCompletion(BaseModel):
+    text: Optional[str] = None
+    uploads: List[UploadedFile]
@@ -0,0 +1,183 @@
+"""
+Re-score stored messages whose emotion fields are missing or outdated.
+
+    python -m scripts.backfill_emotions [--batch-size 256] [--rate 50]
+        [--checkpoint .emotion_backfill.json] [--reset] [--skip-voice]
+
+Rows are streamed in id order through a server-side cursor, scored in
+batches and written back with one executemany UPDATE per batch. The last
+written id is checkpointed after every batch, so an interrupted run resumes
+where it stopped. Each row records the model version that scored it, and
+only rows scored by a different version (or not at all) are selected, so
+re-running after a model change touches exactly the stale rows. Daily
+emotion rollups of the rows written are recomputed after every batch.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import bindparam, or_, select, update
+
+from core.database import AsyncSessionLocal, async_engine
+from models.message import Message
+from services.emotion_rollup_service import EmotionRollupService
+from services.emotion_service import emotion_service
+from services.inference_scheduler import inference_scheduler
+from services.minio_service import minio_service
+from services.voice_emotion_service import voice_emotion_service
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".m4a")
+MODEL_CHUNK_SIZE = 32
+
+def load_checkpoint(path: str, versions: Dict[str, str]) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    # A checkpoint from another model version says nothing about this run
+    if checkpoint.get("versions") != versions:
+        return 0
+    return checkpoint.get("last_id", 0)
+
+def save_checkpoint(path: str, versions: Dict[str, str], last_id: int, scored: int):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"versions": versions, "last_id": last_id, "scored": scored}, f)
+    os.replace(temp_path, path)
+
+def _voice_object(row) -> str:
+    if row.text or not row.media:
+        return ""
+    for object_name in reversed(row.media.split(",")):
+        if object_name.strip().lower().endswith(AUDIO_EXTENSIONS):
+            return object_name.strip()
+    return ""
+
+async def score_rows(rows: Sequence[Any], skip_voice: bool) -> List[Dict[str, Any]]:
+    """Score a batch of rows, returning bind parameters for the bulk UPDATE"""
+    updates = []
+    text_rows = []
+    for row in rows:
+        voice_object = _voice_object(row)
+        if not voice_object:
+            text_rows.append(row)
+        elif not skip_voice:
+            # A missing or broken file must not stop the job; the row stays stale and is retried next run
+            try:
+                audio_data = await minio_service.get_file_content(voice_object)
+                emotional_state, emotion, scored = await inference_scheduler.voice.run(
+                    voice_emotion_service.analyze_audio, audio_data, voice_object
+                )
+            except Exception as e:
+                logger.error(f"Skipping voice message {row.id} ({voice_object}): {e!r}")
+                continue
+            updates.append({
+                "b_id": row.id, "b_state": emotional_state, "b_emotion": emotion,
+                "b_version": voice_emotion_service.model_id if scored else None
+            })
+
+    for start in range(0, len(text_rows), MODEL_CHUNK_SIZE):
+        chunk = text_rows[start:start + MODEL_CHUNK_SIZE]
+        results = await inference_scheduler.text.run(
+            emotion_service.analyze_batch, [row.text for row in chunk]
+        )
+        for row, (emotional_state, emotion, scored) in zip(chunk, results):
+            # A failed model leaves the version NULL, so the row is picked up again
+            updates.append({
+                "b_id": row.id, "b_state": emotional_state, "b_emotion": emotion,
+                "b_version": emotion_service.model_id if scored else None
+            })
+    return updates
+
+async def run_backfill(batch_size: int, rate: float, checkpoint_path: str, skip_voice: bool = False) -> int:
+    """
+    Re-score every outdated message
+
+    Args:
+        batch_size: Rows fetched, scored and written per batch
+        rate: Maximum rows per second (0 for unthrottled)
+        checkpoint_path: File that stores the last written id
+        skip_voice: Leave voice messages untouched
+
+    Returns:
+        int: Number of rows written in this run
+    """
+    versions = {"text": emotion_service.model_id, "voice": voice_emotion_service.model_id}
+    last_id = load_checkpoint(checkpoint_path, versions)
+    logger.info(f"Backfilling emotions from id {last_id} with {versions}")
+
+    table = Message.__table__
+    bulk_update = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            emotional_state=bindparam("b_state"),
+            emotion=bindparam("b_emotion"),
+            emotion_model_version=bindparam("b_version")
+        )
+    )
+    query = (
+        select(table.c.id, table.c.text, table.c.media, table.c.from_user_id, table.c.chat_id, table.c.date)
+        .where(
+            table.c.id > last_id,
+            or_(
+                table.c.emotion_model_version.is_(None),
+                table.c.emotion_model_version.notin_(list(versions.values()))
+            )
+        )
+        .order_by(table.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    scored = 0
+    started = time.monotonic()
+    # The cursor lives on its own connection; writes commit per batch on another
+    async with async_engine.connect() as cursor_conn:
+        result = await cursor_conn.stream(query)
+        async for rows in result.partitions(batch_size):
+            updates = await score_rows(rows, skip_voice)
+            if updates:
+                async with async_engine.begin() as write_conn:
+                    await write_conn.execute(bulk_update, updates)
+                updated_ids = {update_row["b_id"] for update_row in updates}
+                async with AsyncSessionLocal() as db:
+                    await EmotionRollupService.refresh_buckets(db, {
+                        (row.from_user_id, row.chat_id, row.date.date())
+                        for row in rows if row.id in updated_ids
+                    })
+
+            scored += len(updates)
+            save_checkpoint(checkpoint_path, versions, rows[-1].id, scored)
+            logger.info(f"Backfilled up to id {rows[-1].id} ({scored} rows)")
+
+            # Throttle to the target rate so live traffic keeps its CPU and DB share
+            if rate > 0:
+                ahead = scored / rate - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+
+    logger.info(f"Backfill complete: {scored} rows in {time.monotonic() - started:.1f}s")
+    return scored
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--rate", type=float, default=50, help="Max rows per second, 0 for unthrottled")
+    parser.add_argument("--checkpoint", default=".emotion_backfill.json")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the first row")
+    parser.add_argument("--skip-voice", action="store_true", help="Do not download and re-score voice messages")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    asyncio.run(run_backfill(args.batch_size, args.rate, args.checkpoint, args.skip_voice))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Offline throughput and latency benchmark for the emotion models.
+
+    python -m scripts.benchmark [--backends torch onnxruntime] [--threads 1 4]
+        [--batch-sizes 1 8 32] [--text-lengths short medium long]
+        [--audio-durations 3 10 30] [--iterations 20] [--output results.json]
+
+Models are loaded from the local Hugging Face cache only (no network); the
+corpus is synthetic, from scripts.bench_corpus. Results are JSON so runs can
+be diffed or plotted against each other.
+"""
+import os
+
+# Never reach for the network: benchmarks must run on an isolated machine
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from core.config import settings
+from scripts.bench_corpus import TEXT_LENGTHS, generate_audio, generate_texts
+from services.emotion_service import EmotionService
+from services.inference_backend import create_backend
+from services.model_registry import ModelRegistry
+from services.voice_emotion_service import VoiceEmotionService
+
+logger = logging.getLogger(__name__)
+
+def measure(run: Callable[[], Any], items: int, iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time `run` and summarize latency per call and item throughput"""
+    for _ in range(warmup):
+        run()
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - started)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "iterations": iterations,
+        "throughput_items_per_s": round(items * iterations / sum(latencies), 3),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3)
+        }
+    }
+
+def set_threads(backend_name: str, threads: int):
+    if backend_name == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    else:
+        # onnxruntime sessions pick this up when they are created
+        settings.ONNX_INTRA_OP_THREADS = threads
+
+def run_backend(backend_name: str, threads: int, args) -> List[Dict[str, Any]]:
+    set_threads(backend_name, threads)
+    backend = create_backend(backend_name)
+    # A private registry keeps these instances away from the app singletons
+    registry = ModelRegistry()
+    text_service = EmotionService(backend=backend, registry=registry)
+    voice_service = VoiceEmotionService(backend=backend, registry=registry)
+    registry.load_all()
+
+    results = []
+    base = {"backend": backend_name, "threads": threads}
+
+    for length in args.text_lengths:
+        texts = generate_texts(max(args.batch_sizes), length, args.seed)
+        for batch_size in args.batch_sizes:
+            batch = texts[:batch_size]
+            tasks = {
+                "text_sentiment": lambda: text_service._sentiment_batch(batch),
+                "text_emotion": lambda: text_service._emotion_batch(batch)
+            }
+            for task, run in tasks.items():
+                if task not in args.tasks:
+                    continue
+                result = measure(run, len(batch), args.iterations, args.warmup)
+                results.append({**base, "task": task, "text_length": length, "batch_size": batch_size, **result})
+                logger.info(f"{task} {backend_name} t={threads} {length} b={batch_size}: {result['latency_ms']}")
+
+    if "voice" in args.tasks:
+        for duration in args.audio_durations:
+            audio = generate_audio(duration, seed=args.seed)
+            result = measure(lambda: voice_service.analyze_audio(audio, "bench.wav"), 1, args.iterations, args.warmup)
+            results.append({**base, "task": "voice", "audio_duration": duration, "batch_size": 1, **result})
+            logger.info(f"voice {backend_name} t={threads} {duration}s: {result['latency_ms']}")
+
+    return results
+
+def environment() -> Dict[str, Any]:
+    info = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+    for module in ("torch", "onnxruntime", "transformers"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=["torch", "onnxruntime"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--text-lengths", nargs="+", default=list(TEXT_LENGTHS), choices=list(TEXT_LENGTHS))
+    parser.add_argument("--audio-durations", type=float, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--tasks", nargs="+", default=["text_sentiment", "text_emotion", "voice"],
+                        choices=["text_sentiment", "text_emotion", "voice"])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    results = []
+    for backend_name in args.backends:
+        for threads in args.threads:
+            results.extend(run_backend(backend_name, threads, args))
+
+    report = {"environment": environment(), "arguments": vars(args), "results": results}
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Export the emotion models to dynamically int8-quantized ONNX and check parity.
+
+    python -m scripts.export_onnx export [--output DIR] [--opset 14] [--keep-fp32]
+    python -m scripts.export_onnx parity [--texts FILE] [--audio-dir DIR]
+
+Exports land in ONNX_MODEL_DIR (one directory per model, with tokenizer or
+feature extractor and config alongside the .onnx file), which is where the
+onnxruntime backend loads them from.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from core.config import settings
+from services.audio_decoder import TARGET_SAMPLE_RATE, decode_audio
+from services.emotion_service import EmotionService
+from services.inference_backend import OnnxBackend, TorchBackend
+
+logger = logging.getLogger(__name__)
+
+TEXT_MODELS = [EmotionService.SENTIMENT_MODEL_NAME, EmotionService.EMOTION_MODEL_NAME]
+AUDIO_MODELS = [settings.VOICE_EMOTION_MODEL]
+
+PARITY_TEXTS = [
+    "Спасибо, сегодня мне намного лучше",
+    "Я опять не спал всю ночь и чувствую себя ужасно",
+    "ок",
+    "Не знаю, что сказать",
+    "Меня бесит, что никто не слушает",
+    "Очень страшно выходить из дома",
+    "Ого, не ожидал такого результата!",
+    "Сегодня обычный день, ничего особенного",
+    "Мне грустно и одиноко",
+    "Дыхательные упражнения помогли, я заснул быстрее",
+]
+
+def _quantize(fp32_path: str, int8_path: str, keep_fp32: bool):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    if not keep_fp32:
+        os.remove(fp32_path)
+
+def export_text_model(model_name: str, out_dir: str, opset: int, keep_fp32: bool = False):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["Пример текста для экспорта"], return_tensors="pt")
+    input_names = list(sample.keys())
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).logits
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    torch.onnx.export(
+        LogitsOnly(),
+        tuple(sample[name] for name in input_names),
+        fp32_path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset
+    )
+    _quantize(fp32_path, os.path.join(out_dir, OnnxBackend.MODEL_FILE), keep_fp32)
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+def export_audio_model(model_name: str, out_dir: str, opset: int, keep_fp32: bool = False):
+    import torch
+    from transformers import AutoFeatureExtractor, AutoModelForAudioClassification
+
+    feature_extractor = AutoFeatureExtractor.from_pretrained(model_name)
+    model = AutoModelForAudioClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = feature_extractor(
+        np.zeros(TARGET_SAMPLE_RATE, dtype=np.float32),
+        sampling_rate=TARGET_SAMPLE_RATE,
+        return_tensors="pt"
+    )["input_values"]
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_values):
+            return self.model(input_values=input_values).logits
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    torch.onnx.export(
+        LogitsOnly(),
+        (sample,),
+        fp32_path,
+        input_names=["input_values"],
+        output_names=["logits"],
+        dynamic_axes={"input_values": {0: "batch", 1: "samples"}, "logits": {0: "batch"}},
+        opset_version=opset
+    )
+    _quantize(fp32_path, os.path.join(out_dir, OnnxBackend.MODEL_FILE), keep_fp32)
+    feature_extractor.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+def export_all(output: str, opset: int, keep_fp32: bool):
+    backend = OnnxBackend(output)
+    for model_name in TEXT_MODELS:
+        logger.info(f"Exporting {model_name}")
+        export_text_model(model_name, backend.model_dir(model_name), opset, keep_fp32)
+    for model_name in AUDIO_MODELS:
+        logger.info(f"Exporting {model_name}")
+        export_audio_model(model_name, backend.model_dir(model_name), opset, keep_fp32)
+
+def _agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    return {
+        "samples": len(reference),
+        "label_agreement": float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1))),
+        "max_abs_prob_diff": float(np.abs(reference - candidate).max()),
+        "mean_abs_prob_diff": float(np.abs(reference - candidate).mean())
+    }
+
+def parity(texts: List[str], audio_dir: str, onnx_dir: str) -> Dict[str, Dict[str, float]]:
+    """
+    Compare onnxruntime predictions against the torch backend
+
+    Returns:
+        Dict[str, Dict[str, float]]: Label agreement and probability drift per model
+    """
+    torch_backend = TorchBackend()
+    onnx_backend = OnnxBackend(onnx_dir)
+    report = {}
+
+    for model_name in TEXT_MODELS:
+        reference = torch_backend.text_classifier(model_name).predict(texts)
+        candidate = onnx_backend.text_classifier(model_name).predict(texts)
+        report[model_name] = _agreement(reference, candidate)
+
+    if audio_dir:
+        waveforms = [
+            decode_audio(open(os.path.join(audio_dir, name), "rb").read())
+            for name in sorted(os.listdir(audio_dir))
+        ]
+        for model_name in AUDIO_MODELS:
+            torch_classifier = torch_backend.audio_classifier(model_name)
+            onnx_classifier = onnx_backend.audio_classifier(model_name)
+            # One clip per pass: clips differ in length and are not padded
+            reference = np.concatenate([torch_classifier.predict([w], TARGET_SAMPLE_RATE) for w in waveforms])
+            candidate = np.concatenate([onnx_classifier.predict([w], TARGET_SAMPLE_RATE) for w in waveforms])
+            report[model_name] = _agreement(reference, candidate)
+
+    return report
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export and quantize all emotion models")
+    export_parser.add_argument("--output", default=settings.ONNX_MODEL_DIR)
+    export_parser.add_argument("--opset", type=int, default=14)
+    export_parser.add_argument("--keep-fp32", action="store_true", help="Keep the unquantized export")
+
+    parity_parser = commands.add_parser("parity", help="Report label agreement against torch")
+    parity_parser.add_argument("--onnx-dir", default=settings.ONNX_MODEL_DIR)
+    parity_parser.add_argument("--texts", help="UTF-8 file with one text per line")
+    parity_parser.add_argument("--audio-dir", help="Directory of voice clips to compare")
+    parity_parser.add_argument("--min-agreement", type=float, default=0.0,
+                               help="Exit non-zero if any model agrees less than this")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.command == "export":
+        export_all(args.output, args.opset, args.keep_fp32)
+        return
+
+    texts = PARITY_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    report = parity(texts, args.audio_dir, args.onnx_dir)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if any(result["label_agreement"] < args.min_agreement for result in report.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Rebuild the daily emotion rollups from message_table.
+
+    python -m scripts.rebuild_rollups [--user-id 42] [--since 2025-01-01]
+
+Without arguments every author is rebuilt, one transaction per author, so
+the rollup table never sits empty for long and an interrupted run can be
+repeated safely. Use after a bulk import or to repair buckets whose refresh
+failed.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+
+from core.database import AsyncSessionLocal
+from models.emotion_rollup import EmotionRollup
+from models.message import Message
+from services.emotion_rollup_service import EmotionRollupService
+
+logger = logging.getLogger(__name__)
+
+async def rebuild_rollups(user_id: Optional[int] = None, since: Optional[date] = None) -> int:
+    """
+    Rebuild rollups for one author or all of them
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    started = time.monotonic()
+    async with AsyncSessionLocal() as db:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            result = await db.execute(
+                select(Message.from_user_id).where(Message.emotional_state.isnot(None)).distinct()
+            )
+            user_ids = result.scalars().all()
+            # Authors without scored messages left keep no rollups
+            stale = delete(EmotionRollup).where(EmotionRollup.user_id.notin_(user_ids))
+            if since is not None:
+                stale = stale.where(EmotionRollup.day >= since)
+            await db.execute(stale)
+            await db.commit()
+
+        written = 0
+        for index, author_id in enumerate(user_ids, 1):
+            written += await EmotionRollupService.rebuild(db, author_id, since)
+            logger.info(f"Rebuilt rollups of user {author_id} ({index}/{len(user_ids)})")
+
+    logger.info(f"Rollup rebuild complete: {written} rows in {time.monotonic() - started:.1f}s")
+    return written
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="Only rebuild this author's rollups")
+    parser.add_argument("--since", type=date.fromisoformat, help="Only rebuild days from this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    asyncio.run(rebuild_rollups(args.user_id, args.since))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Production entry point: load the emotion models once, then fork HTTP/WS workers.
+
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+
+The master imports the application and loads every model before forking,
+so the workers share the weights copy-on-write instead of each holding its
+own copy; `gc.freeze()` keeps the collector from touching (and so copying)
+the preloaded objects. All workers accept on one listening socket. The
+master restarts workers that exit, relays WebSocket broadcasts between them
+and periodically logs each worker's RSS and PSS.
+
+Preloading only applies with INFERENCE_MODE=local (and the torch backend).
+With INFERENCE_MODE=remote, as in docker-compose, the weights live in the
+inference worker and this script just runs and supervises the workers.
+"""
+import argparse
+import gc
+import logging
+import os
+import selectors
+import signal
+import socket
+import time
+from typing import Dict
+
+from core.config import settings
+from core.process_memory import read_process_memory
+
+logger = logging.getLogger(__name__)
+
+# Seconds workers get to finish in-flight requests on shutdown
+GRACEFUL_TIMEOUT = 30
+
+def preload_models():
+    """Load the inference models in the master, before any worker is forked"""
+    if settings.INFERENCE_MODE == "remote":
+        logger.info("Models are served by the inference worker, nothing to preload")
+        return
+    if settings.INFERENCE_BACKEND != "torch":
+        # onnxruntime sessions start their thread pools on creation and those do not survive fork
+        logger.warning(f"Preloading is not supported for {settings.INFERENCE_BACKEND}, workers load their own models")
+        return
+
+    import torch
+    # One thread keeps OpenMP from starting a pool in the master; lanes set their budgets after fork
+    torch.set_num_threads(1)
+
+    from services.model_registry import model_registry
+    started = time.perf_counter()
+    model_registry.load_all()
+    logger.info(f"Preloaded models in {time.perf_counter() - started:.1f}s: {model_registry.status()}")
+
+def run_worker(index: int, app, listener: socket.socket, relay_socket: socket.socket):
+    """Body of a forked worker; never returns"""
+    os.environ["SERVER_WORKER_ID"] = str(index)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    import uvicorn
+    from services.emotion_enrichment_service import emotion_enrichment_worker
+    from services.upload_session_service import upload_session_sweeper
+    from ws.connection_manager import connection_manager
+    from ws.worker_relay import WorkerRelay
+
+    connection_manager.relay = WorkerRelay(relay_socket)
+    emotion_enrichment_worker.sweep_enabled = index == 0
+    upload_session_sweeper.sweep_enabled = index == 0
+
+    exit_code = 0
+    try:
+        # log_config=None keeps the logging set up by main
+        server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_config=None, proxy_headers=True))
+        server.run(sockets=[listener])
+    except Exception as e:
+        logger.error(f"Worker {index} crashed: {str(e)}")
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+class Master:
+    def __init__(self, app, listener: socket.socket, workers: int):
+        self.app = app
+        self.listener = listener
+        self.size = max(1, workers)
+        self.selector = selectors.DefaultSelector()
+        # index -> pid, master end of the relay socket and its partial-line buffer
+        self.workers: Dict[int, Dict] = {}
+        self.stopping = False
+
+    def spawn(self, index: int):
+        master_end, worker_end = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            master_end.close()
+            for worker in self.workers.values():
+                worker["relay"].close()
+            run_worker(index, self.app, self.listener, worker_end)
+
+        worker_end.close()
+        master_end.settimeout(5)
+        self.workers[index] = {"pid": pid, "relay": master_end, "buffer": bytearray(), "started": time.monotonic()}
+        self.selector.register(master_end, selectors.EVENT_READ, index)
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def run(self):
+        for index in range(self.size):
+            self.spawn(index)
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        next_report = time.monotonic() + settings.SERVER_MEMORY_REPORT_INTERVAL
+        while not self.stopping:
+            for key, _ in self.selector.select(timeout=1.0):
+                self._forward(key.data)
+            self._reap()
+            if settings.SERVER_MEMORY_REPORT_INTERVAL > 0 and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + settings.SERVER_MEMORY_REPORT_INTERVAL
+
+        self.shutdown()
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def _forward(self, index: int):
+        """Relay complete broadcast lines from one worker to all the others"""
+        worker = self.workers.get(index)
+        if worker is None:
+            return
+        try:
+            data = worker["relay"].recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self.selector.unregister(worker["relay"])
+            return
+
+        buffer = worker["buffer"]
+        buffer.extend(data)
+        end = buffer.rfind(b"\n") + 1
+        if not end:
+            return
+        lines = bytes(buffer[:end])
+        del buffer[:end]
+        for other_index, other in self.workers.items():
+            if other_index == index:
+                continue
+            try:
+                other["relay"].sendall(lines)
+            except OSError as e:
+                logger.warning(f"Could not relay broadcast to worker {other_index}: {str(e)}")
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = next((i for i, worker in self.workers.items() if worker["pid"] == pid), None)
+            if index is None:
+                continue
+            worker = self.workers.pop(index)
+            try:
+                self.selector.unregister(worker["relay"])
+            except (KeyError, ValueError):
+                pass
+            worker["relay"].close()
+            if self.stopping:
+                continue
+            logger.error(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            if time.monotonic() - worker["started"] < 1:
+                # Do not spin when a worker cannot start at all
+                time.sleep(1)
+            self.spawn(index)
+
+    def report_memory(self):
+        """Log RSS and PSS of the master and every worker"""
+        master = read_process_memory()
+        lines = [f"master (pid {os.getpid()}): rss {master.get('rss', 0) // 1024} MB, pss {master.get('pss', 0) // 1024} MB"]
+        total_pss = master.get("pss", 0)
+        for index, worker in sorted(self.workers.items()):
+            memory = read_process_memory(worker["pid"])
+            total_pss += memory.get("pss", 0)
+            lines.append(
+                f"worker {index} (pid {worker['pid']}): rss {memory.get('rss', 0) // 1024} MB, "
+                f"pss {memory.get('pss', 0) // 1024} MB, shared {(memory.get('shared_clean', 0) + memory.get('shared_dirty', 0)) // 1024} MB"
+            )
+        logger.info("Memory: " + "; ".join(lines) + f"; total pss {total_pss // 1024} MB")
+
+    def shutdown(self):
+        logger.info("Stopping workers")
+        for worker in self.workers.values():
+            try:
+                os.kill(worker["pid"], signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in self.workers.values():
+            try:
+                os.kill(worker["pid"], signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.listener.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    args = parser.parse_args(argv)
+
+    # Importing the app configures logging and builds every service singleton once, in the master
+    from main import app
+
+    preload_models()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(2048)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    # Move everything loaded so far out of the collector's reach so workers keep sharing those pages
+    gc.collect()
+    gc.freeze()
+
+    Master(app, listener, args.workers).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.message import Message
+from models.message_attachment import MessageAttachment
+from services.minio_service import StoredFile, minio_service
+
+logger = logging.getLogger(__name__)
+
+class AttachmentService:
+    """
+    Files attached to messages, one message_attachment_table row per object.
+
+    The rows are the source of truth for listing: a page of history costs
+    one indexed query, and since a row proves its object exists, presigned
+    URLs are signed without asking storage. `message_table.media` is still
+    written as the comma-joined keys for older readers.
+    """
+
+    @staticmethod
+    def build_attachments(message_id: int, files: Iterable[StoredFile]) -> List[MessageAttachment]:
+        """Attachment rows for stored files, to be added in the caller's transaction"""
+        return [
+            MessageAttachment(
+                message_id=message_id,
+                object_key=file.object_name,
+                original_name=file.original_name,
+                size=file.size,
+                content_type=file.content_type,
+                checksum=file.checksum
+            )
+            for file in files
+        ]
+
+    @staticmethod
+    async def add_attachments(db: AsyncSession, message_id: int, files: Iterable[StoredFile]) -> List[MessageAttachment]:
+        attachments = AttachmentService.build_attachments(message_id, files)
+        if not attachments:
+            return []
+        db.add_all(attachments)
+        await db.flush()
+        await AttachmentService._sync_media(db, message_id)
+        await db.commit()
+        return attachments
+
+    @staticmethod
+    async def get_for_message(db: AsyncSession, message_id: int) -> List[MessageAttachment]:
+        return (await AttachmentService.get_for_messages(db, [message_id])).get(message_id, [])
+
+    @staticmethod
+    async def get_for_messages(db: AsyncSession, message_ids: Iterable[int]) -> Dict[int, List[MessageAttachment]]:
+        """Attachments of many messages with one query, by message id in upload order"""
+        message_ids = list(set(message_ids))
+        if not message_ids:
+            return {}
+        result = await db.execute(
+            select(MessageAttachment)
+            .filter(MessageAttachment.message_id.in_(message_ids))
+            .order_by(MessageAttachment.message_id, MessageAttachment.id)
+        )
+        attachments: Dict[int, List[MessageAttachment]] = defaultdict(list)
+        for attachment in result.scalars().all():
+            attachments[attachment.message_id].append(attachment)
+        return attachments
+
+    @staticmethod
+    def find(attachments: List[MessageAttachment], file_name: str) -> Optional[MessageAttachment]:
+        """Attachment addressed by its object key or the last part of it"""
+        for attachment in attachments:
+            if attachment.object_key == file_name or attachment.object_key.endswith(f"/{file_name}"):
+                return attachment
+        return None
+
+    @staticmethod
+    async def remove_attachment(db: AsyncSession, attachment: MessageAttachment):
+        await db.execute(delete(MessageAttachment).where(MessageAttachment.id == attachment.id))
+        await AttachmentService._sync_media(db, attachment.message_id)
+        await db.commit()
+
+    @staticmethod
+    async def _sync_media(db: AsyncSession, message_id: int):
+        keys = (await db.execute(
+            select(MessageAttachment.object_key)
+            .filter(MessageAttachment.message_id == message_id)
+            .order_by(MessageAttachment.id)
+        )).scalars().all()
+        await db.execute(
+            update(Message)
+            .where(Message.id == message_id)
+            .values(media=",".join(keys) if keys else None)
+        )
+
+    @staticmethod
+    async def describe(attachments: List[MessageAttachment]) -> List[Dict[str, Any]]:
+        """
+        File info with presigned URLs for the given attachments
+
+        Files whose URL cannot be signed are skipped.
+        """
+        files_data = []
+        for attachment in attachments:
+            try:
+                file_url = await minio_service.get_file_url(attachment.object_key, known=True)
+            except Exception as e:
+                logger.error(f"Error processing file {attachment.object_key}: {str(e)}")
+                continue
+            files_data.append({
+                "file_path": attachment.object_key,
+                "file_url": file_url,
+                "file_name": attachment.original_name,
+                "content_type": attachment.content_type,
+                "size": attachment.size
+            })
+        return files_data
+
+    @staticmethod
+    async def attach_files(messages: List[Any], attachments: Dict[int, List[MessageAttachment]]):
+        """Set `files` and the presigned URLs in `media` on messages about to be returned"""
+        for message in messages:
+            files_data = await AttachmentService.describe(attachments.get(message.id, []))
+            message.media = ",".join(file["file_url"] for file in files_data) if files_data else None
+            message.files = files_data
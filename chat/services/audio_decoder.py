@@ -0,0 +1,151 @@
+import io
+import logging
+import subprocess
+import threading
+from typing import BinaryIO, Iterator, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+class AudioDecodeError(Exception):
+    """The payload could not be decoded as audio"""
+
+def decode_audio(data: Union[bytes, BinaryIO], target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an encoded audio payload to mono float32 samples, in memory
+    
+    WAV, FLAC and OGG (and MP3 with libsndfile >= 1.1) are decoded by
+    soundfile from a BytesIO; anything else (e.g. m4a) is piped through
+    ffmpeg over stdin/stdout. No temporary files are written.
+    
+    Args:
+        data: Encoded audio as bytes or a readable binary buffer
+        target_sr: Sample rate of the returned samples
+        
+    Returns:
+        np.ndarray: Mono float32 samples at target_sr
+    """
+    payload = data if isinstance(data, (bytes, bytearray)) else data.read()
+    if not payload:
+        raise AudioDecodeError("Empty audio payload")
+
+    try:
+        samples, sample_rate = _decode_soundfile(payload)
+    except Exception as e:
+        logger.debug(f"soundfile could not decode audio, falling back to ffmpeg: {str(e)}")
+        return _decode_ffmpeg(payload, target_sr)
+
+    return resample(samples, sample_rate, target_sr)
+
+def iter_audio_blocks(
+    data: Union[bytes, BinaryIO],
+    target_sr: int = TARGET_SAMPLE_RATE,
+    block_seconds: float = 5.0
+) -> Iterator[np.ndarray]:
+    """
+    Decode an encoded audio payload block by block
+    
+    Only one block of decoded samples is held at a time, so memory does not
+    grow with the length of the recording.
+    
+    Args:
+        data: Encoded audio as bytes or a readable binary buffer
+        target_sr: Sample rate of the yielded samples
+        block_seconds: Approximate duration of each yielded block
+        
+    Yields:
+        np.ndarray: Consecutive mono float32 blocks at target_sr
+    """
+    payload = data if isinstance(data, (bytes, bytearray)) else data.read()
+    if not payload:
+        raise AudioDecodeError("Empty audio payload")
+
+    try:
+        import soundfile as sf
+        sound_file = sf.SoundFile(io.BytesIO(payload))
+    except Exception as e:
+        logger.debug(f"soundfile could not open audio, streaming through ffmpeg: {str(e)}")
+        yield from _iter_ffmpeg_blocks(payload, target_sr, block_seconds)
+        return
+
+    with sound_file:
+        blocksize = max(1, int(sound_file.samplerate * block_seconds))
+        for block in sound_file.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+            yield resample(block.mean(axis=1), sound_file.samplerate, target_sr)
+
+def resample(samples: np.ndarray, sample_rate: int, target_sr: int) -> np.ndarray:
+    if sample_rate == target_sr:
+        return samples
+    import librosa
+    return librosa.resample(samples, orig_sr=sample_rate, target_sr=target_sr).astype(np.float32)
+
+def _decode_soundfile(payload: bytes):
+    import soundfile as sf
+    samples, sample_rate = sf.read(io.BytesIO(payload), dtype="float32", always_2d=True)
+    # Downmix to mono
+    return samples.mean(axis=1), sample_rate
+
+def _decode_ffmpeg(payload: bytes, target_sr: int) -> np.ndarray:
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(target_sr),
+        "pipe:1"
+    ]
+    try:
+        result = subprocess.run(command, input=payload, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError("Unsupported audio format and ffmpeg is not installed")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"ffmpeg failed to decode audio: {e.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def _iter_ffmpeg_blocks(payload: bytes, target_sr: int, block_seconds: float) -> Iterator[np.ndarray]:
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(target_sr),
+        "pipe:1"
+    ]
+    try:
+        process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("Unsupported audio format and ffmpeg is not installed")
+
+    def feed():
+        try:
+            process.stdin.write(payload)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+
+    # Feed stdin from a thread so a full stdout pipe cannot deadlock us
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    block_bytes = max(4, int(target_sr * block_seconds)) * 4
+    try:
+        while True:
+            chunk = process.stdout.read(block_bytes)
+            if not chunk:
+                break
+            # float32 samples never straddle reads of a multiple-of-4 size except at EOF
+            usable = len(chunk) - len(chunk) % 4
+            yield np.frombuffer(chunk[:usable], dtype=np.float32)
+        process.wait()
+    finally:
+        # Only reached with a live process when the consumer stopped early
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        feeder.join()
+
+    if process.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg failed to decode audio (exit code {process.returncode})")
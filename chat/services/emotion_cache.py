@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+class EmotionCache:
+    """
+    Bounded LRU cache of text emotion results with a TTL.
+
+    Keys are a hash of the normalized text plus the model identifier, so a
+    model change never serves stale scores. When a Redis URL is configured
+    the results are also shared between workers; the local LRU stays in
+    front of it so hot phrases cost no network round-trip.
+    """
+
+    def __init__(self, model_id: str, max_size: int, ttl: int, redis_url: Optional[str] = None):
+        self.model_id = model_id
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[float, str]]]" = OrderedDict()
+        self._redis = self._connect_shared_store(redis_url) if redis_url else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _connect_shared_store(redis_url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logger.warning("EMOTION_CACHE_REDIS_URL is set but the redis package is not installed")
+            return None
+        return redis.from_url(redis_url)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_id}\0{self.normalize(text)}".encode("utf-8"))
+        return f"emotion:{digest.hexdigest()}"
+
+    async def get(self, text: str) -> Optional[Tuple[float, str]]:
+        """Cached (emotional_state, emotion) for the text, or None"""
+        if self.max_size <= 0:
+            return None
+
+        key = self.key(text)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                logger.warning(f"Shared emotion cache unavailable: {str(e)}")
+                raw = None
+            if raw is not None:
+                state, _, emotion = raw.decode("utf-8").partition("|")
+                value = (float(state), emotion)
+                self._store(key, value)
+                self.shared_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, value: Tuple[float, str]):
+        if self.max_size <= 0:
+            return
+
+        key = self.key(text)
+        self._store(key, value)
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, f"{value[0]}|{value[1]}", ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared emotion cache unavailable: {str(e)}")
+
+    def _store(self, key: str, value: Tuple[float, str]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            "shared": self._redis is not None
+        }
@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import logging
+from typing import Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.message import Message
+from services.emotion_risk_service import emotion_risk_detector
+from services.emotion_rollup_service import EmotionRollupService
+from services.inference import inference
+from services.inference_priority import Priority
+from ws.connection_manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+class EmotionEnrichmentWorker:
+    """
+    Background scoring of messages stored with empty emotion fields.
+
+    The message table itself is the durable backlog: every row whose
+    `emotion` is NULL is pending. Ids are queued in memory for low latency,
+    and the table is swept on startup and periodically so nothing is lost
+    across restarts or when the in-memory queue is dropped. Fresh messages
+    and edits are served before rows found by the sweep.
+    """
+
+    SWEEP_PAGE_SIZE = 500
+
+    def __init__(self, concurrency: int, sweep_interval: int):
+        self.concurrency = max(1, concurrency)
+        self.sweep_interval = sweep_interval
+        # With several server workers only one of them sweeps the table
+        self.sweep_enabled = True
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pending: Set[int] = set()
+        self._sequence = itertools.count()
+        self._tasks = []
+
+    def enqueue(self, message_id: int, priority: Priority = Priority.LIVE):
+        """Schedule a stored message for emotion scoring"""
+        if self._queue is None or message_id in self._pending:
+            return
+        self._pending.add(message_id)
+        self._queue.put_nowait((priority, next(self._sequence), message_id))
+
+    async def start(self):
+        """Start the scoring workers and the backlog sweeper"""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        # Several workers in flight let the batcher group their requests
+        self._tasks = [
+            asyncio.create_task(self._run()) for _ in range(self.concurrency)
+        ]
+        if self.sweep_enabled:
+            self._tasks.append(asyncio.create_task(self._sweep_forever()))
+        logger.info(f"Emotion enrichment started with {self.concurrency} workers")
+
+    async def stop(self):
+        """Cancel all background tasks; unscored rows are picked up on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                queued = await self.sweep()
+                if queued:
+                    logger.info(f"Re-queued {queued} unscored messages")
+            except Exception as e:
+                logger.error(f"Error sweeping unscored messages: {str(e)}")
+            if self.sweep_interval <= 0:
+                return
+            await asyncio.sleep(self.sweep_interval)
+
+    async def sweep(self) -> int:
+        """
+        Queue every stored message that still has no emotion
+
+        Returns:
+            int: Number of newly queued messages
+        """
+        queued = 0
+        last_id = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(
+                    select(Message.id)
+                    .filter(Message.emotion.is_(None), Message.id > last_id)
+                    .order_by(Message.id)
+                    .limit(self.SWEEP_PAGE_SIZE)
+                )
+                ids = result.scalars().all()
+                if not ids:
+                    return queued
+                for message_id in ids:
+                    if message_id not in self._pending:
+                        self.enqueue(message_id, Priority.BACKFILL)
+                        queued += 1
+                last_id = ids[-1]
+
+    async def _run(self):
+        while True:
+            priority, _, message_id = await self._queue.get()
+            try:
+                await self._enrich(message_id, priority)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The row stays NULL and is retried by the next sweep
+                logger.error(f"Error enriching message {message_id}: {str(e)}")
+            finally:
+                self._pending.discard(message_id)
+
+    async def _enrich(self, message_id: int, priority: Priority):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Message.text, Message.chat_id, Message.from_user_id, Message.date)
+                .filter(Message.id == message_id, Message.emotion.is_(None))
+            )
+            row = result.first()
+            if row is None:
+                return
+
+            # Heuristic fallbacks are stored without a model version for the backfill job
+            emotional_state, emotion, model_version = await inference.analyze_text(row.text, priority)
+
+            # Do not overwrite scores written by another worker or a voice update
+            result = await db.execute(
+                update(Message)
+                .where(Message.id == message_id, Message.emotion.is_(None))
+                .values(
+                    emotional_state=emotional_state,
+                    emotion=emotion,
+                    emotion_model_version=model_version
+                )
+            )
+            await db.commit()
+            if result.rowcount == 0:
+                return
+            await EmotionRollupService.refresh_for_message(db, row)
+
+        # Only fresh messages feed the risk detector; edits and backfilled rows are not new signal
+        if priority == Priority.LIVE:
+            await emotion_risk_detector.observe(row.from_user_id, emotional_state, emotion, message_id, row.chat_id)
+
+        await connection_manager.broadcast({
+            "type": "message_emotion",
+            "data": {
+                "message_id": message_id,
+                "chat_id": row.chat_id,
+                "emotional_state": emotional_state,
+                "emotion": emotion
+            }
+        }, row.chat_id)
+
+# Singleton instance
+emotion_enrichment_worker = EmotionEnrichmentWorker(
+    concurrency=settings.EMOTION_ENRICH_CONCURRENCY,
+    sweep_interval=settings.EMOTION_ENRICH_SWEEP_INTERVAL
+)
@@ -0,0 +1,244 @@
+import logging
+import math
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.future import select
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.message import Message
+from models.patient import Patient, PatientGroup
+from ws.connection_manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+# Relayed between server workers so every worker tracks every patient
+OBSERVATION_EVENT = "emotion_risk_observation"
+
+# Conditions that stay raised until they clear; a sudden drop is judged per message
+LOW_MEAN = 1
+NEGATIVE_STREAK = 2
+CONDITIONS = {LOW_MEAN: "low_mean", NEGATIVE_STREAK: "negative_streak"}
+
+# Floor of the EWMA deviation, so a patient with very steady scores does not alert on small changes
+MIN_STDDEV = 0.1
+
+class PatientRisk:
+    """Running state of one patient: EWMA mean and variance plus the negative streak"""
+
+    __slots__ = ("mean", "variance", "count", "streak", "active", "last_alert")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+        self.streak = 0
+        self.active = 0  # Bit set of raised conditions
+        self.last_alert = 0.0
+
+class EmotionRiskDetector:
+    """
+    Streaming detector of patients whose emotional state is getting worse.
+
+    Every newly scored patient message updates an exponentially weighted
+    mean and variance of `emotional_state` and a counter of consecutive
+    negative messages, in O(1) time and a few numbers per patient. An alert
+    is pushed over the WebSocket layer to the patient's psychologists when
+    the mean falls below the threshold, the streak gets long enough, or a
+    message lands far below the running mean; conditions alert when they
+    are first crossed and again only after clearing, at most once per
+    cooldown. State is rebuilt from recent messages on startup, without
+    alerting, and observations are shared with sibling server workers.
+    """
+
+    def __init__(self):
+        self.alpha = min(1.0, max(0.0, settings.RISK_EWMA_ALPHA))
+        self.patients: Dict[int, PatientRisk] = {}
+        # user_id -> (expiry, psychologist ids); empty for users who are not patients
+        self._psychologists: Dict[int, Tuple[float, Tuple[int, ...]]] = {}
+        self._observations = 0
+        self._rebuilt = 0
+        self._alerts: Counter = Counter()
+        self._suppressed = 0
+
+    async def observe(
+        self,
+        user_id: int,
+        emotional_state: Optional[float],
+        emotion: Optional[str] = None,
+        message_id: Optional[int] = None,
+        chat_id: Optional[int] = None
+    ):
+        """
+        Feed a newly scored message and alert the psychologists if a threshold is crossed
+
+        Messages of users who are not patients are ignored. Failures are
+        logged and never propagate to the caller.
+        """
+        if not settings.RISK_DETECTOR_ENABLED or emotional_state is None:
+            return
+        try:
+            psychologists = await self._psychologists_of(user_id)
+            if not psychologists:
+                return
+            reasons = self._update(user_id, emotional_state, alert=True)
+            await connection_manager.publish({
+                "type": OBSERVATION_EVENT,
+                "user_id": user_id,
+                "emotional_state": emotional_state
+            })
+            if reasons:
+                await self._send_alert(psychologists, user_id, reasons, emotional_state, emotion, message_id, chat_id)
+        except Exception as e:
+            logger.error(f"Error updating emotional risk of user {user_id}: {str(e)}")
+
+    async def apply_relayed(self, event: dict):
+        """Update state from an observation made by a sibling worker; that worker sends the alerts"""
+        self._update(event["user_id"], event["emotional_state"], alert=False)
+
+    def _update(self, user_id: int, value: float, alert: bool) -> List[str]:
+        """
+        Add one score to the patient's state
+
+        Returns:
+            List[str]: Reasons to alert now; always empty when `alert` is False
+        """
+        state = self.patients.get(user_id)
+        if state is None:
+            state = self.patients[user_id] = PatientRisk()
+        self._observations += 1
+
+        # Judge the drop against the state before this message
+        dropped = (
+            state.count >= settings.RISK_MIN_MESSAGES
+            and state.mean - value > settings.RISK_DROP_SIGMAS * max(math.sqrt(state.variance), MIN_STDDEV)
+        )
+
+        if state.count == 0:
+            state.mean = value
+        else:
+            # Incremental EWMA of the mean and variance
+            diff = value - state.mean
+            increment = self.alpha * diff
+            state.mean += increment
+            state.variance = (1 - self.alpha) * (state.variance + diff * increment)
+        state.count += 1
+        state.streak = state.streak + 1 if value < settings.RISK_NEGATIVE_LEVEL else 0
+
+        active = 0
+        if state.count >= settings.RISK_MIN_MESSAGES and state.mean < settings.RISK_MEAN_THRESHOLD:
+            active |= LOW_MEAN
+        if settings.RISK_NEGATIVE_STREAK > 0 and state.streak >= settings.RISK_NEGATIVE_STREAK:
+            active |= NEGATIVE_STREAK
+        raised = active & ~state.active
+        state.active = active
+
+        if not alert or not (raised or dropped):
+            return []
+        now = time.monotonic()
+        if state.last_alert and now - state.last_alert < settings.RISK_ALERT_COOLDOWN:
+            self._suppressed += 1
+            return []
+        state.last_alert = now
+
+        reasons = [name for bit, name in CONDITIONS.items() if raised & bit]
+        if dropped:
+            reasons.append("sudden_drop")
+        self._alerts.update(reasons)
+        return reasons
+
+    async def _send_alert(
+        self,
+        psychologists: Tuple[int, ...],
+        user_id: int,
+        reasons: List[str],
+        emotional_state: float,
+        emotion: Optional[str],
+        message_id: Optional[int],
+        chat_id: Optional[int]
+    ):
+        state = self.patients[user_id]
+        alert = {
+            "type": "emotion_risk_alert",
+            "data": {
+                # Lets clients drop the copies arriving on each of their open chat sockets
+                "alert_id": uuid.uuid4().hex,
+                "patient_id": user_id,
+                "message_id": message_id,
+                "chat_id": chat_id,
+                "reasons": reasons,
+                "emotional_state": emotional_state,
+                "emotion": emotion,
+                "mean": state.mean,
+                "stddev": math.sqrt(state.variance),
+                "negative_streak": state.streak,
+                "message_count": state.count,
+                "date": datetime.utcnow().isoformat()
+            }
+        }
+        logger.warning(f"Emotional risk alert for patient {user_id}: {', '.join(reasons)}")
+        for psychologist_id in psychologists:
+            await connection_manager.send_to_user(alert, psychologist_id)
+
+    async def _psychologists_of(self, user_id: int) -> Tuple[int, ...]:
+        """Psychologists of every group the user is a patient in, cached for a while"""
+        now = time.monotonic()
+        cached = self._psychologists.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PatientGroup.psychologist_id)
+                .join(Patient, Patient.group_id == PatientGroup.id)
+                .filter(Patient.user_id == user_id)
+                .distinct()
+            )
+            psychologists = tuple(result.scalars().all())
+        self._psychologists[user_id] = (now + settings.RISK_PATIENT_CACHE_TTL, psychologists)
+        return psychologists
+
+    async def rebuild(self) -> int:
+        """
+        Replay scored patient messages of the last RISK_REBUILD_HOURS, oldest first, without alerting
+
+        Returns:
+            int: Number of messages replayed
+        """
+        self.patients.clear()
+        since = datetime.utcnow() - timedelta(hours=settings.RISK_REBUILD_HOURS)
+        replayed = 0
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(Message.from_user_id, Message.emotional_state)
+                .filter(
+                    Message.date >= since,
+                    Message.emotional_state.isnot(None),
+                    Message.from_user_id.in_(select(Patient.user_id))
+                )
+                .order_by(Message.date, Message.id)
+            )
+            async for user_id, emotional_state in result:
+                self._update(user_id, emotional_state, alert=False)
+                replayed += 1
+        self._rebuilt = replayed
+        return replayed
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.RISK_DETECTOR_ENABLED,
+            "patients": len(self.patients),
+            "at_risk": sum(1 for state in self.patients.values() if state.active),
+            "observations": self._observations,
+            "rebuilt_from": self._rebuilt,
+            "alerts": dict(self._alerts),
+            "suppressed": self._suppressed
+        }
+
+# Singleton instance
+emotion_risk_detector = EmotionRiskDetector()
+connection_manager.register_handler(OBSERVATION_EVENT, emotion_risk_detector.apply_relayed)
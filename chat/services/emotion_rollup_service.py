@@ -0,0 +1,217 @@
+import logging
+import math
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, exists, func, literal_column, select
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.emotion_rollup import EmotionRollup
+from models.message import Message
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLUMNS = [
+    "user_id", "chat_id", "day", "message_count", "state_sum", "state_sum_squares",
+    "state_min", "state_max", "emotion_counts", "updated_at"
+]
+
+class EmotionRollupService:
+    """
+    Daily emotion aggregates per (author, chat, day).
+
+    A bucket is recomputed from its own messages whenever one of them is
+    scored, re-scored or deleted, so re-scoring never leaves stale sums or
+    extremes behind and the cost is bounded by one author's messages of one
+    day. Trends for any date range read one row per day and chat, however
+    many messages there are.
+    """
+
+    @staticmethod
+    def _aggregate_insert(*filters):
+        """INSERT ... SELECT building rollup rows for all scored messages matching `filters`"""
+        state = cast(Message.emotional_state, DOUBLE_PRECISION)
+        day = cast(Message.date, Date)
+
+        # Per-label counts first, so the outer query can build the histogram
+        per_emotion = (
+            select(
+                Message.from_user_id.label("user_id"),
+                Message.chat_id.label("chat_id"),
+                day.label("day"),
+                Message.emotion.label("emotion"),
+                func.count().label("n"),
+                func.sum(state).label("state_sum"),
+                func.sum(state * state).label("state_sum_squares"),
+                func.min(state).label("state_min"),
+                func.max(state).label("state_max")
+            )
+            .where(Message.emotional_state.isnot(None), *filters)
+            .group_by(Message.from_user_id, Message.chat_id, day, Message.emotion)
+            .subquery()
+        )
+        histogram = func.jsonb_object_agg(per_emotion.c.emotion, per_emotion.c.n).filter(
+            per_emotion.c.emotion.isnot(None)
+        )
+        rows = select(
+            per_emotion.c.user_id,
+            per_emotion.c.chat_id,
+            per_emotion.c.day,
+            func.sum(per_emotion.c.n),
+            func.sum(per_emotion.c.state_sum),
+            func.sum(per_emotion.c.state_sum_squares),
+            func.min(per_emotion.c.state_min),
+            func.max(per_emotion.c.state_max),
+            func.coalesce(histogram, literal_column("'{}'::jsonb")),
+            func.now()
+        ).group_by(per_emotion.c.user_id, per_emotion.c.chat_id, per_emotion.c.day)
+
+        statement = insert(EmotionRollup).from_select(ROLLUP_COLUMNS, rows)
+        return statement.on_conflict_do_update(
+            index_elements=["user_id", "chat_id", "day"],
+            set_={name: statement.excluded[name] for name in ROLLUP_COLUMNS[3:]}
+        )
+
+    @staticmethod
+    def _bucket_filters(user_id: int, chat_id: int, day: date):
+        start = datetime.combine(day, time.min)
+        return (
+            Message.from_user_id == user_id,
+            Message.chat_id == chat_id,
+            Message.date >= start,
+            Message.date < start + timedelta(days=1)
+        )
+
+    @staticmethod
+    async def refresh_buckets(db: AsyncSession, buckets: Iterable[Tuple[int, int, date]]):
+        """
+        Recompute the given (user_id, chat_id, day) buckets and commit
+
+        Buckets left without scored messages are removed.
+        """
+        for user_id, chat_id, day in set(buckets):
+            filters = EmotionRollupService._bucket_filters(user_id, chat_id, day)
+            await db.execute(EmotionRollupService._aggregate_insert(*filters))
+            await db.execute(
+                delete(EmotionRollup)
+                .where(
+                    EmotionRollup.user_id == user_id,
+                    EmotionRollup.chat_id == chat_id,
+                    EmotionRollup.day == day,
+                    ~exists().where(Message.emotional_state.isnot(None), *filters)
+                )
+            )
+        await db.commit()
+
+    @staticmethod
+    async def refresh_for_message(db: AsyncSession, message: Any):
+        """
+        Recompute the bucket of a message after its scores changed
+
+        Failures are logged and never propagate to the message request;
+        the rebuild command repairs any bucket missed here.
+        """
+        try:
+            await EmotionRollupService.refresh_buckets(
+                db, [(message.from_user_id, message.chat_id, message.date.date())]
+            )
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Ошибка при обновлении агрегатов эмоций: {str(e)}")
+
+    @staticmethod
+    async def rebuild(db: AsyncSession, user_id: Optional[int] = None, since: Optional[date] = None) -> int:
+        """
+        Rebuild rollups from message_table, for one author and/or from a day on
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        message_filters = []
+        rollup_filters = []
+        if user_id is not None:
+            message_filters.append(Message.from_user_id == user_id)
+            rollup_filters.append(EmotionRollup.user_id == user_id)
+        if since is not None:
+            message_filters.append(Message.date >= datetime.combine(since, time.min))
+            rollup_filters.append(EmotionRollup.day >= since)
+
+        await db.execute(delete(EmotionRollup).where(*rollup_filters))
+        result = await db.execute(EmotionRollupService._aggregate_insert(*message_filters))
+        await db.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def get_trends(
+        db: AsyncSession,
+        user_id: int,
+        start: date,
+        end: date,
+        granularity: str = "day",
+        chat_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Emotion trend of an author between two days inclusive, by day or ISO week
+
+        Returns:
+            Dict[str, Any]: Points per period and a total over the whole range
+        """
+        query = select(EmotionRollup).where(
+            EmotionRollup.user_id == user_id,
+            EmotionRollup.day >= start,
+            EmotionRollup.day <= end
+        )
+        if chat_id is not None:
+            query = query.where(EmotionRollup.chat_id == chat_id)
+        rollups = (await db.execute(query)).scalars().all()
+
+        periods: Dict[date, Dict[str, Any]] = {}
+        total = EmotionRollupService._empty()
+        for rollup in rollups:
+            period = rollup.day if granularity == "day" else rollup.day - timedelta(days=rollup.day.weekday())
+            EmotionRollupService._merge(periods.setdefault(period, EmotionRollupService._empty()), rollup)
+            EmotionRollupService._merge(total, rollup)
+
+        return {
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "points": [
+                {"period_start": period, **EmotionRollupService._summary(periods[period])}
+                for period in sorted(periods)
+            ],
+            "total": EmotionRollupService._summary(total)
+        }
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {"count": 0, "sum": 0.0, "sum_squares": 0.0, "min": None, "max": None, "emotions": Counter()}
+
+    @staticmethod
+    def _merge(accumulator: Dict[str, Any], rollup: EmotionRollup):
+        accumulator["count"] += rollup.message_count
+        accumulator["sum"] += rollup.state_sum
+        accumulator["sum_squares"] += rollup.state_sum_squares
+        if rollup.state_min is not None:
+            accumulator["min"] = rollup.state_min if accumulator["min"] is None else min(accumulator["min"], rollup.state_min)
+        if rollup.state_max is not None:
+            accumulator["max"] = rollup.state_max if accumulator["max"] is None else max(accumulator["max"], rollup.state_max)
+        accumulator["emotions"].update(rollup.emotion_counts or {})
+
+    @staticmethod
+    def _summary(accumulator: Dict[str, Any]) -> Dict[str, Any]:
+        count = accumulator["count"]
+        mean = accumulator["sum"] / count if count else None
+        stddev = math.sqrt(max(0.0, accumulator["sum_squares"] / count - mean * mean)) if count else None
+        return {
+            "message_count": count,
+            "mean": mean,
+            "stddev": stddev,
+            "min": accumulator["min"],
+            "max": accumulator["max"],
+            "emotions": dict(accumulator["emotions"])
+        }
@@ -1,47 +1,146 @@
+import asyncio
+import itertools
 import logging
+import random
+import threading
 import numpy as np
-import os
-import urllib.request
-import tempfile
-from typing import Optional
-import librosa
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from core.config import settings
+from services.emotion_cache import EmotionCache
+from services.inference_backend import inference_backend
+from services.inference_priority import (
+    EmotionResult,
+    Priority,
+    SheddingStats,
+    deadline_budget,
+    heuristic_emotion
+)
+from services.inference_scheduler import InferenceLane, inference_scheduler
+from services.lexicon_scorer import LEXICON_VERSION, LexiconScore, lexicon_scorer
+from services.model_registry import ModelRegistry, model_registry
 
 logger = logging.getLogger(__name__)
 
-class EmotionService:
+# Маппинг на английские названия для единообразия с требованием задачи
+EMOTION_MAP = {
+    "нейтральность": "calm",
+    "радость": "happiness",
+    "грусть": "sadness",
+    "удивление": "surprise",
+    "страх": "fear",
+    "гнев": "anger"
+}
+
+
+class TierStats:
+    """
+    Метрики словарного уровня для подбора порога уверенности.
+
+    Согласие со словарём считается по всем текстам, которые прошли через
+    модели: эскалированным и выборочно проверенным уверенным. Разбивка по
+    корзинам уверенности показывает, где словарь начинает расходиться
+    с моделями.
+    """
+
+    # Тон ближе к нулю считается нейтральным при сравнении знака
+    NEUTRAL_BAND = 0.2
+
     def __init__(self):
-        try:
-            # Инициализация моделей для текста
-            # Модель для определения общего эмоционального тона (от -1 до 1)
-            self.sentiment_analyzer = pipeline(
-                "sentiment-analysis", 
-                model="blanchefort/rubert-base-cased-sentiment"
-            )
-            
-            # Модель для классификации конкретных эмоций в тексте
-            emotion_model_name = "cointegrated/rubert-tiny2-cedr-emotion-detection"
-            self.emotion_model = AutoModelForSequenceClassification.from_pretrained(emotion_model_name)
-            self.emotion_tokenizer = AutoTokenizer.from_pretrained(emotion_model_name)
-            self.emotions = ["нейтральность", "радость", "грусть", "удивление", "страх", "гнев"]
-            
-            # Инициализация моделей для аудио
-            # Модель для определения эмоций в голосе (русский язык)
-            # Используем ту же модельную архитектуру для голосовых сообщений
-            self.voice_sentiment_model = pipeline(
-                "audio-classification", 
-                model="xbgoose/hubert-speech-emotion-recognition-russian"
-            )
-            
-            logger.info("Эмоциональные модели успешно загружены")
-        except Exception as e:
-            logger.error(f"Ошибка при инициализации моделей эмоций: {str(e)}")
-            # Установим None для моделей, чтобы сервис мог работать в режиме отказоустойчивости
-            self.sentiment_analyzer = None
-            self.emotion_model = None
-            self.emotion_tokenizer = None
-            self.emotions = []
-            self.voice_sentiment_model = None
+        self._lock = threading.Lock()
+        self.total = 0
+        self.escalated = 0
+        self.audited = 0
+        self._compared = Counter()
+        self._emotion_agree = Counter()
+        self._polarity_agree = Counter()
+
+    def record(self, escalated: bool = False, audited: bool = False):
+        with self._lock:
+            self.total += 1
+            self.escalated += escalated
+            self.audited += audited
+
+    def record_comparison(self, lexicon: LexiconScore, model: Tuple[float, str]):
+        bucket = min(9, int(lexicon.confidence * 10))
+        with self._lock:
+            self._compared[bucket] += 1
+            self._emotion_agree[bucket] += lexicon.emotion == model[1]
+            self._polarity_agree[bucket] += self._sign(lexicon.emotional_state) == self._sign(model[0])
+
+    def _sign(self, value: float) -> int:
+        if abs(value) < self.NEUTRAL_BAND:
+            return 0
+        return 1 if value > 0 else -1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.total, 4) if self.total else 0.0,
+                "audited": self.audited,
+                "agreement": {
+                    f"{bucket / 10:.1f}": {
+                        "compared": compared,
+                        "emotion": round(self._emotion_agree[bucket] / compared, 4),
+                        "polarity": round(self._polarity_agree[bucket] / compared, 4)
+                    }
+                    for bucket, compared in sorted(self._compared.items())
+                }
+            }
+
+
+class EmotionService:
+    SENTIMENT_MODEL_NAME = "blanchefort/rubert-base-cased-sentiment"
+    EMOTION_MODEL_NAME = "cointegrated/rubert-tiny2-cedr-emotion-detection"
+
+    def __init__(self, backend=None, registry: Optional[ModelRegistry] = None):
+        # Модели загружаются при первом обращении или фоновым прогревом
+        # через выбранный бэкенд (torch или onnxruntime), поэтому импорт
+        # модуля не тянет torch и transformers
+        self.emotions = ["нейтральность", "радость", "грусть", "удивление", "страх", "гнев"]
+        self.backend = backend or inference_backend
+        registry = registry or model_registry
+        
+        # Модель для определения общего эмоционального тона (от -1 до 1)
+        self._sentiment = registry.register("text_sentiment", self._load_sentiment_analyzer)
+        # Модель для классификации конкретных эмоций в тексте
+        self._emotion = registry.register("text_emotion", self._load_emotion_model)
+
+        # Первый уровень: словарь отвечает сам, если уверен не меньше порога,
+        # остальное уходит в трансформеры
+        self.lexicon = lexicon_scorer
+        self.lexicon_threshold = settings.EMOTION_LEXICON_THRESHOLD
+        self.audit_rate = settings.EMOTION_LEXICON_AUDIT_RATE
+        self.tiers = TierStats()
+
+    def _load_sentiment_analyzer(self):
+        return self.backend.text_classifier(self.SENTIMENT_MODEL_NAME)
+
+    def _load_emotion_model(self):
+        return self.backend.text_classifier(self.EMOTION_MODEL_NAME)
+
+    @property
+    def model_id(self) -> str:
+        """Идентификатор текстовых моделей и бэкенда: ключ кэша и версия оценки сообщения"""
+        model_id = f"{self.SENTIMENT_MODEL_NAME}+{self.EMOTION_MODEL_NAME}@{self.backend.name}"
+        if self.lexicon_enabled:
+            model_id += f"+lexicon-v{LEXICON_VERSION}@{self.lexicon_threshold}"
+        return model_id
+
+    @property
+    def lexicon_enabled(self) -> bool:
+        return self.lexicon_threshold <= 1
+
+    @property
+    def sentiment_analyzer(self):
+        return self._sentiment.get()
+
+    @property
+    def emotion_classifier(self):
+        return self._emotion.get()
     
     def analyze_sentiment(self, text: str) -> float:
         """
@@ -51,18 +150,7 @@ class EmotionService:
             return 0.0  # Нейтральное значение по умолчанию
             
         try:
-            # Анализируем сентимент текста
-            result = self.sentiment_analyzer(text)
-            
-            # Русские модели часто возвращают POSITIVE/NEGATIVE/NEUTRAL, преобразуем в числовое значение
-            if result[0]["label"] == "POSITIVE":
-                score = result[0]["score"]  # 0-1
-                return score  # Уже в диапазоне от 0 до 1, просто используем
-            elif result[0]["label"] == "NEGATIVE":
-                score = result[0]["score"]  # 0-1
-                return -score  # Отрицательное значение для негативного сентимента
-            else:
-                return 0.0  # Нейтральное значение
+            return self._sentiment_batch([text])[0]
         except Exception as e:
             logger.error(f"Ошибка при анализе сентимента: {str(e)}")
             return 0.0
@@ -71,122 +159,325 @@ class EmotionService:
         """
         Классификация конкретной эмоции в тексте
         """
-        if not text or not self.emotion_model or not self.emotion_tokenizer:
-            return "нейтральность"  # Значение по умолчанию
+        if not text or not self.emotion_classifier:
+            return "calm"  # Значение по умолчанию
             
         try:
-            # Токенизация и получение предсказаний
-            inputs = self.emotion_tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-            outputs = self.emotion_model(**inputs)
-            probs = outputs.logits.softmax(dim=1).detach().numpy()[0]
-            
-            # Определяем эмоцию с наивысшим значением вероятности
-            emotion_idx = np.argmax(probs)
-            emotion = self.emotions[emotion_idx]
-            
-            # Маппинг на английские названия для единообразия с требованием задачи
-            emotion_map = {
-                "нейтральность": "calm",
-                "радость": "happiness",
-                "грусть": "sadness",
-                "удивление": "surprise",
-                "страх": "fear",
-                "гнев": "anger"
-            }
-            
-            return emotion_map.get(emotion, "calm")
+            return self._emotion_batch([text])[0]
         except Exception as e:
             logger.error(f"Ошибка при классификации эмоции: {str(e)}")
             return "calm"  # Значение по умолчанию
 
-    def analyze_voice_sentiment(self, voice_url: str) -> float:
+    def first_tier(self, text: str) -> Optional[Tuple[float, str]]:
         """
-        Анализ эмоционального тона голосового сообщения, возвращает значение от -1 до 1
+        Оценка словарём без моделей
+
+        Returns:
+            Optional[Tuple[float, str]]: Оценка, если словарь уверен, иначе None —
+            текст нужно отправить в модели
         """
-        if not voice_url or not self.voice_sentiment_model:
-            return 0.0  # Нейтральное значение по умолчанию
-            
-        try:
-            # Скачиваем аудиофайл во временную директорию
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(voice_url.split('?')[0])[1]) as temp_file:
-                urllib.request.urlretrieve(voice_url, temp_file.name)
-                temp_path = temp_file.name
-                
-            # Загружаем аудиофайл с помощью librosa и извлекаем аудиофичи
-            audio, sr = librosa.load(temp_path, sr=16000, mono=True)
-            
-            # Выполняем классификацию эмоций с помощью модели
-            result = self.voice_sentiment_model(temp_path)
-            
-            # Преобразуем результат классификации в значение от -1 до 1
-            sentiment_map = {
-                "neutral": 0.0,
-                "positive": 0.7,
-                "negative": -0.7,
-                "angry": -0.9,
-                "sad": -0.6,
-                "happy": 0.9,
-                "fear": -0.8,
-                "surprise": 0.5
-            }
-            
-            # Найдем эмоцию с наивысшим значением
-            top_emotion = max(result, key=lambda x: x['score'])
-            
-            # Получаем соответствующее значение из карты
-            sentiment_score = sentiment_map.get(top_emotion['label'].lower(), 0.0)
-            
-            # Удаляем временный файл
-            os.unlink(temp_path)
-            
-            return sentiment_score
-            
-        except Exception as e:
-            logger.error(f"Ошибка при анализе сентимента голосового сообщения: {str(e)}")
-            return 0.0
-    
-    def classify_voice_emotion(self, voice_url: str) -> str:
+        if not self.lexicon_enabled:
+            return None
+        score = self.lexicon.score(text)
+        if score.confidence < self.lexicon_threshold:
+            self.tiers.record(escalated=True)
+            return None
+        # Небольшая доля уверенных ответов сверяется с моделями
+        if random.random() < self.audit_rate:
+            self.tiers.record(audited=True)
+            return None
+        self.tiers.record()
+        return score.emotional_state, score.emotion
+
+    def analyze_batch(self, texts: List[str]) -> List[Tuple[float, str, bool]]:
+        """
+        Анализ пачки текстов: словарь, затем один проход каждой модели
+        по текстам, в которых словарь не уверен
+
+        Args:
+            texts: Список текстов сообщений
+
+        Returns:
+            List[Tuple[float, str, bool]]: Эмоциональный тон (-1..1), эмоция и признак
+            настоящей оценки для каждого текста; False — нейтральные значения из-за
+            сбоя моделей, такую строку нужно пересчитать
         """
-        Классификация конкретной эмоции в голосовом сообщении
+        results = [(0.0, "calm", True)] * len(texts)
+        escalate = []
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            result = self.first_tier(text)
+            if result is None:
+                escalate.append(i)
+            else:
+                results[i] = (*result, True)
+
+        if escalate:
+            model_results, scored = self.analyze_models([texts[i] for i in escalate])
+            for i, result in zip(escalate, model_results):
+                results[i] = (*result, scored)
+        return results
+
+    def analyze_models(self, texts: List[str]) -> Tuple[List[Tuple[float, str]], bool]:
         """
-        if not voice_url or not self.voice_sentiment_model:
-            return "calm"  # Значение по умолчанию
-            
+        Один проход каждой модели по текстам, отклонённым словарём
+
+        Returns:
+            Tuple: Эмоциональный тон (-1..1) и эмоция для каждого текста и признак
+            того, что обе модели отработали
+        """
+        results, scored = self._model_batch(texts)
+        if scored and self.lexicon_enabled:
+            for text, result in zip(texts, results):
+                self.tiers.record_comparison(self.lexicon.score(text), result)
+        return results, scored
+
+    def _model_batch(self, batch: List[str]) -> Tuple[List[Tuple[float, str]], bool]:
+        """
+        Returns:
+            Tuple: Оценки моделей и признак того, что обе модели отработали
+        """
+        scores = [0.0] * len(batch)
+        emotions = ["calm"] * len(batch)
+        scored = True
+
+        if self.sentiment_analyzer:
+            try:
+                scores = self._sentiment_batch(batch)
+            except Exception as e:
+                scored = False
+                logger.error(f"Ошибка при пакетном анализе сентимента: {str(e)}")
+        else:
+            scored = False
+
+        if self.emotion_classifier:
+            try:
+                emotions = self._emotion_batch(batch)
+            except Exception as e:
+                scored = False
+                logger.error(f"Ошибка при пакетной классификации эмоций: {str(e)}")
+        else:
+            scored = False
+
+        return list(zip(scores, emotions)), scored
+
+    def _sentiment_batch(self, texts: List[str]) -> List[float]:
+        # Тексты дополняются до самого длинного в батче
+        probs = self.sentiment_analyzer.predict(texts)
+        labels = self.sentiment_analyzer.labels
+        
+        scores = []
+        for row in probs:
+            idx = int(np.argmax(row))
+            # Русские модели часто возвращают POSITIVE/NEGATIVE/NEUTRAL, преобразуем в числовое значение
+            if labels[idx] == "POSITIVE":
+                scores.append(float(row[idx]))  # Уже в диапазоне от 0 до 1
+            elif labels[idx] == "NEGATIVE":
+                scores.append(-float(row[idx]))  # Отрицательное значение для негативного сентимента
+            else:
+                scores.append(0.0)  # Нейтральное значение
+        return scores
+
+    def _emotion_batch(self, texts: List[str]) -> List[str]:
+        probs = self.emotion_classifier.predict(texts)
+        
+        # Определяем эмоцию с наивысшим значением вероятности для каждой строки
+        return [
+            EMOTION_MAP.get(self.emotions[idx], "calm")
+            for idx in np.argmax(probs, axis=1)
+        ]
+
+
+class EmotionBatcher:
+    """
+    Динамический микро-батчинг запросов анализа текста.
+
+    Конкурентные запросы копятся до EMOTION_BATCH_SIZE штук или
+    EMOTION_BATCH_MAX_WAIT_MS миллисекунд, после чего батч целиком
+    обрабатывается моделями на выделенной текстовой линии планировщика,
+    не блокируя event loop.
+
+    Очередь упорядочена по приоритету (живой чат, правки, дозаполнение),
+    у каждого запроса есть срок. Если по оценке очереди срок не выдержать
+    или он истёк в ожидании, запрос получает эвристическую оценку без
+    версии модели, чтобы строку позже пересчитали.
+    """
+
+    def __init__(
+        self,
+        service: EmotionService,
+        max_batch_size: int,
+        max_wait_ms: int,
+        max_queue_size: int,
+        lane: InferenceLane,
+        cache: Optional[EmotionCache] = None
+    ):
+        self.service = service
+        self.lane = lane
+        self.cache = cache
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.max_queue_size = max_queue_size
+        self.shedding = SheddingStats()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._queued = Counter()
+        self._sequence = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def analyze(
+        self,
+        text: str,
+        priority: Priority = Priority.LIVE,
+        budget: Optional[float] = None
+    ) -> EmotionResult:
+        """
+        Поставить текст в очередь и дождаться результата не дольше срока
+
+        Args:
+            text: Текст сообщения
+            priority: Класс запроса
+            budget: Срок в секундах, по умолчанию из настроек приоритета
+
+        Returns:
+            EmotionResult: Эмоциональный тон (-1..1), эмоция и версия модели
+        """
+        if not text:
+            return EmotionResult(0.0, "calm", self.service.model_id)
+
+        if self.cache is not None:
+            cached = await self.cache.get(text)
+            if cached is not None:
+                return EmotionResult(*cached, self.service.model_id)
+
+        # Уверенный ответ словаря не занимает ни очередь, ни модели
+        result = self.service.first_tier(text)
+        if result is not None:
+            return EmotionResult(*result, self.service.model_id)
+
+        if budget is None:
+            budget = deadline_budget(priority)
+        if self._estimated_wait(priority) > budget:
+            self.shedding.record_shed(priority)
+            return heuristic_emotion(text)
+
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        future = loop.create_future()
         try:
-            # Скачиваем аудиофайл во временную директорию
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(voice_url.split('?')[0])[1]) as temp_file:
-                urllib.request.urlretrieve(voice_url, temp_file.name)
-                temp_path = temp_file.name
-                
-            # Выполняем классификацию эмоций с помощью модели
-            result = self.voice_sentiment_model(temp_path)
-            
-            # Маппинг на английские названия для единообразия с требованием задачи
-            emotion_map = {
-                "neutral": "calm",
-                "positive": "happiness",
-                "negative": "sadness",
-                "angry": "anger",
-                "sad": "sadness",
-                "happy": "happiness",
-                "fear": "fear",
-                "surprise": "surprise"
-            }
-            
-            # Найдем эмоцию с наивысшим значением
-            top_emotion = max(result, key=lambda x: x['score'])
-            
-            # Получаем соответствующее значение из карты
-            mapped_emotion = emotion_map.get(top_emotion['label'].lower(), "calm")
-            
-            # Удаляем временный файл
-            os.unlink(temp_path)
-            
-            return mapped_emotion
-            
-        except Exception as e:
-            logger.error(f"Ошибка при классификации эмоции голосового сообщения: {str(e)}")
-            return "calm"  # Значение по умолчанию
+            self._queue.put_nowait((priority, deadline, next(self._sequence), text, future))
+        except asyncio.QueueFull:
+            self.shedding.record_shed(priority)
+            return heuristic_emotion(text)
+        self._queued[priority] += 1
+
+        try:
+            # При таймауте future отменяется, и обработчик его пропустит
+            result, scored = await asyncio.wait_for(future, budget)
+        except asyncio.TimeoutError:
+            self.shedding.record_expired(priority)
+            return heuristic_emotion(text)
+
+        # Нейтральные значения из-за незагруженных или упавших моделей не кэшируем
+        # и не помечаем версией, чтобы сообщение пересчиталось позже
+        if not scored:
+            return EmotionResult(*result, None)
+        if self.cache is not None:
+            await self.cache.set(text, result)
+        return EmotionResult(*result, self.service.model_id)
+
+    def _estimated_wait(self, priority: Priority) -> float:
+        """Оценка ожидания: батчи впереди в очереди плюс занятость линии"""
+        ahead = sum(count for queued, count in self._queued.items() if queued <= priority)
+        batches = ahead // self.max_batch_size + 1
+        return self.lane.estimated_wait() + batches * self.lane.mean_run_time()
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _get(self) -> tuple:
+        item = await self._queue.get()
+        self._queued[item[0]] -= 1
+        return item
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # Отменённые и просроченные вызовы не тратят время модели
+            batch = [
+                (text, future) for _, _, _, text, future in batch
+                if not future.done()
+            ]
+            if not batch:
+                continue
+
+            try:
+                results, scored = await self.lane.run(
+                    self.service.analyze_models,
+                    [text for text, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Ошибка при обработке батча эмоций: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result((result, scored))
+
+    def stats(self) -> dict:
+        """Глубина очереди по приоритетам и счётчики эвристических оценок"""
+        return {
+            "queued": {
+                Priority(priority).name.lower(): count
+                for priority, count in self._queued.items() if count
+            },
+            **self.shedding.stats()
+        }
+
+    async def stop(self):
+        """Остановить обработчик очереди"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
 
 # Экземпляр для использования в других модулях
-emotion_service = EmotionService()
\ No newline at end of file
+emotion_service = EmotionService()
+emotion_batcher = EmotionBatcher(
+    emotion_service,
+    max_batch_size=settings.EMOTION_BATCH_SIZE,
+    max_wait_ms=settings.EMOTION_BATCH_MAX_WAIT_MS,
+    max_queue_size=settings.EMOTION_QUEUE_MAX_SIZE,
+    lane=inference_scheduler.text,
+    cache=EmotionCache(
+        model_id=emotion_service.model_id,
+        max_size=settings.EMOTION_CACHE_SIZE,
+        ttl=settings.EMOTION_CACHE_TTL,
+        redis_url=settings.EMOTION_CACHE_REDIS_URL or None
+    )
+)
\ No newline at end of file
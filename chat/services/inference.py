@@ -0,0 +1,84 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from services.emotion_service import emotion_batcher, emotion_service
+from services.inference_priority import EmotionResult, Priority, SheddingStats
+from services.inference_scheduler import inference_scheduler
+from services.model_registry import model_registry
+from services.voice_emotion_service import voice_emotion_service
+
+class LocalInference:
+    """Runs the emotion models inside the API process"""
+
+    def __init__(self):
+        self.voice_shedding = SheddingStats()
+
+    async def analyze_text(
+        self,
+        text: str,
+        priority: Priority = Priority.LIVE,
+        budget: Optional[float] = None
+    ) -> EmotionResult:
+        return await emotion_batcher.analyze(text, priority, budget)
+
+    async def analyze_voice(
+        self,
+        audio_data: bytes,
+        file_name: str,
+        priority: Priority = Priority.EDIT
+    ) -> EmotionResult:
+        budget = settings.VOICE_INFERENCE_DEADLINE_MS / 1000
+        fallback = EmotionResult(0.0, "calm", None)
+        if inference_scheduler.voice.estimated_wait() > budget:
+            self.voice_shedding.record_shed(priority)
+            return fallback
+        try:
+            # The lane thread finishes the clip anyway; the caller just stops waiting
+            emotional_state, emotion, scored = await asyncio.wait_for(
+                voice_emotion_service.analyze_audio_file(audio_data, file_name), budget
+            )
+        except asyncio.TimeoutError:
+            self.voice_shedding.record_expired(priority)
+            return fallback
+        # Defaults after a decoding or model failure get no version, like the timeout and shed paths
+        return EmotionResult(emotional_state, emotion, voice_emotion_service.model_id if scored else None)
+
+    async def analyze_voice_timeline(self, audio_data: bytes, file_name: str) -> Dict[str, Any]:
+        return await voice_emotion_service.analyze_audio_timeline(audio_data, file_name)
+
+    async def status(self) -> Dict[str, Any]:
+        return {
+            "ready": model_registry.ready,
+            "models": model_registry.status(),
+            "cache": emotion_batcher.cache.stats() if emotion_batcher.cache else None,
+            "lanes": inference_scheduler.stats(),
+            "text_tiers": emotion_service.tiers.stats(),
+            "voice_vad": voice_emotion_service.vad_stats(),
+            "shedding": {
+                "text": emotion_batcher.stats(),
+                "voice": self.voice_shedding.stats()
+            }
+        }
+
+    async def warm_up(self):
+        await model_registry.warm_up()
+
+    async def close(self):
+        await emotion_batcher.stop()
+
+def create_inference():
+    """Pick in-process models or the inference worker based on INFERENCE_MODE"""
+    if settings.INFERENCE_MODE == "remote":
+        from services.inference_client import InferenceClient
+        return InferenceClient(
+            socket_path=settings.INFERENCE_SOCKET_PATH or None,
+            host=settings.INFERENCE_HOST,
+            port=settings.INFERENCE_PORT,
+            timeout=settings.INFERENCE_TIMEOUT,
+            max_frame_size=settings.INFERENCE_MAX_FRAME_SIZE
+        )
+    return LocalInference()
+
+# Singleton instance
+inference = create_inference()
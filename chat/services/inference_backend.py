@@ -0,0 +1,146 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def _labels(config) -> List[str]:
+    return [config.id2label[i] for i in range(config.num_labels)]
+
+class TorchTextClassifier:
+    """Eager PyTorch sequence classifier returning class probabilities"""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.labels = _labels(self.model.config)
+
+    def predict(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        import torch
+
+        inputs = self.tokenizer(
+            texts, return_tensors="pt", padding=True, truncation=True, max_length=max_length
+        )
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return torch.nn.functional.softmax(logits, dim=1).numpy()
+
+class TorchAudioClassifier:
+    """Eager PyTorch audio classifier over 16 kHz waveforms"""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoFeatureExtractor, AutoModelForAudioClassification
+        self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_name)
+        self.model = AutoModelForAudioClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.labels = _labels(self.model.config)
+
+    def predict(self, waveforms: List[np.ndarray], sampling_rate: int) -> np.ndarray:
+        import torch
+
+        inputs = self.feature_extractor(waveforms, sampling_rate=sampling_rate, return_tensors="pt")
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return torch.nn.functional.softmax(logits, dim=1).numpy()
+
+class OnnxTextClassifier:
+    """Quantized ONNX Runtime export of a sequence classifier"""
+
+    def __init__(self, model_dir: str, threads: int):
+        from transformers import AutoConfig, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.labels = _labels(AutoConfig.from_pretrained(model_dir))
+        self.session = _create_session(model_dir, threads)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts, return_tensors="np", padding=True, truncation=True, max_length=max_length
+        )
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        (logits,) = self.session.run(None, feed)
+        return softmax(logits)
+
+class OnnxAudioClassifier:
+    """Quantized ONNX Runtime export of an audio classifier"""
+
+    def __init__(self, model_dir: str, threads: int):
+        from transformers import AutoConfig, AutoFeatureExtractor
+        self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_dir)
+        self.labels = _labels(AutoConfig.from_pretrained(model_dir))
+        self.session = _create_session(model_dir, threads)
+
+    def predict(self, waveforms: List[np.ndarray], sampling_rate: int) -> np.ndarray:
+        inputs = self.feature_extractor(waveforms, sampling_rate=sampling_rate, return_tensors="np")
+        (logits,) = self.session.run(None, {"input_values": inputs["input_values"].astype(np.float32)})
+        return softmax(logits)
+
+def _create_session(model_dir: str, threads: int):
+    import onnxruntime as ort
+
+    model_path = os.path.join(model_dir, OnnxBackend.MODEL_FILE)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"No ONNX export at {model_path}; run `python -m scripts.export_onnx` first"
+        )
+    options = ort.SessionOptions()
+    # Sessions own their thread pools, so each gets its lane's CPU budget
+    options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS or threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+class TorchBackend:
+    name = "torch"
+
+    def text_classifier(self, model_name: str) -> TorchTextClassifier:
+        return TorchTextClassifier(model_name)
+
+    def audio_classifier(self, model_name: str) -> TorchAudioClassifier:
+        return TorchAudioClassifier(model_name)
+
+class OnnxBackend:
+    """
+    Dynamically int8-quantized ONNX exports cached under ONNX_MODEL_DIR.
+    
+    Exports are built by `python -m scripts.export_onnx`; loading a model that
+    has not been exported fails the model handle instead of silently falling
+    back to torch.
+    """
+
+    name = "onnxruntime"
+    MODEL_FILE = "model.int8.onnx"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def model_dir(self, model_name: str) -> str:
+        return os.path.join(self.cache_dir, model_name.replace("/", "__"))
+
+    def text_classifier(self, model_name: str) -> OnnxTextClassifier:
+        return OnnxTextClassifier(self.model_dir(model_name), settings.TEXT_LANE_THREADS)
+
+    def audio_classifier(self, model_name: str) -> OnnxAudioClassifier:
+        return OnnxAudioClassifier(self.model_dir(model_name), settings.VOICE_LANE_THREADS)
+
+def create_backend(name: Optional[str] = None):
+    """Backend selected by INFERENCE_BACKEND (or the given name)"""
+    name = name or settings.INFERENCE_BACKEND
+    if name == OnnxBackend.name:
+        return OnnxBackend(settings.ONNX_MODEL_DIR)
+    if name != TorchBackend.name:
+        logger.warning(f"Unknown inference backend {name!r}, using torch")
+    return TorchBackend()
+
+# Singleton instance
+inference_backend = create_backend()
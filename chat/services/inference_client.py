@@ -0,0 +1,235 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+from inference import protocol
+from services.inference_priority import (
+    EmotionResult,
+    Priority,
+    SheddingStats,
+    deadline_budget,
+    heuristic_emotion
+)
+
+logger = logging.getLogger(__name__)
+
+# Allowance for the reply to travel back after the worker's own deadline
+RESPONSE_MARGIN = 0.5
+
+class InferenceError(Exception):
+    """The inference worker reported an error for a request"""
+
+class InferenceClient:
+    """
+    Async client for the out-of-process inference worker.
+
+    One connection is shared by all callers; requests are multiplexed by id
+    so slow voice analysis does not hold up text scoring. The worker enforces
+    each request's deadline; any timeout or connection problem degrades to
+    heuristic scores without a model version, so the row is re-scored later
+    instead of failing the request that needed it.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str],
+        host: str,
+        port: int,
+        timeout: float,
+        max_frame_size: int
+    ):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_frame_size = max_frame_size
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self.shedding = SheddingStats()
+        # Version of the worker's text models, learned from its replies
+        self.text_model_id: Optional[str] = None
+
+    async def analyze_text(self, text: str, priority: Priority = Priority.LIVE) -> EmotionResult:
+        """
+        Score a text message within the deadline of its priority
+
+        Returns:
+            EmotionResult: Emotional state (-1 to 1), emotion label and model version
+        """
+        # Empty text is calm for any model, but the row still needs the version local mode gives it;
+        # until a reply has told us the worker's version, the worker answers it without running a model
+        if not text and self.text_model_id is not None:
+            return EmotionResult(0.0, "calm", self.text_model_id)
+        budget = deadline_budget(priority)
+        try:
+            _, payload = await self._request(
+                protocol.OP_TEXT,
+                protocol.encode_text(text, priority, int(budget * 1000)),
+                timeout=budget + RESPONSE_MARGIN
+            )
+            result = EmotionResult(*protocol.decode_result(payload))
+            if result.model_version is not None:
+                self.text_model_id = result.model_version
+            return result
+        except asyncio.TimeoutError:
+            self.shedding.record_expired(priority)
+            return heuristic_emotion(text)
+        except (ConnectionError, OSError, InferenceError, protocol.ProtocolError) as e:
+            logger.warning(f"Text inference unavailable, using heuristic scores: {e!r}")
+            return heuristic_emotion(text)
+
+    async def analyze_voice(
+        self,
+        audio_data: bytes,
+        file_name: str,
+        priority: Priority = Priority.EDIT
+    ) -> EmotionResult:
+        """
+        Score a voice message from its raw file bytes
+
+        Returns:
+            EmotionResult: Emotional state (-1 to 1), emotion label and model version
+        """
+        fallback = EmotionResult(0.0, "calm", None)
+        if not audio_data:
+            return fallback
+        request = protocol.encode_voice(file_name, audio_data)
+        if not self._fits_frame(request, file_name):
+            return fallback
+        try:
+            _, payload = await self._request(
+                protocol.OP_VOICE,
+                request,
+                timeout=settings.VOICE_INFERENCE_DEADLINE_MS / 1000 + RESPONSE_MARGIN
+            )
+            return EmotionResult(*protocol.decode_result(payload))
+        except asyncio.TimeoutError:
+            self.shedding.record_expired(priority)
+            return fallback
+        except (ConnectionError, OSError, InferenceError, protocol.ProtocolError) as e:
+            logger.warning(f"Voice inference unavailable, using neutral scores: {e!r}")
+            return fallback
+
+    async def analyze_voice_timeline(self, audio_data: bytes, file_name: str) -> Dict[str, Any]:
+        """
+        Score a voice message and return its per-segment emotion timeline
+
+        Returns:
+            Dict[str, Any]: Overall emotional state and emotion, duration and segments
+        """
+        neutral = {"emotional_state": 0.0, "emotion": "calm", "duration": 0.0, "speech_duration": 0.0, "segments": []}
+        if not audio_data:
+            return neutral
+        request = protocol.encode_voice(file_name, audio_data)
+        if not self._fits_frame(request, file_name):
+            return neutral
+        try:
+            _, payload = await self._request(protocol.OP_TIMELINE, request)
+            return protocol.decode_status(payload)
+        except (asyncio.TimeoutError, ConnectionError, OSError, InferenceError, protocol.ProtocolError) as e:
+            logger.warning(f"Voice inference unavailable, using neutral scores: {e!r}")
+            return neutral
+
+    def _fits_frame(self, payload: bytes, file_name: str) -> bool:
+        """
+        Whether the worker will accept the request; an oversized frame would
+        make it drop the connection every pending request shares
+        """
+        if len(payload) <= self.max_frame_size:
+            return True
+        logger.warning(
+            f"Voice file {file_name} of {len(payload)} bytes exceeds the inference frame limit "
+            f"of {self.max_frame_size}, using neutral scores"
+        )
+        return False
+
+    async def status(self) -> Dict[str, Any]:
+        """Model load state reported by the inference worker"""
+        try:
+            _, payload = await self._request(protocol.OP_STATUS)
+            status = protocol.decode_status(payload)
+            status["client_shedding"] = self.shedding.stats()
+            return status
+        except (asyncio.TimeoutError, ConnectionError, OSError, InferenceError, protocol.ProtocolError) as e:
+            return {"ready": False, "models": {}, "error": repr(e)}
+
+    async def warm_up(self):
+        """Open the connection early; models are warmed by the worker itself"""
+        try:
+            await self._ensure_connected()
+        except OSError as e:
+            logger.warning(f"Inference worker not reachable yet: {e!r}")
+
+    async def close(self):
+        self._disconnect(ConnectionError("Inference client closed"))
+
+    async def _request(
+        self,
+        opcode: int,
+        payload: bytes = b"",
+        timeout: Optional[float] = None
+    ) -> Tuple[int, bytes]:
+        await self._ensure_connected()
+        writer = self._writer
+
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            async with self._write_lock:
+                writer.write(protocol.encode_frame(opcode, request_id, payload))
+                await writer.drain()
+            reply_opcode, reply = await asyncio.wait_for(future, timeout or self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+        if reply_opcode == protocol.OP_ERROR:
+            raise InferenceError(reply.decode("utf-8", errors="replace"))
+        return reply_opcode, reply
+
+    async def _ensure_connected(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            if self.socket_path:
+                connect = asyncio.open_unix_connection(self.socket_path)
+            else:
+                connect = asyncio.open_connection(self.host, self.port)
+            self._reader, self._writer = await asyncio.wait_for(connect, self.timeout)
+            self._reader_task = asyncio.create_task(self._read_loop(self._reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                opcode, request_id, payload = await protocol.read_frame(reader, self.max_frame_size)
+                future = self._pending.get(request_id)
+                if future is not None and not future.done():
+                    future.set_result((opcode, payload))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Inference connection lost: {e!r}")
+            self._disconnect(ConnectionError("Inference connection lost"))
+
+    def _disconnect(self, error: Exception):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,59 @@
+from collections import Counter
+from enum import IntEnum
+from typing import Any, Dict, NamedTuple, Optional
+
+from core.config import settings
+from services.lexicon_scorer import lexicon_scorer
+
+class Priority(IntEnum):
+    """Inference request classes, served in this order when the models are busy"""
+    LIVE = 0
+    EDIT = 1
+    BACKFILL = 2
+
+class EmotionResult(NamedTuple):
+    emotional_state: float
+    emotion: str
+    # Model that produced the score; None marks a heuristic fallback to be re-scored later
+    model_version: Optional[str]
+
+def deadline_budget(priority: Priority) -> float:
+    """Seconds a text request of this priority may wait for the models"""
+    budgets = {
+        Priority.LIVE: settings.INFERENCE_DEADLINE_LIVE_MS,
+        Priority.EDIT: settings.INFERENCE_DEADLINE_EDIT_MS,
+        Priority.BACKFILL: settings.INFERENCE_DEADLINE_BACKFILL_MS
+    }
+    return budgets[priority] / 1000
+
+def heuristic_emotion(text: str) -> EmotionResult:
+    """
+    Lexicon score used when the models cannot answer in time
+
+    Returned regardless of the lexicon's confidence and without a model
+    version, so the row is re-scored once capacity allows.
+    """
+    score = lexicon_scorer.score(text)
+    return EmotionResult(score.emotional_state, score.emotion, None)
+
+class SheddingStats:
+    """Counts requests answered with fallback scores, per priority"""
+
+    def __init__(self):
+        # Rejected up front because the estimated wait exceeded the deadline
+        self.shed = Counter()
+        # Admitted but the deadline passed before the models answered
+        self.expired = Counter()
+
+    def record_shed(self, priority: Priority):
+        self.shed[Priority(priority).name.lower()] += 1
+
+    def record_expired(self, priority: Priority):
+        self.expired[Priority(priority).name.lower()] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shed": dict(self.shed),
+            "expired": dict(self.expired),
+            "fallback": sum(self.shed.values()) + sum(self.expired.values())
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class InferenceLane:
+    """
+    A dedicated worker pool with its own CPU thread budget.
+
+    Each worker thread sets torch's intra-op thread count when it starts; with
+    the OpenMP backend that budget applies per calling thread, so the lanes
+    split the thread count between them. No CPU affinity is set: the OS still
+    schedules every lane's threads on any core. `concurrency` bounds how many
+    inference calls run at once; the rest wait in the executor queue, and that
+    wait is measured separately from the run time. Counters and samples are
+    updated from the event loop and the worker threads, under `_lock`.
+    """
+
+    SAMPLE_WINDOW = 1000
+
+    def __init__(self, name: str, threads: int, concurrency: int):
+        self.name = name
+        self.threads = max(1, threads)
+        self.concurrency = max(1, concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix=f"inference-{name}",
+            initializer=self._init_thread
+        )
+        self.completed = 0
+        self.waiting = 0
+        self.running = 0
+        self._queue_waits = deque(maxlen=self.SAMPLE_WINDOW)
+        self._run_times = deque(maxlen=self.SAMPLE_WINDOW)
+        self._lock = threading.Lock()
+
+    def _init_thread(self):
+        if settings.INFERENCE_BACKEND != "torch":
+            return
+        try:
+            import torch
+            torch.set_num_threads(self.threads)
+        except ImportError:
+            pass
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking inference call on this lane"""
+        submitted = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+        def timed():
+            started = time.perf_counter()
+            with self._lock:
+                self.waiting -= 1
+                self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self._queue_waits.append(started - submitted)
+                    self._run_times.append(finished - started)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+
+    def mean_run_time(self) -> float:
+        """Average seconds per call over the recent sample window"""
+        with self._lock:
+            if not self._run_times:
+                return 0.0
+            return sum(self._run_times) / len(self._run_times)
+
+    def estimated_wait(self) -> float:
+        """Expected seconds before a call submitted now starts running"""
+        with self._lock:
+            busy = self.waiting + self.running
+        if busy < self.concurrency:
+            return 0.0
+        return (busy - self.concurrency + 1) / self.concurrency * self.mean_run_time()
+
+    @staticmethod
+    def _summary(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        values = np.array(samples) * 1000
+        return {
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "max_ms": round(float(values.max()), 3)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        # One consistent snapshot; percentiles are computed outside the lock
+        with self._lock:
+            waiting, running, completed = self.waiting, self.running, self.completed
+            queue_waits, run_times = list(self._queue_waits), list(self._run_times)
+        return {
+            "threads": self.threads,
+            "concurrency": self.concurrency,
+            "waiting": waiting,
+            "running": running,
+            "completed": completed,
+            "queue_wait": self._summary(queue_waits),
+            "run_time": self._summary(run_times)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class InferenceScheduler:
+    """Separate lanes for text and voice so long clips never starve text scoring"""
+
+    def __init__(self):
+        self.text = InferenceLane("text", settings.TEXT_LANE_THREADS, settings.TEXT_LANE_CONCURRENCY)
+        self.voice = InferenceLane("voice", settings.VOICE_LANE_THREADS, settings.VOICE_LANE_CONCURRENCY)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {"text": self.text.stats(), "voice": self.voice.stats()}
+
+# Singleton instance
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,150 @@
+import math
+import re
+from collections import Counter
+from typing import NamedTuple
+
+# Версия словаря входит в версию оценки сообщения: правка словаря требует пересчёта
+LEXICON_VERSION = 1
+
+# Основы слов: эмоция и вклад в тон (-1..1). Совпадение по началу слова
+STEMS = {
+    # радость
+    "счаст": ("happiness", 0.9), "отличн": ("happiness", 0.8), "прекрасн": ("happiness", 0.8),
+    "замечательн": ("happiness", 0.8), "хорош": ("happiness", 0.5), "спасиб": ("happiness", 0.5),
+    "благодар": ("happiness", 0.6), "любл": ("happiness", 0.7), "весел": ("happiness", 0.7),
+    "супер": ("happiness", 0.7), "классн": ("happiness", 0.6), "круто": ("happiness", 0.6),
+    "доволен": ("happiness", 0.6), "довольн": ("happiness", 0.6), "улыба": ("happiness", 0.5),
+    "радост": ("happiness", 0.8), "радуе": ("happiness", 0.7), "спокойн": ("calm", 0.3),
+    # грусть
+    "грус": ("sadness", -0.7), "печал": ("sadness", -0.7), "тоск": ("sadness", -0.7),
+    "плох": ("sadness", -0.6), "устал": ("sadness", -0.5), "одинок": ("sadness", -0.7),
+    "плач": ("sadness", -0.7), "плак": ("sadness", -0.7), "слез": ("sadness", -0.6),
+    "депресс": ("sadness", -0.8), "безнадеж": ("sadness", -0.9), "обидн": ("sadness", -0.6),
+    "обид": ("sadness", -0.5), "тяжел": ("sadness", -0.5), "жаль": ("sadness", -0.4),
+    # гнев
+    "злюсь": ("anger", -0.8), "злит": ("anger", -0.8), "бесит": ("anger", -0.8),
+    "ненавиж": ("anger", -0.9), "раздраж": ("anger", -0.7), "ярост": ("anger", -0.9),
+    "достал": ("anger", -0.6), "надоел": ("anger", -0.6), "бешен": ("anger", -0.8),
+    # страх
+    "страш": ("fear", -0.7), "боюсь": ("fear", -0.7), "бояз": ("fear", -0.7),
+    "тревог": ("fear", -0.7), "тревож": ("fear", -0.7), "паник": ("fear", -0.8),
+    "волную": ("fear", -0.5), "ужас": ("fear", -0.8), "напуга": ("fear", -0.7),
+    # удивление
+    "неожидан": ("surprise", 0.2), "удивл": ("surprise", 0.2), "офигет": ("surprise", 0.1)
+}
+
+# Короткие слова сравниваются целиком, иначе основа цепляет лишнее
+WORDS = {
+    "рад": ("happiness", 0.6), "рада": ("happiness", 0.6), "ура": ("happiness", 0.8),
+    "зло": ("anger", -0.6), "злой": ("anger", -0.7), "злая": ("anger", -0.7),
+    "вау": ("surprise", 0.4), "ого": ("surprise", 0.3)
+}
+
+EMOJI = {
+    **dict.fromkeys("😀😃😄😁😊🙂😍🥰❤👍🎉😌", ("happiness", 0.7)),
+    **dict.fromkeys("😢😭😞😔☹🙁💔😥", ("sadness", -0.7)),
+    **dict.fromkeys("😡😠🤬", ("anger", -0.8)),
+    **dict.fromkeys("😨😱😰", ("fear", -0.7)),
+    **dict.fromkeys("😮😲🤯", ("surprise", 0.2))
+}
+
+# Фатические реплики без эмоциональной окраски
+NEUTRAL_WORDS = {
+    "ок", "окей", "ага", "угу", "да", "нет", "привет", "здравствуйте", "добрый", "день",
+    "вечер", "утро", "пока", "до", "свидания", "понял", "поняла", "ясно", "понятно",
+    "конечно", "ладно", "хм", "завтра", "сегодня", "в", "на"
+}
+NEGATIONS = {"не", "ни", "нет", "без", "никогда"}
+
+_WORD = re.compile(r"\w+")
+_HAPPY_PUNCT = re.compile(r"\){2,}|[:;=]-?\)")
+_SAD_PUNCT = re.compile(r"\({2,}|[:;=]-?\(")
+_EXCLAMATION = re.compile(r"!{2,}")
+_INTERROBANG = re.compile(r"\?!|!\?")
+
+# Длинные сообщения чаще смешивают эмоции: уверенность падает после этого числа слов
+CONFIDENT_LENGTH = 8
+
+
+class LexiconScore(NamedTuple):
+    emotional_state: float
+    emotion: str
+    confidence: float
+
+
+class LexiconScorer:
+    """
+    Дешёвая оценка текста по словарю, эмодзи и пунктуации за микросекунды.
+
+    Уверенность тем выше, чем больше совпадений, чем согласованнее их эмоции
+    и знак тона и чем короче сообщение; отрицание рядом со словом меняет
+    знак его вклада и снижает уверенность.
+    """
+
+    def score(self, text: str) -> LexiconScore:
+        lowered = (text or "").lower()
+        words = _WORD.findall(lowered)
+        votes = Counter()
+        valence = 0.0
+        negated = False
+
+        for i, word in enumerate(words):
+            entry = WORDS.get(word)
+            if entry is None:
+                entry = next(
+                    (value for stem, value in STEMS.items() if word.startswith(stem)),
+                    None
+                )
+            if entry is None:
+                continue
+            emotion, weight = entry
+            if NEGATIONS.intersection(words[max(0, i - 2):i]):
+                # "не хорошо" — тон противоположный, а эмоция неочевидна
+                negated = True
+                valence -= weight * 0.5
+                continue
+            votes[emotion] += abs(weight)
+            valence += weight
+
+        for char in lowered:
+            if char in EMOJI:
+                emotion, weight = EMOJI[char]
+                votes[emotion] += abs(weight)
+                valence += weight
+
+        for count, (emotion, weight) in (
+            (len(_HAPPY_PUNCT.findall(lowered)), ("happiness", 0.5)),
+            (len(_SAD_PUNCT.findall(lowered)), ("sadness", -0.5))
+        ):
+            if count:
+                votes[emotion] += abs(weight) * count
+                valence += weight * count
+        if _INTERROBANG.search(lowered):
+            votes["surprise"] += 0.2
+
+        intensity = 1.3 if _EXCLAMATION.search(lowered) else 1.0
+        evidence = sum(votes.values())
+
+        if not evidence:
+            if words and all(word in NEUTRAL_WORDS for word in words):
+                return LexiconScore(0.0, "calm", 0.9)
+            return LexiconScore(0.0, "calm", 0.0)
+
+        emotion, top = votes.most_common(1)[0]
+        label_agreement = top / evidence
+        polarity_agreement = min(1.0, abs(valence) / evidence) if valence else 0.5
+        strength = 1 - math.exp(-2 * evidence)
+        length_factor = min(1.0, CONFIDENT_LENGTH / max(1, len(words)))
+        confidence = label_agreement * polarity_agreement * strength * length_factor
+        if negated:
+            confidence *= 0.7
+
+        return LexiconScore(
+            round(math.tanh(valence * intensity), 4),
+            emotion,
+            round(confidence, 4)
+        )
+
+
+# Экземпляр для использования в других модулях
+lexicon_scorer = LexiconScorer()
@@ -1,15 +1,22 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from datetime import datetime
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, text
 
 from models.message import Message
 from models.chat import Chat
 from models.user import User
+from core.config import settings
 from schemas.message import MessageCreate, MessageUpdate
-from services.emotion_service import emotion_service
+from services.attachment_service import AttachmentService
+from services.inference import inference
+from services.inference_priority import Priority
+from services.minio_service import StoredFile
+from services.emotion_enrichment_service import emotion_enrichment_worker
+from services.emotion_rollup_service import EmotionRollupService
+from services.emotion_risk_service import emotion_risk_detector
 
 logger = logging.getLogger(__name__)
 
@@ -33,40 +40,73 @@ class MessageService:
         return result.scalars().all()
     
     @staticmethod
-    async def create_message(db: AsyncSession, message_create: MessageCreate) -> Message:
+    async def reserve_message_id(db: AsyncSession) -> int:
+        """
+        Следующий id сообщения из последовательности message_table.id
+
+        Файлы загружаются сразу под окончательным ключом с этим id, а
+        сообщение затем создаётся с ним же. Неиспользованный id оставляет
+        лишь пропуск в нумерации.
+        """
+        result = await db.execute(text("SELECT nextval(pg_get_serial_sequence('message_table', 'id'))"))
+        message_id = result.scalar_one()
+        # nextval не откатывается; не держим транзакцию открытой на время загрузки файлов
+        await db.commit()
+        return message_id
+    
+    @staticmethod
+    async def create_message(
+        db: AsyncSession,
+        message_create: MessageCreate,
+        message_id: Optional[int] = None,
+        files: Sequence[StoredFile] = ()
+    ) -> Message:
         message = Message(
+            id=message_id,
             from_user_id=message_create.from_user_id,
             chat_id=message_create.chat_id,
             text=message_create.text,
             status=message_create.status,
             date=datetime.utcnow(),
-            media=None
+            media=",".join(file.object_name for file in files) or None
         )
         
-        # Для любого типа пользователя делаем анализ эмоций текста
-        try:
-            logger.info(f"Анализ эмоций для сообщения от пользователя (ID: {message_create.from_user_id})")
-            
-            emotional_state = emotion_service.analyze_sentiment(message_create.text)
-            message.emotional_state = emotional_state
-            
-            emotion = emotion_service.classify_emotion(message_create.text)
-            message.emotion = emotion
-            
-            logger.info(f"Результат анализа текста: состояние = {emotional_state}, эмоция = {emotion}")
-        except Exception as e:
-            logger.error(f"Ошибка при анализе эмоций текста: {str(e)}")
+        # Для любого типа пользователя делаем анализ эмоций текста.
+        # В асинхронном режиме поля эмоций остаются NULL до фоновой оценки
+        if not settings.EMOTION_ENRICH_ASYNC:
+            try:
+                logger.info(f"Анализ эмоций для сообщения от пользователя (ID: {message_create.from_user_id})")
+                
+                # При перегрузке приходит эвристическая оценка без версии модели,
+                # такие строки позже пересчитывает скрипт дозаполнения
+                result = await inference.analyze_text(message_create.text, Priority.LIVE)
+                message.emotional_state = result.emotional_state
+                message.emotion = result.emotion
+                message.emotion_model_version = result.model_version
+                
+                logger.info(f"Результат анализа текста: состояние = {result.emotional_state}, эмоция = {result.emotion}")
+            except Exception as e:
+                logger.error(f"Ошибка при анализе эмоций текста: {str(e)}")
         
+        # Сообщение, его вложения и ссылка чата на последнее сообщение сохраняются в одной транзакции
         db.add(message)
-        await db.commit()
-        await db.refresh(message)
-        
+        await db.flush()
+        db.add_all(AttachmentService.build_attachments(message.id, files))
         await db.execute(
             update(Chat)
             .where(Chat.id == message_create.chat_id)
             .values(last_message_id=message.id)
         )
         await db.commit()
+        await db.refresh(message)
+        
+        if settings.EMOTION_ENRICH_ASYNC:
+            emotion_enrichment_worker.enqueue(message.id)
+        elif message.emotional_state is not None:
+            await EmotionRollupService.refresh_for_message(db, message)
+            await emotion_risk_detector.observe(
+                message.from_user_id, message.emotional_state, message.emotion, message.id, message.chat_id
+            )
         
         return message
     
@@ -90,11 +130,19 @@ class MessageService:
                 if user and user.type_id == 2:
                     logger.info(f"Пересчет эмоций при обновлении сообщения от пациента (ID: {user.id})")
                     
-                    update_data['emotional_state'] = emotion_service.analyze_sentiment(update_data['text'])
-                    
-                    update_data['emotion'] = emotion_service.classify_emotion(update_data['text'])
-                    
-                    logger.info(f"Результат анализа: состояние = {update_data['emotional_state']}, эмоция = {update_data['emotion']}")
+                    if settings.EMOTION_ENRICH_ASYNC:
+                        # Сбрасываем оценку, фоновый обработчик пересчитает её после сохранения
+                        update_data['emotional_state'] = None
+                        update_data['emotion'] = None
+                        update_data['emotion_model_version'] = None
+                    else:
+                        (
+                            update_data['emotional_state'],
+                            update_data['emotion'],
+                            update_data['emotion_model_version']
+                        ) = await inference.analyze_text(update_data['text'], Priority.EDIT)
+                        
+                        logger.info(f"Результат анализа: состояние = {update_data['emotional_state']}, эмоция = {update_data['emotion']}")
             except Exception as e:
                 logger.error(f"Ошибка при анализе эмоций при обновлении: {str(e)}")
         
@@ -105,6 +153,13 @@ class MessageService:
         )
         await db.commit()
         
+        if 'emotion' in update_data and update_data['emotion'] is None:
+            emotion_enrichment_worker.enqueue(message_id, Priority.EDIT)
+        
+        # Пересчитываем дневной агрегат, если оценка изменилась или сброшена
+        if 'emotional_state' in update_data or 'emotion' in update_data:
+            await EmotionRollupService.refresh_for_message(db, message)
+        
         return await MessageService.get_message(db, message_id)
     
     @staticmethod
@@ -115,4 +170,7 @@ class MessageService:
         
         await db.execute(delete(Message).where(Message.id == message_id))
         await db.commit()
+        
+        if message.emotional_state is not None:
+            await EmotionRollupService.refresh_for_message(db, message)
         return True
\ No newline at end of file
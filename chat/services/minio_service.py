@@ -1,31 +1,68 @@
+import asyncio
+import mimetypes
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
 from fastapi import UploadFile, HTTPException
 import io
-import aiofiles
 import logging
-from typing import Optional, List, Tuple
+import time
+from typing import Callable, NamedTuple, Optional, List, Tuple
 from datetime import timedelta
 import urllib3
 
 from core.config import settings
+from services.multipart_upload import MultipartUpload
+from services.presigned_url_cache import PresignedUrlCache
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from an upload spool per step; memory stays within one part plus this
+UPLOAD_READ_SIZE = 1024 * 1024
+
+class StoredFile(NamedTuple):
+    object_name: str
+    original_name: str
+    size: int
+    content_type: str
+    checksum: Optional[str]  # SHA-256 of the content, hex; unknown for direct uploads
+
+def guess_content_type(file_name: str) -> str:
+    """MIME type from the file extension, for clients that send none"""
+    return mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
 class MinioService:
+    """
+    Object storage for message files.
+
+    The MinIO client is blocking, so every call runs on a dedicated bounded
+    thread pool and the public methods are coroutines; a slow storage
+    response only holds one pool thread and never the event loop. The
+    urllib3 connection pool matches the thread pool so no thread waits for
+    a connection.
+    """
+
     def __init__(self):
+        timeout = urllib3.Timeout(connect=settings.MINIO_CONNECT_TIMEOUT, read=settings.MINIO_READ_TIMEOUT)
+        retries = urllib3.Retry(total=settings.MINIO_RETRIES, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
         
         http_client = None
         if settings.MINIO_PROXY_URL:  # Если указан прокси
             http_client = urllib3.ProxyManager(
                 proxy_url=settings.MINIO_PROXY_URL,
-                timeout=urllib3.Timeout(connect=10.0, read=30.0)  # Таймауты для соединения и чтения
+                timeout=timeout,
+                maxsize=settings.MINIO_POOL_SIZE,
+                retries=retries
             )
         else:
             http_client = urllib3.PoolManager(
-                timeout=urllib3.Timeout(connect=10.0, read=30.0)
+                timeout=timeout,
+                maxsize=settings.MINIO_POOL_SIZE,
+                retries=retries
             )
 
         # Инициализация MinIO клиента
@@ -36,25 +73,46 @@ class MinioService:
             secure=settings.MINIO_SECURE,
             http_client=http_client  # Передаем HTTP-клиент
         )
+        self.bucket_name = settings.MINIO_BUCKET_NAME
+        self.urls = PresignedUrlCache(
+            max_size=settings.MINIO_URL_CACHE_SIZE,
+            expiry=settings.MINIO_URL_EXPIRY,
+            refresh_margin=settings.MINIO_URL_REFRESH_MARGIN
+        )
 
-        # Инициализация бакета
-        self._initialize_bucket()
+        # Threads start on first use, so the pool is safe to create before serve.py forks
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.MINIO_POOL_SIZE),
+            thread_name_prefix="minio"
+        )
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        """Run a blocking client call on the storage thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(function, *args, **kwargs))
+
+    async def initialize(self):
+        """Create the bucket if it doesn't exist; called on application startup"""
+        await self._run(self._initialize_bucket)
     
     def _initialize_bucket(self):
         """Initialize the MinIO bucket if it doesn't exist"""
         try:
-            if not self.client.bucket_exists(settings.MINIO_BUCKET_NAME):
-                self.client.make_bucket(settings.MINIO_BUCKET_NAME)
-                logger.info(f"Created bucket: {settings.MINIO_BUCKET_NAME}")
+            if not self.client.bucket_exists(self.bucket_name):
+                self.client.make_bucket(self.bucket_name)
+                logger.info(f"Created bucket: {self.bucket_name}")
             else:
-                logger.info(f"Bucket {settings.MINIO_BUCKET_NAME} already exists")
+                logger.info(f"Bucket {self.bucket_name} already exists")
         except S3Error as e:
             logger.error(f"Error initializing MinIO bucket: {e}")
             raise
 
-    async def upload_file(self, file: UploadFile, chat_id: int, message_id: int) -> str:
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def upload_file(self, file: UploadFile, chat_id: int, message_id: int) -> StoredFile:
         """
-        Upload a file to MinIO and return the path
+        Upload a file to MinIO and describe the stored object
         
         Args:
             file: The file to upload
@@ -62,30 +120,40 @@ class MinioService:
             message_id: The ID of the message
             
         Returns:
-            str: The path to the uploaded file in MinIO
+            StoredFile: The path to the uploaded file in MinIO with its size and checksum
         """
         try:
-            # Generate a unique filename
+            # Create the object name with path: chat_id/message_id/unique filename
             original_filename = file.filename
-            file_extension = os.path.splitext(original_filename)[1] if original_filename else ""
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
+            object_name = self.make_object_name(chat_id, message_id, original_filename)
+            
+            content_type = file.content_type or guess_content_type(original_filename or "")
             
-            # Create the object name with path: chat_id/message_id/filename
-            object_name = f"{chat_id}/{message_id}/{unique_filename}"
+            # The request body is already spooled; reject oversized files before reading any of it
+            upload = MultipartUpload(self, object_name, content_type)
+            upload.check_size(await self._run(self._spooled_size, file.file))
             
-            # Read file content
-            content = await file.read()
+            # Stream the spool into MinIO part by part
+            try:
+                while True:
+                    chunk = await self._run(file.file.read, UPLOAD_READ_SIZE)
+                    if not chunk:
+                        break
+                    await upload.write(chunk)
+                checksum = await upload.complete()
+            except BaseException:
+                await upload.abort()
+                raise
             
-            # Upload file to MinIO
-            self.client.put_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
+            return StoredFile(
                 object_name=object_name,
-                data=io.BytesIO(content),
-                length=len(content),
-                content_type=file.content_type
+                original_name=original_filename or os.path.basename(object_name),
+                size=upload.size,
+                content_type=content_type,
+                checksum=checksum
             )
-            
-            return object_name
+        except HTTPException:
+            raise
         except S3Error as e:
             logger.error(f"Error uploading file to MinIO: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
@@ -93,34 +161,152 @@ class MinioService:
             logger.error(f"Unexpected error uploading file: {e}")
             raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-    def get_file_url(self, object_name: str) -> str:
+    @staticmethod
+    def _spooled_size(spool) -> int:
+        spool.seek(0, os.SEEK_END)
+        size = spool.tell()
+        spool.seek(0)
+        return size
+
+    async def get_file_url(self, object_name: str, known: bool = False) -> str:
         """
         Get the URL for a file in MinIO
         
         Args:
             object_name: The name of the object in MinIO
+            known: The caller knows the object exists, e.g. from its attachment row
             
         Returns:
             str: The URL to access the file
         """
+        url = self.urls.get(object_name)
+        if url is not None:
+            return url
+        
         try:
-            # Check if object exists
-            self.client.stat_object(settings.MINIO_BUCKET_NAME, object_name)
+            # Objects written or already seen here need no existence check
+            if not known and not self.urls.is_known(object_name):
+                self.urls.stat_calls += 1
+                await self._run(self.client.stat_object, self.bucket_name, object_name)
             
-            # Generate presigned URL (valid for 1 hour)
-            # Use timedelta object instead of an integer for expires
-            url = self.client.presigned_get_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
+            # Signing is local once the bucket region is known
+            signed_at = time.monotonic()
+            url = await self._run(
+                self.client.presigned_get_object,
+                bucket_name=self.bucket_name,
                 object_name=object_name,
-                expires=timedelta(hours=1)  # Use timedelta instead of integer
+                expires=timedelta(seconds=settings.MINIO_URL_EXPIRY)
             )
+            self.urls.put(object_name, url, signed_at)
             
             return url
         except S3Error as e:
             logger.error(f"Error getting file URL from MinIO: {e}")
             raise HTTPException(status_code=404, detail="File not found")
 
-    def delete_file(self, object_name: str) -> bool:
+    async def get_file_content(self, object_name: str) -> bytes:
+        """
+        Read the content of a file straight from MinIO
+        
+        Args:
+            object_name: The name of the object in MinIO
+            
+        Returns:
+            bytes: The object content
+        """
+        try:
+            return await self._run(self._read_object, object_name)
+        except S3Error as e:
+            logger.error(f"Error reading file from MinIO: {e}")
+            raise HTTPException(status_code=404, detail="File not found")
+
+    def _read_object(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def make_object_name(self, chat_id: int, message_id: int, file_name: Optional[str]) -> str:
+        """Unique object name for a message file: chat_id/message_id/uuid.ext"""
+        file_extension = os.path.splitext(file_name)[1] if file_name else ""
+        return f"{chat_id}/{message_id}/{uuid.uuid4()}{file_extension}"
+
+    async def stat_file(self, object_name: str):
+        """Object metadata (size, etag, ...), or None if there is no such object"""
+        try:
+            return await self._run(self.client.stat_object, self.bucket_name, object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return None
+            raise
+
+    async def presigned_put_url(self, object_name: str, expires: timedelta) -> str:
+        """URL a client can PUT the whole object to, without going through this service"""
+        return await self._run(self.client.presigned_put_object, self.bucket_name, object_name, expires=expires)
+
+    async def put_bytes(self, object_name: str, data: bytes, content_type: str):
+        """Store a small object held in memory with a single PUT"""
+        await self._run(
+            self.client.put_object,
+            self.bucket_name,
+            object_name,
+            io.BytesIO(data),
+            len(data),
+            content_type=content_type
+        )
+        self.urls.mark_known(object_name)
+
+    # The multipart wrappers below call private methods of the minio client;
+    # their signatures are those of the version pinned in requirements.txt
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        """Start a multipart upload and return its upload id"""
+        return await self._run(
+            self.client._create_multipart_upload,
+            self.bucket_name,
+            object_name,
+            {"Content-Type": content_type}
+        )
+
+    async def presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expires: timedelta) -> str:
+        """URL a client can PUT one part of a multipart upload to"""
+        return await self._run(
+            self.client.get_presigned_url,
+            "PUT",
+            self.bucket_name,
+            object_name,
+            expires=expires,
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)}
+        )
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Store one part of a multipart upload and return its ETag"""
+        return await self._run(
+            self.client._upload_part,
+            self.bucket_name,
+            object_name,
+            data,
+            {},
+            upload_id,
+            part_number
+        )
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Tuple[int, str]]):
+        """Assemble the object from (part number, ETag) pairs"""
+        await self._run(
+            self.client._complete_multipart_upload,
+            self.bucket_name,
+            object_name,
+            upload_id,
+            [Part(part_number, etag.strip('"')) for part_number, etag in parts]
+        )
+        self.urls.mark_known(object_name)
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str):
+        await self._run(self.client._abort_multipart_upload, self.bucket_name, object_name, upload_id)
+
+    async def delete_file(self, object_name: str) -> bool:
         """
         Delete a file from MinIO
         
@@ -131,13 +317,14 @@ class MinioService:
             bool: True if successful
         """
         try:
-            self.client.remove_object(settings.MINIO_BUCKET_NAME, object_name)
+            self.urls.invalidate(object_name)
+            await self._run(self.client.remove_object, self.bucket_name, object_name)
             return True
         except S3Error as e:
             logger.error(f"Error deleting file from MinIO: {e}")
             return False
     
-    def list_files(self, chat_id: int, message_id: Optional[int] = None) -> List[str]:
+    async def list_files(self, chat_id: int, message_id: Optional[int] = None) -> List[str]:
         """
         List files for a chat or specific message
         
@@ -153,8 +340,10 @@ class MinioService:
             if message_id:
                 prefix = f"{chat_id}/{message_id}/"
             
-            objects = self.client.list_objects(settings.MINIO_BUCKET_NAME, prefix=prefix, recursive=True)
-            return [obj.object_name for obj in objects]
+            # list_objects pages lazily, so the whole iteration runs on the pool
+            return await self._run(
+                lambda: [obj.object_name for obj in self.client.list_objects(self.bucket_name, prefix=prefix, recursive=True)]
+            )
         except S3Error as e:
             logger.error(f"Error listing files from MinIO: {e}")
             return []
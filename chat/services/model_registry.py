@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ModelHandle:
+    """
+    A model that is built on first use and remembers how loading went.
+
+    Loading is guarded by a lock so concurrent first callers share one load.
+    A failed load is not retried; callers get None and fall back to their
+    neutral defaults, as they did when a model failed at import time.
+    """
+
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._model: Any = None
+        self.state = self.NOT_LOADED
+        self.load_time: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def get(self) -> Any:
+        """Return the model, loading it if needed (None if loading failed)"""
+        if self.state == self.READY:
+            return self._model
+
+        with self._lock:
+            if self.state == self.NOT_LOADED:
+                self._load()
+            return self._model
+
+    def _load(self):
+        self.state = self.LOADING
+        started = time.perf_counter()
+        try:
+            self._model = self._loader()
+            self.state = self.READY
+            logger.info(f"Model {self.name} loaded in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self._model = None
+            self.state = self.FAILED
+            self.error = str(e)
+            logger.error(f"Error loading model {self.name}: {str(e)}")
+        finally:
+            self.load_time = time.perf_counter() - started
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_time": round(self.load_time, 3) if self.load_time is not None else None,
+            "error": self.error
+        }
+
+class ModelRegistry:
+    """Keeps track of every lazily loaded model in the process"""
+
+    def __init__(self):
+        self._handles: Dict[str, ModelHandle] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]) -> ModelHandle:
+        handle = ModelHandle(name, loader)
+        self._handles[name] = handle
+        return handle
+
+    def load_all(self):
+        """Load every registered model in the calling thread"""
+        for handle in self._handles.values():
+            handle.get()
+
+    async def warm_up(self):
+        """Load every registered model without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        for handle in self._handles.values():
+            await loop.run_in_executor(None, handle.get)
+
+    @property
+    def ready(self) -> bool:
+        return all(handle.state == ModelHandle.READY for handle in self._handles.values())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: handle.status() for name, handle in self._handles.items()}
+
+# Singleton instance
+model_registry = ModelRegistry()
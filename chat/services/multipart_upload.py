@@ -0,0 +1,88 @@
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class ObjectTooLargeError(HTTPException):
+    def __init__(self, max_size: int):
+        super().__init__(status_code=413, detail=f"File is larger than {max_size} bytes")
+
+class MultipartUpload:
+    """
+    One object written to MinIO in fixed-size parts as its bytes arrive.
+
+    At most one part is buffered, so memory per upload is bounded by the
+    part size whatever the object size. Size and SHA-256 are computed on
+    the fly, and the size limit is checked before data is buffered. An
+    object that ends within its first part is stored with a single PUT.
+    Callers must `abort` an upload they do not `complete`, or MinIO keeps
+    the parts until its own cleanup.
+    """
+
+    def __init__(self, storage, object_name: str, content_type: str, max_size: Optional[int] = None):
+        self.storage = storage
+        self.object_name = object_name
+        self.content_type = content_type
+        self.max_size = settings.MINIO_MAX_OBJECT_SIZE if max_size is None else max_size
+        self.part_size = max(MIN_PART_SIZE, settings.MINIO_PART_SIZE)
+        self.upload_id: Optional[str] = None
+        self.parts: List[Tuple[int, str]] = []  # (part number, ETag)
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+
+    def check_size(self, size: int):
+        """Reject an object of `size` bytes if it is over the limit"""
+        if self.max_size > 0 and size > self.max_size:
+            raise ObjectTooLargeError(self.max_size)
+
+    async def write(self, data: bytes):
+        self.check_size(self.size + len(data))
+        self.size += len(data)
+        self._sha256.update(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(memoryview(self._buffer)[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._upload_part(part)
+
+    async def _upload_part(self, data: bytes):
+        if self.upload_id is None:
+            self.upload_id = await self.storage.create_multipart_upload(self.object_name, self.content_type)
+        part_number = len(self.parts) + 1
+        etag = await self.storage.upload_part(self.object_name, self.upload_id, part_number, data)
+        self.parts.append((part_number, etag))
+
+    async def complete(self) -> str:
+        """
+        Store the remaining bytes and finish the object
+
+        Returns:
+            str: SHA-256 of the whole content, hex
+        """
+        if self.upload_id is None:
+            await self.storage.put_bytes(self.object_name, bytes(self._buffer), self.content_type)
+        else:
+            if self._buffer:
+                await self._upload_part(bytes(self._buffer))
+            await self.storage.complete_multipart_upload(self.object_name, self.upload_id, self.parts)
+        self._buffer = bytearray()
+        return self._sha256.hexdigest()
+
+    async def abort(self):
+        """Drop the parts stored so far; never raises"""
+        self._buffer = bytearray()
+        if self.upload_id is None:
+            return
+        try:
+            await self.storage.abort_multipart_upload(self.object_name, self.upload_id)
+        except Exception as e:
+            logger.error(f"Error aborting multipart upload of {self.object_name}: {e}")
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class PresignedUrlCache:
+    """
+    Bounded LRU cache of presigned GET URLs keyed by object name.
+
+    A URL is reused until `refresh_margin` seconds before it expires, so a
+    link handed out is always valid for at least that long. Objects this
+    process wrote or already found with `stat_object` are remembered as
+    existing, so re-signing them needs no storage round-trip either.
+    Entries are dropped when the object is deleted through this process;
+    another server worker may keep serving a URL to a deleted object until
+    it expires, which a client sees as a 404 from storage.
+    """
+
+    def __init__(self, max_size: int, expiry: int, refresh_margin: int):
+        self.max_size = max_size
+        self.expiry = expiry
+        self.refresh_margin = min(refresh_margin, expiry // 2)
+        # object name -> (reuse until, url)
+        self._urls: "OrderedDict[str, tuple]" = OrderedDict()
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self.hits = 0
+        self.signed = 0
+        self.stat_calls = 0
+
+    def get(self, object_name: str) -> Optional[str]:
+        """Cached URL still valid for at least the refresh margin, or None"""
+        entry = self._urls.get(object_name)
+        if entry is not None:
+            reuse_until, url = entry
+            if reuse_until > time.monotonic():
+                self._urls.move_to_end(object_name)
+                self.hits += 1
+                return url
+            del self._urls[object_name]
+        return None
+
+    def put(self, object_name: str, url: str, signed_at: float):
+        """Store a URL signed at `signed_at` (time.monotonic) for `expiry` seconds"""
+        self.signed += 1
+        if self.max_size <= 0:
+            return
+        self._urls[object_name] = (signed_at + self.expiry - self.refresh_margin, url)
+        self._urls.move_to_end(object_name)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+        self.mark_known(object_name)
+
+    def is_known(self, object_name: str) -> bool:
+        if object_name in self._known:
+            self._known.move_to_end(object_name)
+            return True
+        return False
+
+    def mark_known(self, object_name: str):
+        """Remember that an object exists, e.g. right after writing it"""
+        if self.max_size <= 0:
+            return
+        self._known[object_name] = None
+        self._known.move_to_end(object_name)
+        while len(self._known) > self.max_size:
+            self._known.popitem(last=False)
+
+    def invalidate(self, object_name: str):
+        self._urls.pop(object_name, None)
+        self._known.pop(object_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._urls),
+            "known_objects": len(self._known),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "signed": self.signed,
+            "stat_calls": self.stat_calls
+        }
@@ -0,0 +1,401 @@
+import asyncio
+import logging
+import math
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from minio.error import S3Error
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.message import Message
+from models.upload_session import UploadSession
+from schemas.message import MessageCreate
+from schemas.upload import UploadCompletion, UploadedFile, UploadedPart, UploadFileRequest, UploadSessionCreate
+from services.message_service import MessageService
+from services.minio_service import StoredFile, guess_content_type, minio_service
+from services.multipart_upload import MIN_PART_SIZE, ObjectTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# S3 limit on parts of one multipart upload
+MAX_PARTS = 10000
+
+# Finished and expired sessions are kept this long for status answers, then deleted
+SESSION_RETENTION = timedelta(days=1)
+
+class UploadSessionService:
+    """
+    Direct-to-storage uploads for a message that does not exist yet.
+
+    Creating sessions reserves the message id and hands out presigned PUT
+    URLs: one for a file that fits in a part, one per part of a multipart
+    upload otherwise. File bytes then go from the client straight to MinIO.
+    Completion checks every object's size (and ETag when given) and creates
+    the message with its attachments; sessions never completed are expired
+    by `UploadSessionSweeper`, which removes whatever was uploaded.
+    Files can also be streamed through the chat socket (`begin_stream`,
+    `store_part`); their part ETags are recorded as they arrive, so an
+    upload resumes after a reconnect from the first missing part.
+    """
+
+    @staticmethod
+    async def create_sessions(db: AsyncSession, request: UploadSessionCreate) -> Dict[str, Any]:
+        part_size = max(MIN_PART_SIZE, settings.MINIO_PART_SIZE)
+        for file in request.files:
+            UploadSessionService._check_size(file.size, part_size)
+
+        message_id = await MessageService.reserve_message_id(db)
+        expires = timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+        expires_at = datetime.utcnow() + expires
+
+        uploads = []
+        sessions = []
+        try:
+            for file in request.files:
+                session = UploadSession(
+                    id=uuid.uuid4().hex,
+                    message_id=message_id,
+                    chat_id=request.chat_id,
+                    user_id=request.from_user_id,
+                    object_key=minio_service.make_object_name(request.chat_id, message_id, file.name),
+                    original_name=file.name,
+                    content_type=file.content_type or guess_content_type(file.name),
+                    size=file.size,
+                    status="pending",
+                    expires_at=expires_at
+                )
+                sessions.append(session)
+                target = {"session_id": session.id, "object_key": session.object_key, "file_name": file.name}
+
+                if file.size <= part_size:
+                    target["url"] = await minio_service.presigned_put_url(session.object_key, expires)
+                else:
+                    session.multipart_upload_id = await minio_service.create_multipart_upload(
+                        session.object_key, session.content_type
+                    )
+                    session.part_count = math.ceil(file.size / part_size)
+                    session.part_size = part_size
+                    target["part_size"] = part_size
+                    target["part_urls"] = [
+                        await minio_service.presigned_part_url(
+                            session.object_key, session.multipart_upload_id, part_number, expires
+                        )
+                        for part_number in range(1, session.part_count + 1)
+                    ]
+                uploads.append(target)
+
+            db.add_all(sessions)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            for session in sessions:
+                if session.multipart_upload_id:
+                    await UploadSessionService._abort(session)
+            raise
+
+        return {"message_id": message_id, "expires_at": expires_at, "uploads": uploads}
+
+    @staticmethod
+    def _check_size(size: int, part_size: int):
+        if settings.MINIO_MAX_OBJECT_SIZE > 0 and size > settings.MINIO_MAX_OBJECT_SIZE:
+            raise ObjectTooLargeError(settings.MINIO_MAX_OBJECT_SIZE)
+        if math.ceil(size / part_size) > MAX_PARTS:
+            raise ObjectTooLargeError(part_size * MAX_PARTS)
+
+    @staticmethod
+    async def begin_stream(
+        db: AsyncSession,
+        chat_id: int,
+        user_id: int,
+        file: UploadFileRequest,
+        message_id: Optional[int] = None
+    ) -> UploadSession:
+        """
+        Start a file the client streams through this service in numbered parts
+
+        Every file is a multipart upload, even a single-part one, so parts can
+        be written and acknowledged one at a time. Pass the `message_id` of an
+        earlier file to add another file to the same message.
+        """
+        part_size = max(MIN_PART_SIZE, settings.MINIO_PART_SIZE)
+        UploadSessionService._check_size(file.size, part_size)
+
+        if message_id is None:
+            message_id = await MessageService.reserve_message_id(db)
+        else:
+            sessions = await UploadSessionService._get_sessions(db, message_id)
+            if not sessions or any(
+                session.chat_id != chat_id or session.user_id != user_id or session.status != "pending"
+                for session in sessions
+            ):
+                raise HTTPException(status_code=404, detail="Upload session not found")
+
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            message_id=message_id,
+            chat_id=chat_id,
+            user_id=user_id,
+            object_key=minio_service.make_object_name(chat_id, message_id, file.name),
+            original_name=file.name,
+            content_type=file.content_type or guess_content_type(file.name),
+            size=file.size,
+            part_count=max(1, math.ceil(file.size / part_size)),
+            part_size=part_size,
+            uploaded_parts={},
+            status="pending",
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+        )
+        session.multipart_upload_id = await minio_service.create_multipart_upload(
+            session.object_key, session.content_type
+        )
+        try:
+            db.add(session)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await UploadSessionService._abort(session)
+            raise
+        return session
+
+    @staticmethod
+    async def get_stream(db: AsyncSession, session_id: str, chat_id: int, user_id: int) -> UploadSession:
+        """
+        Pending streamed upload of this user in this chat
+
+        Raises:
+            HTTPException: 404 for an unknown or foreign session, 409 if it is
+                already completed, 410 once expired
+        """
+        session = await db.get(UploadSession, session_id)
+        if session is None or session.chat_id != chat_id or session.user_id != user_id or not session.part_size:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session.status == "completed":
+            raise HTTPException(status_code=409, detail="Upload already completed")
+        if session.status == "expired" or session.expires_at < datetime.utcnow():
+            raise HTTPException(status_code=410, detail="Upload session expired")
+        return session
+
+    @staticmethod
+    def next_part(session: UploadSession) -> Optional[int]:
+        """First part not stored yet, None once every part is"""
+        uploaded = session.uploaded_parts or {}
+        return next(
+            (part_number for part_number in range(1, session.part_count + 1) if str(part_number) not in uploaded),
+            None
+        )
+
+    @staticmethod
+    async def store_part(db: AsyncSession, session: UploadSession, part_number: int, data: bytes):
+        """
+        Write one part to storage and record its ETag
+
+        Every part but the last must be exactly `part_size` bytes. A part sent
+        again replaces the stored one. Each stored part extends the session's
+        expiry, so a slow upload is not swept while it makes progress.
+        """
+        if not 1 <= part_number <= session.part_count:
+            raise HTTPException(status_code=400, detail=f"Part {part_number} is out of range 1..{session.part_count}")
+        if part_number < session.part_count:
+            expected = session.part_size
+        else:
+            expected = session.size - session.part_size * (session.part_count - 1)
+        if len(data) != expected:
+            raise HTTPException(status_code=400, detail=f"Part {part_number} must be {expected} bytes, got {len(data)}")
+
+        etag = await minio_service.upload_part(session.object_key, session.multipart_upload_id, part_number, data)
+        # JSONB is not tracked for in-place changes; assign a new dict
+        session.uploaded_parts = {**(session.uploaded_parts or {}), str(part_number): etag}
+        session.expires_at = datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+        await db.commit()
+
+    @staticmethod
+    async def complete_streamed(db: AsyncSession, message_id: int, chat_id: int, user_id: int, text: str) -> Message:
+        """Create the message from files streamed with `store_part`"""
+        sessions = await UploadSessionService._get_sessions(db, message_id)
+        if not sessions or any(session.chat_id != chat_id or session.user_id != user_id for session in sessions):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+        completion = UploadCompletion(
+            text=text,
+            uploads=[
+                UploadedFile(
+                    session_id=session.id,
+                    parts=[
+                        UploadedPart(part_number=int(part_number), etag=etag)
+                        for part_number, etag in (session.uploaded_parts or {}).items()
+                    ]
+                )
+                for session in sessions
+            ]
+        )
+        return await UploadSessionService.complete(db, message_id, completion)
+
+    @staticmethod
+    async def _get_sessions(db: AsyncSession, message_id: int) -> List[UploadSession]:
+        result = await db.execute(
+            select(UploadSession)
+            .filter(UploadSession.message_id == message_id)
+            .order_by(UploadSession.created_at, UploadSession.object_key)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def complete(db: AsyncSession, message_id: int, completion: UploadCompletion) -> Message:
+        """
+        Verify the uploaded objects and create the message with them attached
+
+        Raises:
+            HTTPException: 404 for unknown sessions, 409 if already completed,
+                410 once expired, 400 when an object is missing or does not match
+        """
+        sessions = await UploadSessionService._get_sessions(db, message_id)
+        if not sessions:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if any(session.status == "completed" for session in sessions):
+            raise HTTPException(status_code=409, detail="Upload already completed")
+        if any(session.status == "expired" or session.expires_at < datetime.utcnow() for session in sessions):
+            raise HTTPException(status_code=410, detail="Upload session expired")
+
+        uploaded = {file.session_id: file for file in completion.uploads}
+        if set(uploaded) != {session.id for session in sessions}:
+            raise HTTPException(status_code=400, detail="Every file of the upload must be completed")
+
+        stored_files = []
+        for session in sessions:
+            stored_files.append(await UploadSessionService._verify(session, uploaded[session.id]))
+            session.status = "completed"
+
+        # The session rows are flushed with the message and its attachments, in one commit
+        message_create = MessageCreate(
+            from_user_id=sessions[0].user_id,
+            chat_id=sessions[0].chat_id,
+            text=completion.text or "",
+            status=False
+        )
+        try:
+            return await MessageService.create_message(db, message_create, message_id=message_id, files=stored_files)
+        except Exception:
+            await db.rollback()
+            raise
+
+    @staticmethod
+    async def _verify(session: UploadSession, uploaded) -> StoredFile:
+        if session.multipart_upload_id:
+            part_numbers = sorted(part.part_number for part in uploaded.parts or [])
+            if part_numbers != list(range(1, session.part_count + 1)):
+                raise HTTPException(status_code=400, detail=f"Missing parts of {session.original_name}")
+            try:
+                await minio_service.complete_multipart_upload(
+                    session.object_key,
+                    session.multipart_upload_id,
+                    [(part.part_number, part.etag) for part in sorted(uploaded.parts, key=lambda part: part.part_number)]
+                )
+            except S3Error as e:
+                # A retried completion finds the upload already assembled
+                if e.code != "NoSuchUpload":
+                    raise HTTPException(status_code=400, detail=f"Could not assemble {session.original_name}: {e.code}")
+
+        stat = await minio_service.stat_file(session.object_key)
+        if stat is None:
+            raise HTTPException(status_code=400, detail=f"{session.original_name} was not uploaded")
+        if stat.size != session.size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{session.original_name} has {stat.size} bytes, {session.size} were announced"
+            )
+        if uploaded.etag and session.multipart_upload_id is None and stat.etag.strip('"') != uploaded.etag.strip('"'):
+            raise HTTPException(status_code=400, detail=f"ETag of {session.original_name} does not match")
+
+        minio_service.urls.mark_known(session.object_key)
+        return StoredFile(
+            object_name=session.object_key,
+            original_name=session.original_name,
+            size=stat.size,
+            content_type=session.content_type,
+            checksum=None
+        )
+
+    @staticmethod
+    async def _abort(session: UploadSession):
+        try:
+            await minio_service.abort_multipart_upload(session.object_key, session.multipart_upload_id)
+        except Exception as e:
+            logger.warning(f"Could not abort multipart upload of {session.object_key}: {str(e)}")
+
+    @staticmethod
+    async def expire_sessions(db: AsyncSession, limit: int = 500) -> int:
+        """
+        Expire pending sessions past their deadline and remove what they uploaded
+
+        Returns:
+            int: Number of sessions expired
+        """
+        now = datetime.utcnow()
+        expired = 0
+        while True:
+            result = await db.execute(
+                select(UploadSession)
+                .filter(UploadSession.status == "pending", UploadSession.expires_at < now)
+                .order_by(UploadSession.expires_at)
+                .limit(limit)
+            )
+            sessions = result.scalars().all()
+            if not sessions:
+                break
+            for session in sessions:
+                if session.multipart_upload_id:
+                    await UploadSessionService._abort(session)
+                # Also covers single PUTs and multipart uploads assembled by a failed completion
+                await minio_service.delete_file(session.object_key)
+                session.status = "expired"
+            await db.commit()
+            expired += len(sessions)
+
+        await db.execute(
+            delete(UploadSession)
+            .where(UploadSession.status != "pending", UploadSession.expires_at < now - SESSION_RETENTION)
+        )
+        await db.commit()
+        return expired
+
+class UploadSessionSweeper:
+    """Periodic expiry of abandoned upload sessions"""
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        # With several server workers only one of them sweeps
+        self.sweep_enabled = True
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.sweep_enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    expired = await UploadSessionService.expire_sessions(db)
+                if expired:
+                    logger.info(f"Expired {expired} abandoned upload sessions")
+            except Exception as e:
+                logger.error(f"Error expiring upload sessions: {str(e)}")
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+# Singleton instance
+upload_session_sweeper = UploadSessionSweeper(settings.UPLOAD_SESSION_SWEEP_INTERVAL)
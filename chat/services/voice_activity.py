@@ -0,0 +1,106 @@
+import bisect
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+class EnergyVad:
+    """
+    Streaming energy-based voice activity detection.
+
+    Samples are cut into fixed frames; a frame is speech when its RMS level
+    is above `threshold_db` (dBFS). Speech frames are dilated by `padding_ms`
+    on both sides so word onsets and short pauses inside a phrase are kept.
+    Because the dilation looks ahead, the last `padding` frames of each block
+    are held back until the next block (or the end of the stream) decides them.
+
+    Kept audio is yielded as runs of contiguous samples; `to_original` maps
+    an offset in the concatenated speech back to recording time.
+    """
+
+    def __init__(self, sample_rate: int, threshold_db: float, frame_ms: float = 30, padding_ms: float = 200):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.frame = max(1, int(sample_rate * frame_ms / 1000))
+        self.padding = max(0, int(round(padding_ms / frame_ms)))
+        self.total_samples = 0
+        self.speech_samples = 0
+        self._remainder = np.empty(0, dtype=np.float32)
+        self._frames = np.empty((0, self.frame), dtype=np.float32)
+        self._flags = np.empty(0, dtype=bool)
+        self._history = np.zeros(0, dtype=bool)
+        self._next_frame = 0  # Index in the recording of the first undecided frame
+        # (speech offset, original offset) in samples where each kept run starts
+        self._runs: List[Tuple[int, int]] = []
+
+    def filter(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """Yield only the speech parts of a stream of sample blocks"""
+        for block in blocks:
+            yield from self._process(block, final=False)
+        yield from self._process(np.empty(0, dtype=np.float32), final=True)
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.speech_samples / self.sample_rate
+
+    @property
+    def total_seconds(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    def to_original(self, speech_offset: int) -> int:
+        """Map an offset in the kept speech (samples) to the original recording"""
+        if not self._runs:
+            return speech_offset
+        index = bisect.bisect_right(self._runs, (speech_offset, float("inf"))) - 1
+        speech_start, original_start = self._runs[max(0, index)]
+        return original_start + speech_offset - speech_start
+
+    def _process(self, block: np.ndarray, final: bool) -> Iterator[np.ndarray]:
+        self.total_samples += len(block)
+        samples = np.concatenate([self._remainder, block])
+        whole = len(samples) // self.frame * self.frame
+        if final and whole < len(samples):
+            # Pad the trailing partial frame so it is judged like the others
+            samples = np.concatenate([samples, np.zeros(self.frame - len(samples) % self.frame, dtype=np.float32)])
+            whole = len(samples)
+        frames = samples[:whole].reshape(-1, self.frame)
+        self._remainder = samples[whole:]
+
+        if len(frames):
+            rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+            level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+            self._frames = np.concatenate([self._frames, frames])
+            self._flags = np.concatenate([self._flags, level_db > self.threshold_db])
+
+        decidable = len(self._flags) if final else len(self._flags) - self.padding
+        if decidable <= 0:
+            return
+
+        # Dilate speech flags by `padding` frames, using decided history and pending lookahead
+        context = np.concatenate([self._history, self._flags])
+        kernel = np.ones(2 * self.padding + 1, dtype=int)
+        dilated = np.convolve(context.astype(int), kernel)[self.padding:self.padding + len(context)] > 0
+        keep = dilated[len(self._history):len(self._history) + decidable]
+
+        yield from self._emit(self._frames[:decidable], keep, final)
+
+        self._history = context[:len(self._history) + decidable][-self.padding:] if self.padding else self._history
+        self._frames = self._frames[decidable:]
+        self._flags = self._flags[decidable:]
+        self._next_frame += decidable
+
+    def _emit(self, frames: np.ndarray, keep: np.ndarray, final: bool) -> Iterator[np.ndarray]:
+        # Split the kept frames into contiguous runs
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(int), [0]])))
+        for start, end in zip(edges[::2], edges[1::2]):
+            run = frames[start:end].reshape(-1)
+            original = int(self._next_frame + start) * self.frame
+            if final and self.total_samples < original + len(run):
+                # Drop the zero padding added to the trailing frame
+                run = run[:max(0, self.total_samples - original)]
+            if not len(run):
+                continue
+            last = self._runs[-1] if self._runs else None
+            if last is None or self.speech_samples - last[0] != original - last[1]:
+                self._runs.append((self.speech_samples, original))
+            self.speech_samples += len(run)
+            yield run
@@ -1,115 +1,291 @@
 import logging
+import threading
 import numpy as np
-import tempfile
-import os
-from typing import Tuple, Optional
-import librosa
-import torch
-from transformers import AutoModelForAudioClassification, AutoFeatureExtractor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from core.config import settings
+from services.audio_decoder import TARGET_SAMPLE_RATE, AudioDecodeError, iter_audio_blocks
+from services.inference_backend import inference_backend
+from services.inference_scheduler import inference_scheduler
+from services.model_registry import ModelRegistry, model_registry
+from services.voice_activity import EnergyVad
 
 logger = logging.getLogger(__name__)
 
 class VoiceEmotionService:
-    def __init__(self):
-        try:
-            # Initialize the model and feature extractor for emotion recognition from audio
-            # Using a pre-trained model for speech emotion recognition
-            model_name = "ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
-            self.model = AutoModelForAudioClassification.from_pretrained(model_name)
-            self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_name)
+    # A trailing window adding less new audio than this is skipped
+    MIN_TAIL_SECONDS = 1.0
+    VAD_FRAME_MS = 30
+
+    def __init__(self, backend=None, registry: Optional[ModelRegistry] = None):
+        # Initialize the model and feature extractor for emotion recognition from audio
+        # lazily, on first use or during background warm-up
+        self.model_name = settings.VOICE_EMOTION_MODEL
+        self.backend = backend or inference_backend
+        self._model = (registry or model_registry).register("voice_emotion", self._load_model)
+
+        # Totals of audio decoded and speech kept by the VAD, for sizing the voice lane
+        self._vad_lock = threading.Lock()
+        self._vad_totals = {"clips": 0, "skipped_clips": 0, "audio_seconds": 0.0, "speech_seconds": 0.0}
+        
+        # Mapping of model labels to standardized emotion values we use in the app
+        self.emotion_map = {
+            "angry": "anger",
+            "anger": "anger",
+            "calm": "calm",
+            "disgust": "disgust",
+            "fear": "fear",
+            "happiness": "happiness",
+            "happy": "happiness",
+            "positive": "happiness",
+            "neutral": "calm",
+            "other": "calm",
+            "sad": "sadness",
+            "sadness": "sadness",
+            "negative": "sadness",
+            "surprise": "surprise"
+        }
+        
+        # Valence of each model label, weighted by its probability
+        self.label_valence = {
+            "neutral": 0.0,
+            "other": 0.0,
+            "calm": 0.3,
+            "positive": 0.7,
+            "negative": -0.7,
+            "angry": -0.9,
+            "anger": -0.9,
+            "sad": -0.6,
+            "sadness": -0.6,
+            "happy": 0.9,
+            "happiness": 0.9,
+            "fear": -0.8,
+            "disgust": -0.6,
+            "surprise": 0.5
+        }
+
+    def _load_model(self):
+        return self.backend.audio_classifier(self.model_name)
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the speech model and backend stored with each score"""
+        return f"{self.model_name}@{self.backend.name}"
+
+    @property
+    def classifier(self):
+        return self._model.get()
+    
+    async def analyze_audio_file(self, audio_data: bytes, file_name: str) -> Tuple[float, str, bool]:
+        """
+        Analyze audio data for emotional content without blocking the event loop
+        
+        Args:
+            audio_data: Raw bytes of the audio file
+            file_name: Name of the audio file (used for logging)
             
-            # Emotion labels for the model
-            self.emotions = ["angry", "calm", "disgust", "fear", "happiness", "neutral", "sadness", "surprise"]
+        Returns:
+            Tuple[float, str, bool]: Emotional state (-1 to 1), emotion label and whether it was scored
+        """
+        return await inference_scheduler.voice.run(self.analyze_audio, audio_data, file_name)
+
+    async def analyze_audio_timeline(self, audio_data: bytes, file_name: str) -> Dict[str, Any]:
+        """
+        Analyze audio data and keep the per-window emotion timeline
+        
+        Args:
+            audio_data: Raw bytes of the audio file
+            file_name: Name of the audio file (used for logging)
             
-            # Mapping to standardized emotion values we use in the app
-            self.emotion_map = {
-                "angry": "anger",
-                "calm": "calm",
-                "disgust": "disgust",
-                "fear": "fear",
-                "happiness": "happiness",
-                "neutral": "calm",
-                "sadness": "sadness",
-                "surprise": "surprise"
-            }
+        Returns:
+            Dict[str, Any]: Overall emotional state and emotion, duration and segments
+        """
+        return await inference_scheduler.voice.run(self.analyze_audio_segments, audio_data, file_name)
+
+    def analyze_audio(self, audio_data: Union[bytes, BinaryIO], file_name: str) -> Tuple[float, str, bool]:
+        """
+        Analyze audio data for emotional content in the calling thread
+        
+        Args:
+            audio_data: Raw bytes or a binary buffer of the audio file
+            file_name: Name of the audio file (used for logging; the format is detected from content)
             
-            logger.info("Voice emotion models successfully loaded")
-        except Exception as e:
-            logger.error(f"Error initializing voice emotion models: {str(e)}")
-            self.model = None
-            self.feature_extractor = None
-            self.emotions = []
-            self.emotion_map = {}
-    
-    async def analyze_audio_file(self, audio_data: bytes, file_name: str) -> Tuple[float, str]:
+        Returns:
+            Tuple[float, str, bool]: Emotional state (-1 to 1), emotion label and whether
+            it was scored; False means neutral defaults after a failure, to be re-scored
         """
-        Analyze audio data for emotional content
+        result = self.analyze_audio_segments(audio_data, file_name, with_timeline=False)
+        return result["emotional_state"], result["emotion"], result["scored"]
+
+    def analyze_audio_segments(
+        self,
+        audio_data: Union[bytes, BinaryIO],
+        file_name: str,
+        with_timeline: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Run the model over fixed-size overlapping windows of the speech in a recording
+        
+        Audio is decoded block by block and only a few windows are in memory
+        at once, so memory and per-pass latency stay flat for long voice notes.
+        Silence is cut by the VAD before windowing, so model work scales with
+        the speech kept; clips without speech are never sent to the model.
+        Window probabilities are averaged, weighted by window duration, and
+        segment times refer to the original recording.
         
         Args:
-            audio_data: Raw bytes of the audio file
-            file_name: Name of the audio file (used to determine format)
+            audio_data: Raw bytes or a binary buffer of the audio file
+            file_name: Name of the audio file (used for logging)
+            with_timeline: Whether to return per-window segments
             
         Returns:
-            Tuple[float, str]: Emotional state (-1 to 1) and emotion label
+            Dict[str, Any]: Overall emotional state and emotion, duration,
+            seconds of speech kept, segments and `scored`: False when the
+            values are defaults because the model or the decoding failed;
+            a clip without speech is a real result and counts as scored
         """
-        if not self.model or not self.feature_extractor:
+        result = {
+            "emotional_state": 0.0, "emotion": "calm", "duration": 0.0, "speech_duration": 0.0, "segments": [],
+            "scored": False
+        }
+        if not self.classifier:
             logger.warning("Voice emotion model not initialized, returning default values")
-            return 0.0, "calm"
-        
+            return result
+
         try:
-            # Save audio data to a temporary file
-            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(file_name)[1], delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_path = temp_file.name
-            
-            # Load and preprocess audio
-            try:
-                # Load audio with librosa (handles various formats)
-                audio_array, sampling_rate = librosa.load(temp_path, sr=16000)
-                
-                # Remove temporary file
-                os.unlink(temp_path)
-                
-                # Extract features
-                inputs = self.feature_extractor(
-                    audio_array, 
-                    sampling_rate=sampling_rate, 
-                    return_tensors="pt"
+            blocks = iter_audio_blocks(audio_data, TARGET_SAMPLE_RATE, settings.VOICE_WINDOW_SECONDS)
+            vad = None
+            if settings.VOICE_VAD_ENABLED:
+                vad = EnergyVad(
+                    TARGET_SAMPLE_RATE,
+                    settings.VOICE_VAD_THRESHOLD_DB,
+                    frame_ms=self.VAD_FRAME_MS,
+                    padding_ms=settings.VOICE_VAD_PADDING_MS
                 )
-                
-                # Get model predictions
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                    logits = outputs.logits
-                    
-                # Get predicted class and confidence
-                predicted_class_id = torch.argmax(logits, dim=1).item()
-                probabilities = torch.nn.functional.softmax(logits, dim=1)[0]
-                confidence = probabilities[predicted_class_id].item()
-                
-                # Get emotion name
-                emotion = self.emotions[predicted_class_id]
-                standardized_emotion = self.emotion_map.get(emotion, "calm")
-                
-                # Calculate emotional state value (-1 to 1)
-                # Map negative emotions to negative values, positive to positive
-                emotional_state = 0.0
-                if emotion in ["happiness", "calm", "surprise"]:
-                    emotional_state = confidence  # 0 to 1
-                elif emotion in ["angry", "disgust", "fear", "sadness"]:
-                    emotional_state = -confidence  # -1 to 0
-                
-                logger.info(f"Voice emotion analysis: {emotion} with confidence {confidence}")
-                return emotional_state, standardized_emotion
-                
-            except Exception as e:
-                logger.error(f"Error processing audio file: {str(e)}")
-                os.unlink(temp_path)  # Ensure temp file is removed
-                return 0.0, "calm"
-                
+                blocks = vad.filter(blocks)
+
+            totals = None
+            total_weight = 0.0
+            for batch in self._iter_window_batches(blocks):
+                probabilities = self._predict([window for _, window in batch])
+                for (offset, window), window_probabilities in zip(batch, probabilities):
+                    length = len(window) / TARGET_SAMPLE_RATE
+                    weighted = window_probabilities * length
+                    totals = weighted if totals is None else totals + weighted
+                    total_weight += length
+
+                    if vad is not None:
+                        start = vad.to_original(offset) / TARGET_SAMPLE_RATE
+                        end = (vad.to_original(offset + len(window) - 1) + 1) / TARGET_SAMPLE_RATE
+                    else:
+                        start = offset / TARGET_SAMPLE_RATE
+                        end = start + length
+                    result["duration"] = max(result["duration"], end)
+
+                    if with_timeline:
+                        emotional_state, emotion = self._scores_from_probabilities(window_probabilities)
+                        result["segments"].append({
+                            "start": round(start, 3),
+                            "end": round(end, 3),
+                            "emotional_state": emotional_state,
+                            "emotion": emotion
+                        })
+
+            if vad is not None:
+                result["duration"] = vad.total_seconds
+                result["speech_duration"] = vad.speech_seconds
+                self._record_vad(vad, skipped=totals is None)
+            else:
+                result["speech_duration"] = result["duration"]
+
+            if totals is None:
+                if vad is not None and vad.total_samples:
+                    logger.info(f"No speech detected in {file_name} ({vad.total_seconds:.1f}s), skipping inference")
+                    result["scored"] = True
+                else:
+                    logger.warning(f"No audio decoded from {file_name}, returning default values")
+                return result
+
+            result["emotional_state"], result["emotion"] = self._scores_from_probabilities(totals / total_weight)
+            result["scored"] = True
+            logger.info(
+                f"Voice emotion analysis: {result['emotion']}, state {result['emotional_state']:.3f}, "
+                f"{result['speech_duration']:.1f}s of speech in {result['duration']:.1f}s"
+            )
+            return result
+
+        except AudioDecodeError as e:
+            logger.error(f"Error decoding audio file {file_name}: {str(e)}")
+            return result
         except Exception as e:
             logger.error(f"Error analyzing voice emotion: {str(e)}")
-            return 0.0, "calm"
+            return result
+
+    def _record_vad(self, vad: EnergyVad, skipped: bool):
+        with self._vad_lock:
+            self._vad_totals["clips"] += 1
+            self._vad_totals["skipped_clips"] += skipped
+            self._vad_totals["audio_seconds"] += vad.total_seconds
+            self._vad_totals["speech_seconds"] += vad.speech_seconds
+
+    def vad_stats(self) -> Dict[str, Any]:
+        """Audio decoded versus speech sent to the model since startup"""
+        with self._vad_lock:
+            totals = dict(self._vad_totals)
+        totals["speech_ratio"] = (
+            round(totals["speech_seconds"] / totals["audio_seconds"], 4) if totals["audio_seconds"] else 0.0
+        )
+        totals["audio_seconds"] = round(totals["audio_seconds"], 3)
+        totals["speech_seconds"] = round(totals["speech_seconds"], 3)
+        return totals
+
+    def _iter_windows(self, blocks: Iterable[np.ndarray]) -> Iterator[Tuple[int, np.ndarray]]:
+        # Yields each window with its offset in the block stream, in samples
+        window = max(1, int(settings.VOICE_WINDOW_SECONDS * TARGET_SAMPLE_RATE))
+        overlap = min(window - 1, int(settings.VOICE_WINDOW_OVERLAP_SECONDS * TARGET_SAMPLE_RATE))
+        hop = window - overlap
+        min_tail = int(self.MIN_TAIL_SECONDS * TARGET_SAMPLE_RATE)
+
+        buffer = np.empty(0, dtype=np.float32)
+        offset = 0  # Position of buffer[0] in the stream, in samples
+        emitted = False
+        for block in blocks:
+            buffer = np.concatenate([buffer, block])
+            while len(buffer) >= window:
+                yield offset, buffer[:window]
+                emitted = True
+                buffer = buffer[hop:]
+                offset += hop
+
+        # The tail shares `overlap` samples with the last window; skip it if little is new
+        new_samples = len(buffer) - overlap if emitted else len(buffer)
+        if new_samples > 0 and (not emitted or new_samples >= min_tail):
+            yield offset, buffer
+
+    def _iter_window_batches(self, blocks: Iterable[np.ndarray]) -> Iterator[List[Tuple[int, np.ndarray]]]:
+        # Only equal-length windows share a batch, so no padding skews the scores
+        batch = []
+        for offset, window in self._iter_windows(blocks):
+            if batch and (len(batch) >= settings.VOICE_WINDOW_BATCH_SIZE or len(window) != len(batch[0][1])):
+                yield batch
+                batch = []
+            batch.append((offset, window))
+        if batch:
+            yield batch
+
+    def _predict(self, windows: List[np.ndarray]) -> np.ndarray:
+        return self.classifier.predict(windows, sampling_rate=TARGET_SAMPLE_RATE)
+
+    def _scores_from_probabilities(self, probabilities: np.ndarray) -> Tuple[float, str]:
+        labels = [label.lower() for label in self.classifier.labels]
+        top_label = labels[int(np.argmax(probabilities))]
+        
+        # Expected valence over all labels keeps the value in -1..1
+        emotional_state = float(sum(
+            probability * self.label_valence.get(label, 0.0)
+            for probability, label in zip(probabilities, labels)
+        ))
+        return emotional_state, self.emotion_map.get(top_label, "calm")
     
     def get_valence_from_emotion(self, emotion: str) -> float:
         """
@@ -1,7 +1,7 @@
-from typing import Dict, List
 import json
 import asyncio
-from fastapi import WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile
+import logging
+from fastapi import WebSocket, WebSocketDisconnect, Depends, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 import base64
 import io
@@ -11,7 +11,12 @@ from ws.connection_manager import connection_manager
 from services.message_service import MessageService
 from services.chat_service import ChatService
 from services.minio_service import minio_service
-from schemas.message import MessageCreate, WebSocketMessage, FileInfo
+from services.attachment_service import AttachmentService
+from services.upload_session_service import UploadSessionService
+from ws import chunked_upload
+from schemas.message import MessageCreate, MessageUpdate, WebSocketMessage
+
+logger = logging.getLogger(__name__)
 
 async def get_db_for_ws():
     async with AsyncSessionLocal() as session:
@@ -54,9 +59,14 @@ async def chat_endpoint(
     
     try:
         while True:
-            # Receive message from WebSocket
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            # Receive message from WebSocket; binary frames are file chunks
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            if frame.get("bytes") is not None:
+                await chunked_upload.receive_chunk(websocket, db, chat_id, user_id, frame["bytes"])
+                continue
+            message_data = json.loads(frame["text"])
             
             # Parse the WebSocket message
             try:
@@ -78,16 +88,19 @@ async def chat_endpoint(
                     status=False
                 )
                 
+                message_id = ws_message.data.get("message_id")
+                stored_files = []
                 try:
-                    db_message = await MessageService.create_message(db, message_create)
-                    
-                    # Check if there are files attached
-                    files_data = []
-                    files = ws_message.data.get("files", [])
-                    
-                    if files:
-                        # Process files if any
-                        uploaded_files = []
+                    if message_id:
+                        # Files were streamed before in binary chunks (ws/chunked_upload.py)
+                        db_message = await UploadSessionService.complete_streamed(
+                            db, message_id, chat_id, user_id, message_create.text
+                        )
+                    else:
+                        # Files are written once under the reserved id, then saved with the message
+                        message_id = await MessageService.reserve_message_id(db)
+                        files = ws_message.data.get("files", [])
+                        
                         for file_data in files:
                             # Extract file information
                             file_content = base64.b64decode(file_data.get("content", ""))
@@ -102,28 +115,17 @@ async def chat_endpoint(
                             )
                             
                             # Upload to MinIO
-                            object_name = await minio_service.upload_file(file, chat_id, db_message.id)
-                            file_url = minio_service.get_file_url(object_name)
-                            
-                            # Create file info
-                            file_info = FileInfo(
-                                file_path=object_name,
-                                file_url=file_url,
-                                file_name=file_name,
-                                content_type=content_type
-                            )
-                            
-                            files_data.append(file_info.dict())
-                            uploaded_files.append(object_name)
+                            stored_files.append(await minio_service.upload_file(file, chat_id, message_id))
                         
-                        # Update message with file paths if files were uploaded
-                        if uploaded_files:
-                            await MessageService.update_message(
-                                db,
-                                db_message.id,
-                                {"media": ",".join(uploaded_files)}
-                            )
-                            db_message.media = ",".join(uploaded_files)
+                        db_message = await MessageService.create_message(
+                            db, message_create, message_id=message_id, files=stored_files
+                        )
+                        stored_files = []
+                    
+                    # Describe the files with presigned URLs
+                    files_data = await AttachmentService.describe(
+                        await AttachmentService.get_for_message(db, db_message.id)
+                    )
                     
                     # Broadcast message to all users in the chat
                     broadcast_data = {
@@ -142,11 +144,22 @@ async def chat_endpoint(
                     
                     await connection_manager.broadcast(broadcast_data, chat_id)
                 except Exception as e:
+                    # Nothing references the uploaded objects unless the message was saved
+                    await db.rollback()
+                    if stored_files and await MessageService.get_message(db, message_id) is None:
+                        for stored in stored_files:
+                            await minio_service.delete_file(stored.object_name)
                     await websocket.send_json({
                         "type": "error",
                         "data": {"message": f"Failed to save message: {str(e)}"}
                     })
             
+            elif ws_message.type == "upload_begin":
+                await chunked_upload.begin_upload(websocket, db, chat_id, user_id, ws_message.data)
+            
+            elif ws_message.type == "upload_resume":
+                await chunked_upload.resume_upload(websocket, db, chat_id, user_id, ws_message.data)
+            
             elif ws_message.type == "typing":
                 # Broadcast typing status to other users
                 typing_data = {
@@ -167,7 +180,7 @@ async def chat_endpoint(
                     await MessageService.update_message(
                         db, 
                         message_id, 
-                        {"status": True}
+                        MessageUpdate(status=True)
                     )
                     
                     # Notify sender that message was read
@@ -188,43 +201,11 @@ async def chat_endpoint(
                 
                 messages = await MessageService.get_chat_messages(db, chat_id, skip=skip, limit=limit)
                 
-                # Format and send chat history
+                # Format and send chat history; files of the whole page come from one query
+                attachments = await AttachmentService.get_for_messages(db, [msg.id for msg in messages])
                 message_history = []
                 for msg in messages:
-                    # Process file information if message has media
-                    files_data = []
-                    if msg.media:
-                        file_paths = msg.media.split(",")
-                        for file_path in file_paths:
-                            if file_path.strip():
-                                try:
-                                    file_url = minio_service.get_file_url(file_path)
-                                    # Extract filename from path
-                                    file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                                    
-                                    # Try to determine content type or use a default
-                                    content_type = "application/octet-stream"
-                                    if "." in file_name:
-                                        ext = file_name.split(".")[-1].lower()
-                                        if ext in ["jpg", "jpeg", "png", "gif"]:
-                                            content_type = f"image/{ext}"
-                                        elif ext in ["pdf"]:
-                                            content_type = "application/pdf"
-                                        elif ext in ["doc", "docx"]:
-                                            content_type = "application/msword"
-                                        elif ext in ["txt"]:
-                                            content_type = "text/plain"
-                                    
-                                    file_info = {
-                                        "file_path": file_path,
-                                        "file_url": file_url,
-                                        "file_name": file_name,
-                                        "content_type": content_type
-                                    }
-                                    files_data.append(file_info)
-                                except Exception as e:
-                                    # Skip files that can't be processed
-                                    continue
+                    files_data = await AttachmentService.describe(attachments.get(msg.id, []))
                     
                     message_history.append({
                         "id": msg.id,
@@ -276,20 +257,22 @@ async def chat_endpoint(
                         })
                         continue
                     
+                    attachment = AttachmentService.find(
+                        await AttachmentService.get_for_message(db, message_id), file_path
+                    )
+                    if attachment is None:
+                        await websocket.send_json({
+                            "type": "error",
+                            "data": {"message": "File not found in message"}
+                        })
+                        continue
+                    
                     # Delete file from MinIO
-                    deleted = minio_service.delete_file(file_path)
+                    deleted = await minio_service.delete_file(attachment.object_key)
                     
-                    # Update message's media field
-                    if deleted and message.media:
-                        file_paths = message.media.split(",")
-                        file_paths = [fp for fp in file_paths if fp.strip() and fp != file_path]
-                        new_media = ",".join(file_paths) if file_paths else None
-                        
-                        await MessageService.update_message(
-                            db,
-                            message_id,
-                            {"media": new_media}
-                        )
+                    # Drop the attachment; the message's media field follows
+                    if deleted:
+                        await AttachmentService.remove_attachment(db, attachment)
                         
                         # Notify all users that file was deleted
                         file_deleted_notification = {
@@ -316,38 +299,9 @@ async def chat_endpoint(
                         })
                         continue
                     
-                    files_data = []
-                    if message.media:
-                        file_paths = message.media.split(",")
-                        for file_path in file_paths:
-                            if file_path.strip():
-                                try:
-                                    file_url = minio_service.get_file_url(file_path)
-                                    file_name = file_path.split("/")[-1] if "/" in file_path else file_path
-                                    
-                                    # Try to determine content type
-                                    content_type = "application/octet-stream"
-                                    if "." in file_name:
-                                        ext = file_name.split(".")[-1].lower()
-                                        if ext in ["jpg", "jpeg", "png", "gif"]:
-                                            content_type = f"image/{ext}"
-                                        elif ext in ["pdf"]:
-                                            content_type = "application/pdf"
-                                        elif ext in ["doc", "docx"]:
-                                            content_type = "application/msword"
-                                        elif ext in ["txt"]:
-                                            content_type = "text/plain"
-                                    
-                                    file_info = {
-                                        "file_path": file_path,
-                                        "file_url": file_url,
-                                        "file_name": file_name,
-                                        "content_type": content_type
-                                    }
-                                    files_data.append(file_info)
-                                except Exception as e:
-                                    # Skip files that can't be processed
-                                    continue
+                    files_data = await AttachmentService.describe(
+                        await AttachmentService.get_for_message(db, message_id)
+                    )
                     
                     file_info_data = {
                         "type": "file_info",
@@ -375,7 +329,7 @@ async def chat_endpoint(
         
         await connection_manager.broadcast(leave_message, chat_id)
     
-    except Exception as e:
+    except Exception:
         # Handle any other exceptions
         connection_manager.disconnect(chat_id, user_id)
-        print(f"Error in chat WebSocket: {str(e)}")
\ No newline at end of file
+        logger.exception(f"Error in chat WebSocket of user {user_id} in chat {chat_id}")
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Binary file upload over the chat socket.
+
+1. The client sends {"type": "upload_begin", "data": {"name", "size",
+   "content_type"?, "message_id"?}}; `message_id` from an earlier
+   upload_ready adds another file to the same message.
+2. The server answers {"type": "upload_ready", "data": {"upload_id",
+   "message_id", "chunk_size", "chunk_count", "next_chunk", ...}}.
+3. The client sends binary frames: 16 bytes of upload_id (the hex decoded),
+   a big-endian uint32 chunk number from 1, then the chunk. Every chunk but
+   the last is exactly chunk_size bytes. Each chunk is written to MinIO as
+   one part of a multipart upload and acknowledged with {"type":
+   "upload_ack", "data": {"upload_id", "chunk", "next_chunk"}}.
+4. After a reconnect, {"type": "upload_resume", "data": {"upload_id"}} gets
+   upload_ready again with the first chunk not acknowledged yet.
+5. {"type": "message", "data": {"message_id", "text"}} creates the message
+   once every chunk of every file is acknowledged.
+
+Only one chunk is in memory at a time. Progress is kept in
+upload_session_table, so the upload can resume on any server worker.
+chunk_size follows MINIO_PART_SIZE and must stay below the server's
+WebSocket frame limit (16 MiB by default in uvicorn).
+"""
+import logging
+import struct
+
+from fastapi import HTTPException, WebSocket
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.upload_session import UploadSession
+from schemas.upload import UploadFileRequest
+from services.upload_session_service import UploadSessionService
+
+logger = logging.getLogger(__name__)
+
+# upload_id as 16 raw bytes, chunk number
+CHUNK_HEADER = struct.Struct("!16sI")
+
+def _ready(session: UploadSession) -> dict:
+    return {
+        "type": "upload_ready",
+        "data": {
+            "upload_id": session.id,
+            "message_id": session.message_id,
+            "file_name": session.original_name,
+            "chunk_size": session.part_size,
+            "chunk_count": session.part_count,
+            "next_chunk": UploadSessionService.next_part(session),
+            "expires_at": session.expires_at.isoformat()
+        }
+    }
+
+async def _send_error(websocket: WebSocket, db: AsyncSession, error: Exception, **context):
+    await db.rollback()
+    if isinstance(error, HTTPException):
+        detail = error.detail
+    elif isinstance(error, ValidationError):
+        detail = "Invalid upload parameters"
+    else:
+        logger.error(f"Error in chunked upload {context}: {str(error)}")
+        detail = "Failed to store upload"
+    await websocket.send_json({"type": "upload_error", "data": {"message": detail, **context}})
+
+async def begin_upload(websocket: WebSocket, db: AsyncSession, chat_id: int, user_id: int, data: dict):
+    try:
+        file = UploadFileRequest(
+            name=data.get("name") or "unnamed_file",
+            size=data.get("size"),
+            content_type=data.get("content_type")
+        )
+        session = await UploadSessionService.begin_stream(db, chat_id, user_id, file, data.get("message_id"))
+    except Exception as e:
+        await _send_error(websocket, db, e, name=data.get("name"))
+        return
+    await websocket.send_json(_ready(session))
+
+async def resume_upload(websocket: WebSocket, db: AsyncSession, chat_id: int, user_id: int, data: dict):
+    upload_id = data.get("upload_id")
+    try:
+        session = await UploadSessionService.get_stream(db, str(upload_id), chat_id, user_id)
+    except Exception as e:
+        await _send_error(websocket, db, e, upload_id=upload_id)
+        return
+    await websocket.send_json(_ready(session))
+
+async def receive_chunk(websocket: WebSocket, db: AsyncSession, chat_id: int, user_id: int, frame: bytes):
+    if len(frame) < CHUNK_HEADER.size:
+        await websocket.send_json({"type": "upload_error", "data": {"message": "Chunk frame is too short"}})
+        return
+    raw_id, chunk = CHUNK_HEADER.unpack_from(frame)
+    upload_id = raw_id.hex()
+    try:
+        session = await UploadSessionService.get_stream(db, upload_id, chat_id, user_id)
+        await UploadSessionService.store_part(db, session, chunk, frame[CHUNK_HEADER.size:])
+    except Exception as e:
+        await _send_error(websocket, db, e, upload_id=upload_id, chunk=chunk)
+        return
+    await websocket.send_json({
+        "type": "upload_ack",
+        "data": {
+            "upload_id": upload_id,
+            "chunk": chunk,
+            "next_chunk": UploadSessionService.next_part(session)
+        }
+    })
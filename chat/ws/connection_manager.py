@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List
 import json
 from fastapi import WebSocket, WebSocketDisconnect
 
@@ -6,6 +6,10 @@ class ConnectionManager:
     def __init__(self):
         # {chat_id: {user_id: websocket}}
         self.active_connections: Dict[int, Dict[int, WebSocket]] = {}
+        # Set by serve.py in multi-worker mode to reach sockets held by sibling workers
+        self.relay = None
+        # Handlers for relayed events that are not socket deliveries, by event type
+        self.handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
     
     async def connect(self, websocket: WebSocket, chat_id: int, user_id: int):
         await websocket.accept()
@@ -31,6 +35,46 @@ class ConnectionManager:
                 await websocket.send_json(message)
     
     async def broadcast(self, message: dict, chat_id: int, exclude_user_id: int = None):
+        await self._broadcast_local(message, chat_id, exclude_user_id)
+        if self.relay is not None:
+            await self.relay.publish({
+                "type": "broadcast",
+                "chat_id": chat_id,
+                "exclude_user_id": exclude_user_id,
+                "message": message
+            })
+    
+    async def send_to_user(self, message: dict, user_id: int):
+        """Send a message to every socket of a user, whichever chat it is open in"""
+        await self._send_to_user_local(message, user_id)
+        if self.relay is not None:
+            await self.relay.publish({"type": "user", "user_id": user_id, "message": message})
+    
+    async def publish(self, event: dict):
+        """Hand an event to the registered handler of every sibling worker"""
+        if self.relay is not None:
+            await self.relay.publish(event)
+    
+    def register_handler(self, event_type: str, handler: Callable[[dict], Awaitable[None]]):
+        self.handlers[event_type] = handler
+    
+    async def deliver(self, event: dict):
+        """Deliver an event relayed from another worker to the sockets held here"""
+        event_type = event.get("type")
+        if event_type == "broadcast":
+            await self._broadcast_local(event["message"], event["chat_id"], event.get("exclude_user_id"))
+        elif event_type == "user":
+            await self._send_to_user_local(event["message"], event["user_id"])
+        elif event_type in self.handlers:
+            await self.handlers[event_type](event)
+    
+    async def _send_to_user_local(self, message: dict, user_id: int):
+        for connections in list(self.active_connections.values()):
+            websocket = connections.get(user_id)
+            if websocket is not None:
+                await websocket.send_json(message)
+    
+    async def _broadcast_local(self, message: dict, chat_id: int, exclude_user_id: int = None):
         if chat_id in self.active_connections:
             for user_id, websocket in self.active_connections[chat_id].items():
                 if exclude_user_id is None or user_id != exclude_user_id:
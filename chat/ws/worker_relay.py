@@ -0,0 +1,57 @@
+import asyncio
+import json
+import logging
+import socket
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest relayed event line, in bytes
+MAX_EVENT_SIZE = 16 * 1024 * 1024
+
+class WorkerRelay:
+    """
+    Broadcast link between a forked HTTP/WS worker and the serve.py master.
+
+    WebSocket connections live in the worker that accepted them, so every
+    broadcast is also published to the master as one JSON line; the master
+    forwards it to all other workers, which deliver it to their local sockets.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, manager):
+        """Connect the socket to the running loop and deliver relayed events to `manager`"""
+        if self._task is not None:
+            return
+        self._reader, self._writer = await asyncio.open_unix_connection(sock=self.sock, limit=MAX_EVENT_SIZE)
+        self._task = asyncio.create_task(self._read_loop(manager))
+
+    async def publish(self, event: dict):
+        if self._writer is None or self._writer.is_closing():
+            return
+        self._writer.write(json.dumps(event, separators=(",", ":"), default=str).encode("utf-8") + b"\n")
+        await self._writer.drain()
+
+    async def _read_loop(self, manager):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                logger.warning("Worker relay closed by the master")
+                return
+            try:
+                await manager.deliver(json.loads(line))
+            except Exception as e:
+                logger.error(f"Error delivering relayed event: {str(e)}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None